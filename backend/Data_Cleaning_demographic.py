@@ -1,27 +1,20 @@
+import os
 import pandas as pd
 import numpy as np
-import glob
+from name_normalizer import standardize_column
+from ingest import clean_shards, parse_ingest_args
+from storage import DATA_DIR, peek
 
-# --- Load Data ---
-file_pattern = r"backend\Datasets\api_data_aadhar_demographic\api_data_aadhar_demographic_*.csv" 
-all_files = glob.glob(file_pattern)
+# Partitioned output: one part per raw shard + _manifest.json (CSV or Parquet parts)
+OUTPUT_DIR = os.path.join(DATA_DIR, 'cleaned_data_set_demographic')
 
-if not all_files:
-    print("WARNING: No files found!")
-else:
-    df_list = [pd.read_csv(f) for f in all_files]
-    df_demo = pd.concat(df_list, ignore_index=True)
-
-    # Cleaning
-    df_demo.columns = df_demo.columns.str.strip().str.lower()
+def clean_demographic(df_demo, aliases):
+    # Cleaning (runs per chunk, columns are already stripped/lowercased by the reader)
     df_demo['date'] = pd.to_datetime(df_demo['date'], format='%d-%m-%Y', errors='coerce')
 
-    def standardize_text(text):
-        if pd.isna(text): return "Unknown"
-        return str(text).lower().strip().replace('&', 'and').title()
-
-    df_demo['state'] = df_demo['state'].apply(standardize_text)
-    df_demo['district'] = df_demo['district'].apply(standardize_text)
+    # Normalize names on the distinct values only (shared alias table)
+    df_demo['state'] = standardize_column(df_demo['state'], 'state', aliases)
+    df_demo['district'] = standardize_column(df_demo['district'], 'district', aliases)
     
     cols_to_fill = ['demo_age_5_17', 'demo_age_17_']
     df_demo[cols_to_fill] = df_demo[cols_to_fill].fillna(0)
@@ -42,10 +35,12 @@ else:
     # Feature 4: is week
     df_demo['is_weekend'] = df_demo['date'].dt.dayofweek.isin([5, 6]).astype(int)
     df_demo['month_name'] = df_demo['date'].dt.month_name()
-
-    # --- Save ---
-    output_path = r'backend\Datasets\cleaned_data_set_demographic.csv'
-    df_demo.to_csv(output_path, index=False)
-    
-    print(f"Success! Processed {len(df_demo)} rows.")
-    print(df_demo[['district', 'total_demo_updates', 'mobility_index', 'correction_index']].head())
\ No newline at end of file
+    return df_demo
+
+if __name__ == "__main__":
+    args = parse_ingest_args("Clean the raw demographic shards")
+    rows, shards = clean_shards('demographic', clean_demographic, OUTPUT_DIR,
+                                workers=args.workers, chunksize=args.chunksize, full=args.full)
+    if shards:
+        print(f"Success! Processed {rows} rows.")
+        print(peek(OUTPUT_DIR)[['district', 'total_demo_updates', 'mobility_index', 'correction_index']])
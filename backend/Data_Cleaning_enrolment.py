@@ -1,26 +1,20 @@
+import os
 import pandas as pd
 import numpy as np
-import glob
+from name_normalizer import standardize_column
+from ingest import clean_shards, parse_ingest_args
+from storage import DATA_DIR, peek
 
-file_pattern = r"backend\Datasets\api_data_aadhar_enrolment\api_data_aadhar_enrolment_*.csv" 
-all_files = glob.glob(file_pattern)
+# Partitioned output: one part per raw shard + _manifest.json (CSV or Parquet parts)
+OUTPUT_DIR = os.path.join(DATA_DIR, 'cleaned_data_set_enrolment')
 
-if not all_files:
-    print("WARNING: No files found!")
-else:
-    df_list = [pd.read_csv(f) for f in all_files]
-    df_enro = pd.concat(df_list, ignore_index=True)
-
-    # Cleaning
-    df_enro.columns = df_enro.columns.str.strip().str.lower()
+def clean_enrolment(df_enro, aliases):
+    # Cleaning (runs per chunk, columns are already stripped/lowercased by the reader)
     df_enro['date'] = pd.to_datetime(df_enro['date'], format='%d-%m-%Y', errors='coerce')
 
-    def standardize_text(text):
-        if pd.isna(text): return "Unknown"
-        return str(text).lower().strip().replace('&', 'and').title()
-
-    df_enro['state'] = df_enro['state'].apply(standardize_text)
-    df_enro['district'] = df_enro['district'].apply(standardize_text)
+    # Normalize names on the distinct values only (shared alias table)
+    df_enro['state'] = standardize_column(df_enro['state'], 'state', aliases)
+    df_enro['district'] = standardize_column(df_enro['district'], 'district', aliases)
     
     cols_to_fill = ['age_0_5', 'age_5_17','age_18_greater']
     df_enro[cols_to_fill] = df_enro[cols_to_fill].fillna(0)
@@ -45,10 +39,12 @@ else:
     # Feature 4: is week
     df_enro['is_weekend'] = df_enro['date'].dt.dayofweek.isin([5, 6]).astype(int)
     df_enro['month_name'] = df_enro['date'].dt.month_name()
-
-
-    output_path = r'backend\Datasets\cleaned_data_set_enrolment.csv'
-    df_enro.to_csv(output_path, index=False)
-    
-    print(f"Success! Processed {len(df_enro)} rows.")
-    print(df_enro[['district', 'total_enro_updates', 'infiltration_index', 'Birth_index','School_Index']].head())
\ No newline at end of file
+    return df_enro
+
+if __name__ == "__main__":
+    args = parse_ingest_args("Clean the raw enrolment shards")
+    rows, shards = clean_shards('enrolment', clean_enrolment, OUTPUT_DIR,
+                                workers=args.workers, chunksize=args.chunksize, full=args.full)
+    if shards:
+        print(f"Success! Processed {rows} rows.")
+        print(peek(OUTPUT_DIR)[['district', 'total_enro_updates', 'infiltration_index', 'Birth_index','School_Index']])
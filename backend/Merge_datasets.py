@@ -1,40 +1,23 @@
 import pandas as pd
-import os
+from storage import write_dataset
+from feature_store import get_merged
 
 def merge_datasets():
-    base = 'backend/' if os.path.exists('backend/Datasets') else ''
-    if not os.path.exists(os.path.join(base, 'Datasets')): base = '../backend/'
-    
-    paths = {
-        'enrol': os.path.join(base, 'Datasets', 'cleaned_data_set_enrolment.csv'),
-        'demo': os.path.join(base, 'Datasets', 'cleaned_data_set_demographic.csv'),
-        'bio': os.path.join(base, 'Datasets', 'cleaned_data_set_biometric.csv'),
-        'output': os.path.join(base, 'Datasets', 'master_data_model_04.csv')
-    }
-
-    print("Loading datasets...")
+    # The three-way join comes from the shared feature store (built once per version of the inputs)
+    print("Loading Enrolment + Demographic + Biometric merge...")
     try:
-        df_enrol = pd.read_csv(paths['enrol'])
-        df_demo = pd.read_csv(paths['demo'])
-        df_bio = pd.read_csv(paths['bio'])
+        df_final = get_merged(['enrol', 'demo', 'bio'])
     except FileNotFoundError:
         print(" Error: One or more input CSVs are missing.")
         return
-    print("Merging Enrolment + Demographic...")
-    merge_keys = ['date', 'state', 'district', 'pincode', 'is_weekend', 'month_name']
-    
-    df_merged = pd.merge(df_enrol, df_demo, on=merge_keys, how='inner')
-    
-    print("Merging + Biometric...")
-    df_final = pd.merge(df_merged, df_bio, on=merge_keys, how='inner')
 
     df_final.fillna(0, inplace=True)
 
-    # 4. Save
-    df_final.to_csv(paths['output'], index=False)
+    # 4. Save (CSV or Parquet depending on AADHAAR_STORAGE_FORMAT)
+    output_path = write_dataset(df_final, 'master_data_model_04')
     
     print("\n SUCCESS!")
-    print(f"Merged File Saved: {paths['output']}")
+    print(f"Merged File Saved: {output_path}")
     print(f"Total Rows: {len(df_final)}")
     print(f"Columns: {list(df_final.columns)}")
 
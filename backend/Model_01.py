@@ -1,24 +1,26 @@
+import os
+import time
 import pandas as pd
 import numpy as np
 from sklearn.ensemble import IsolationForest
-from sklearn.metrics import silhouette_score
 import joblib
 import matplotlib.pyplot as plt
 import seaborn as sns
-CONTAMINATION_RATE = 0.03 
+from storage import MODEL_DIR, write_dataset
+from feature_store import get_merged
+from sentinel import FEATURES, MODEL_PATH, fit_calibration, risk_from_raw, save_calibration, save_run
+from model_selection import load_selection, simplified_silhouette
+from registry import register
+from ensemble import PARITY_ROWS
+CONTAMINATION_RATE = load_selection()['sentinel_contamination']  # 0.03 until model_selection.py has run
 N_ESTIMATORS = 200
 def train_model_01():
-    df_enrol=pd.read_csv(r'Datasets\cleaned_data_set_enrolment.csv')
-    df_demo=pd.read_csv(r'Datasets\cleaned_data_set_demographic.csv')
-    df_merged = pd.merge(df_enrol, df_demo, 
-                         on=['date', 'state', 'district', 'pincode', 'is_weekend', 'month_name'], 
-                         how='inner')
+    df_merged = get_merged(['enrol', 'demo'])  # shared feature store
     df_merged.fillna(0, inplace=True)
-    features = [
-        'infiltration_index',    # High adult enrolment = Suspicious
-        'Birth_index',  # Low birth enrolment = Suspicious
-        'correction_index'       # High child updates = Operator Incompetence
-        ]
+    # infiltration_index: High adult enrolment = Suspicious
+    # Birth_index: Low birth enrolment = Suspicious
+    # correction_index: High child updates = Operator Incompetence
+    features = FEATURES
     X= df_merged[features]
     print(f"Training Model with {N_ESTIMATORS}trees")
     model=IsolationForest(n_estimators=N_ESTIMATORS,
@@ -29,11 +31,10 @@ def train_model_01():
     model.fit(X)
 
     df_merged['raw_anomaly_score'] = model.decision_function(X)
-    min_score = df_merged['raw_anomaly_score'].min()
-    max_score = df_merged['raw_anomaly_score'].max()
-
-    df_merged['risk_score'] = 100 * (max_score - df_merged['raw_anomaly_score']) / (max_score - min_score)
-    df_merged['anomaly_label'] = model.predict(X)
+    # risk = position in the training score distribution, so new rows can be scored the same way later
+    calibration = fit_calibration(df_merged['raw_anomaly_score'])
+    df_merged['risk_score'] = risk_from_raw(df_merged['raw_anomaly_score'], calibration)
+    df_merged['anomaly_label'] = np.where(df_merged['raw_anomaly_score'] < 0, -1, 1)  # == model.predict(X)
     anomalies = df_merged[df_merged['anomaly_label'] == -1]
 
     print("\nMODEL RESULTS")
@@ -45,9 +46,9 @@ def train_model_01():
 
     def print_model_health(df, features):
         print("\n--- MODEL HEALTH REPORT ---")
-        sample = df.sample(min(10000, len(df)), random_state=42)
-        sil_score = silhouette_score(sample[features], sample['anomaly_label'])
-        print(f"Silhouette Score: {sil_score:.4f} (Valid range for Anomaly Detection: 0.4 - 0.7)")
+        # centroid-based silhouette over every row, linear in the row count (see model_selection.py)
+        sil_score = simplified_silhouette(df[features].to_numpy(), df['anomaly_label'].to_numpy())
+        print(f"Silhouette Score (simplified): {sil_score:.4f} (Valid range for Anomaly Detection: 0.4 - 0.7)")
 
         anomalies = df[df['anomaly_label'] == -1]
         normals = df[df['anomaly_label'] == 1]
@@ -59,15 +60,30 @@ def train_model_01():
         print(f"Contrast Ratio: {contrast:.2f}x")
         print(f"   - Normal Districts Avg Adult Enrolment: {good_avg*100:.1f}%")
         print(f"   - Flagged Districts Avg Adult Enrolment: {bad_avg*100:.1f}%")
-        if contrast > 2.0:
+        distinct = contrast > 2.0
+        metrics = {'contamination': CONTAMINATION_RATE, 'contrast': contrast,
+                   'simplified_silhouette': sil_score, 'anomaly_rate': len(anomalies) / len(df)}
+        sample = df[features].sample(min(len(df), PARITY_ROWS), random_state=0)
+        if distinct:
             print(" SUCCESS: The model is finding significantly distinct anomalies.")
-            joblib.dump(model, 'Models/model_sentinel.pkl')
-            print("\nSaving processed data to 'anomalies_data.csv'...")
-            df_merged.to_csv('Datasets/anomalies_data.csv', index=False)
+            os.makedirs(MODEL_DIR, exist_ok=True)
+            joblib.dump(model, MODEL_PATH)
+            save_calibration(calibration)
+            version = register('sentinel', model, kind='sentinel', features=features, extra={'calibration': calibration},
+                               sample=sample, metrics=metrics)
+            print("\nSaving processed data to 'anomalies_data'...")
+            write_dataset(df_merged, 'anomalies_data')
             print("Save complete.")
 
         else:
             print(" WARNING: The flagged anomalies look too similar to normal data.")
+            # kept in the registry for a look, but the served files and CURRENT stay on the last good model
+            version = register('sentinel', model, kind='sentinel', features=features, extra={'calibration': calibration},
+                               sample=sample, metrics=metrics, promote=False)
+            print(f" Not promoted: {version} (the served sentinel and 'anomalies_data' are unchanged)")
+        # the run itself is the stage's output, so a rejected run still counts as done for pipeline.py
+        save_run({'finished_at': time.strftime("%Y-%m-%dT%H:%M:%S"), 'version': version,
+                  'accepted': bool(distinct), 'metrics': metrics})
     print_model_health(df_merged, features)
 
 if __name__ == "__main__":
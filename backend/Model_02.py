@@ -1,60 +1,130 @@
+import argparse
 import pandas as pd
 import numpy as np
-from sklearn.cluster import KMeans
+from sklearn.cluster import KMeans, MiniBatchKMeans
 from sklearn.preprocessing import StandardScaler
-from sklearn.metrics import silhouette_score
 import joblib
 import os
+from storage import MODEL_DIR, write_dataset, write_frame, dataset_path, concat_files
+from feature_store import get_merged, iter_merged
+from pulse import FEATURES, name_clusters
+from model_selection import load_selection, simplified_silhouette
+from registry import register
+
+N_CLUSTERS = load_selection()['pulse_k']  # 3 until model_selection.py has run
+CHUNKSIZE = 250_000   # rows read per chunk in streaming mode
+BATCH_SIZE = 4096     # rows per MiniBatchKMeans update
+EPOCHS = 2            # passes over the data for the mini-batch fit
+COLUMNS = ['date', 'state', 'district'] + FEATURES
+OUTPUT_COLS = ['date', 'state', 'district', 'cluster_id', 'cluster_name'] + FEATURES
+
+def save_models(model, scaler, silhouette):
+    os.makedirs(MODEL_DIR, exist_ok=True)
+    joblib.dump(model, os.path.join(MODEL_DIR, 'model_pulse_kmeans.pkl'))
+    joblib.dump(scaler, os.path.join(MODEL_DIR, 'model_pulse_scaler.pkl'))
+    register('pulse_kmeans', model, features=FEATURES,
+             metrics={'k': N_CLUSTERS, 'simplified_silhouette': silhouette})
+    register('pulse_scaler', scaler, features=FEATURES)
 
 def train_model_02():
     print("Loading datasets (Standard Mode)...")
     try:
-        df_bio = pd.read_csv(r'Datasets\cleaned_data_set_biometric.csv')
-        df_demo = pd.read_csv(r'Datasets\cleaned_data_set_demographic.csv')
+        df_merged = get_merged(['bio', 'demo'], columns=COLUMNS)
     except FileNotFoundError:
         print(" Error: Original cleaned CSVs not found.")
         return
-    df_merged = pd.merge(df_bio, df_demo, 
-                         on=['date', 'state', 'district', 'pincode', 'is_weekend', 'month_name'], 
-                         how='inner')
     df_merged.fillna(0, inplace=True)
-    
-    features = ['labor_intensity_score', 'mobility_index', 'child_compliance_ratio']
+
+    features = FEATURES
     X = df_merged[features]
     scaler = StandardScaler()
     X_scaled = scaler.fit_transform(X)
 
-    # Train K=3 (this gave the most optimized score in our tests hehe)
-    print("Training K-Means (K=3)...")
-    best_model = KMeans(n_clusters=3, random_state=42, n_init=10)
+    # K=3 gave the most optimized score in our tests hehe, model_selection.py now re-checks it on every refresh
+    print(f"Training K-Means (K={N_CLUSTERS})...")
+    best_model = KMeans(n_clusters=N_CLUSTERS, random_state=42, n_init=10)
     best_model.fit(X_scaled)
     df_merged['cluster_id'] = best_model.labels_ #clusters
 
-    # Naming Logic
-    def name_cluster(row):
-        if row['mobility_index'] > row['labor_intensity_score']:
-            return "Urban / Digital Hub"
-        elif row['labor_intensity_score'] > 0.6:
-            return "Manual Labor Zone"
-        else:
-            return "Evolving / Mixed"
-
-    df_merged['cluster_name'] = df_merged.apply(name_cluster, axis=1)
+    # Naming Logic (shared with the API, see pulse.py)
+    df_merged['cluster_name'] = name_clusters(df_merged['labor_intensity_score'], df_merged['mobility_index'])
 
     # Score
-    score = silhouette_score(X_scaled, best_model.labels_, sample_size=10000)
-    print(f" Final Silhouette Score: {score:.4f}")
+    score = simplified_silhouette(X_scaled, best_model.labels_, best_model.cluster_centers_)
+    print(f" Final Silhouette Score (simplified): {score:.4f}")
 
     # Savin
+    save_models(best_model, scaler, score)
 
-    joblib.dump(best_model, r'Models\model_pulse_kmeans.pkl')
-    joblib.dump(scaler, r'Models\model_pulse_scaler.pkl')
-    
     # 2. Data for frontend's Dashboard
-    output_cols = ['date', 'state', 'district', 'cluster_id', 'cluster_name'] + features
-    df_merged[output_cols].to_csv(r'Datasets\scored_pulse_data.csv', index=False)
-    
-    print(" Files Saved: 'scored_pulse_data.csv', 'model_pulse_kmeans.pkl', 'model_pulse_scaler.pkl'")
+    write_dataset(df_merged[OUTPUT_COLS], 'scored_pulse_data')
+
+    print(" Files Saved: 'scored_pulse_data', 'model_pulse_kmeans.pkl', 'model_pulse_scaler.pkl'")
+
+def train_model_02_streaming(chunksize=CHUNKSIZE, epochs=EPOCHS):
+    """
+    Same model in bounded memory: the merged frame is read chunk by chunk
+    (1 pass for the scaler, `epochs` passes of MiniBatchKMeans updates, 1 pass to label and save),
+    so peak memory is ~chunksize rows whatever the dataset size.
+    """
+    def chunks():
+        for chunk in iter_merged(['bio', 'demo'], columns=COLUMNS, chunksize=chunksize):
+            chunk[FEATURES] = chunk[FEATURES].fillna(0)
+            yield chunk
+
+    print("Streaming datasets (MiniBatch Mode)...")
+    try:
+        scaler = StandardScaler()
+        n_rows = 0
+        for chunk in chunks():
+            scaler.partial_fit(chunk[FEATURES])
+            n_rows += len(chunk)
+    except FileNotFoundError:
+        print(" Error: Original cleaned CSVs not found.")
+        return
+
+    print(f"Training MiniBatch K-Means (K={N_CLUSTERS}) on {n_rows} rows, {epochs} epoch(s)...")
+    model = MiniBatchKMeans(n_clusters=N_CLUSTERS, random_state=42, batch_size=BATCH_SIZE, n_init=3)
+    for _ in range(epochs):
+        for chunk in chunks():
+            X_scaled = scaler.transform(chunk[FEATURES])
+            for start in range(0, len(X_scaled), BATCH_SIZE):
+                batch = X_scaled[start:start + BATCH_SIZE]
+                # the very first update needs at least one row per cluster
+                if len(batch) >= N_CLUSTERS or hasattr(model, 'cluster_centers_'):
+                    model.partial_fit(batch)
+
+    print("Labelling and saving...")
+    output_path = dataset_path('scored_pulse_data')
+    ext = os.path.splitext(output_path)[1]
+    part_paths, sil_total = [], 0.0
+    for i, chunk in enumerate(chunks()):
+        X_scaled = scaler.transform(chunk[FEATURES])
+        chunk['cluster_id'] = model.predict(X_scaled)
+        chunk['cluster_name'] = name_clusters(chunk['labor_intensity_score'], chunk['mobility_index'])
+        # simplified silhouette is a per-row mean, so it adds up across chunks
+        sil_chunk = simplified_silhouette(X_scaled, chunk['cluster_id'].to_numpy(), model.cluster_centers_)
+        sil_total += np.nan_to_num(sil_chunk) * len(chunk)
+
+        part_path = f"{output_path}.{i:05d}.tmp{ext}"
+        write_frame(chunk[OUTPUT_COLS], part_path)
+        part_paths.append(part_path)
+    concat_files(part_paths, output_path)
+
+    score = sil_total / max(n_rows, 1)
+    print(f" Final Silhouette Score (simplified): {score:.4f}")
+
+    save_models(model, scaler, score)
+    print(" Files Saved: 'scored_pulse_data', 'model_pulse_kmeans.pkl', 'model_pulse_scaler.pkl'")
 
 if __name__ == "__main__":
-    train_model_02()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Train the pulse clustering (Model 02)")
+    parser.add_argument("--streaming", action="store_true",
+                        help="MiniBatchKMeans over chunks with a streaming scaler (bounded memory) instead of full-batch KMeans")
+    parser.add_argument("--chunksize", type=int, default=CHUNKSIZE, help="rows per chunk in streaming mode")
+    parser.add_argument("--epochs", type=int, default=EPOCHS, help="passes over the data in streaming mode")
+    args = parser.parse_args()
+    if args.streaming:
+        train_model_02_streaming(chunksize=args.chunksize, epochs=args.epochs)
+    else:
+        train_model_02()
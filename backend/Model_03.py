@@ -1,56 +1,110 @@
+import argparse
 import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
 from xgboost import XGBRegressor
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.metrics import mean_absolute_percentage_error
-import joblib
 import os
+import json
+from storage import MODEL_DIR, write_dataset, write_partitioned, iter_dataset
+from feature_store import get_merged
+from forecast_online import save_state, state_from_daily
+from ensemble import PARITY_ROWS, WEIGHTS, build_artifact, save_artifact, predict
+from registry import register
 
 #configurations for model training(Akarsh arsh ke customers ko sambhaal kr run kriyo, mai hang hua toh mujhe mt kehna)
-N_ESTIMATORS = 600     
-LEARNING_RATE = 0.005  
-MAX_DEPTH = 5          
-SUBSAMPLE = 0.8        
-COLSAMPLE_BYTREE = 0.8 
-
-def get_paths():#handling paths
-    if os.path.exists('Datasets'): base = ''
-    elif os.path.exists('backend/Datasets'): base = 'backend/'
-    else: base = '../backend/' 
+N_ESTIMATORS = 600
+LEARNING_RATE = 0.005
+MAX_DEPTH = 5
+SUBSAMPLE = 0.8
+COLSAMPLE_BYTREE = 0.8
+CHUNKSIZE = 250_000
+MIN_SERIES_DAYS = 30   # shorter geographies don't have enough history for lag_7 + a validation window
+TUNING_PATH = os.path.join(MODEL_DIR, 'forecast_tuning.json')  # written by tune_forecast.py
+
+# hand-tuned defaults, used until tune_forecast.py has picked something better
+DEFAULT_PARAMS = {
+    "n_estimators": N_ESTIMATORS,
+    "learning_rate": LEARNING_RATE,
+    "max_depth": MAX_DEPTH,
+    "subsample": SUBSAMPLE,
+    "colsample_bytree": COLSAMPLE_BYTREE,
+    "rf_estimators": 200,
+    "weights": WEIGHTS,
+}
+
+FEATURES = [#Finalizes features for training
+    "is_weekend", "lag_1", "lag_7", "momentum", "volatility",
+    "day_sin", "day_cos", "month_sin", "month_cos"
+]
+TARGET = "target_trend"
+
+# cleaned dataset -> candidate volume columns (first one present wins)
+SOURCE_TOTALS = {
+    'cleaned_data_set_enrolment': ['total_enrolment', 'total_enro_updates'],
+    'cleaned_data_set_demographic': ['total_demo_updates'],
+    'cleaned_data_set_biometric': ['total_bio_updates'],
+}
+
+def get_paths():#handling paths (anchored on this file, works from any working directory)
     return {
-        'enrol': os.path.join(base, 'Datasets', 'cleaned_data_set_enrolment.csv'),
-        'demo': os.path.join(base, 'Datasets', 'cleaned_data_set_demographic.csv'),
-        'bio': os.path.join(base, 'Datasets', 'cleaned_data_set_biometric.csv'),
-        'model_out': os.path.join(base, 'Models', 'footfall_forecast_xgb.pkl')
+        'model_out': os.path.join(MODEL_DIR, 'footfall_forecast.pkl')
     }
 
-def train_footfall_model():#training the model
-    paths = get_paths()
-    print("Loading datasets...")
-    try:
-        df_enrol = pd.read_csv(paths['enrol'])
-        df_demo = pd.read_csv(paths['demo'])
-        df_bio = pd.read_csv(paths['bio'])
-    except FileNotFoundError:
-        print(" Error: Datasets not found.")
-        return
+def _volume_column(name, chunk, candidates):
+    col = next((c for c in candidates if c in chunk.columns), None)
+    if col is None:
+        raise ValueError(f"{name}: none of the volume columns {candidates} found (columns: {list(chunk.columns)})")
+    return col
 
-    print("Merging and Engineering Features...")#merge
-    df = (
-        df_enrol
-        .merge(df_demo, on=["date", "state", "district", "pincode", "is_weekend", "month_name"], how="inner")
-        .merge(df_bio, on=["date", "state", "district", "pincode", "is_weekend", "month_name"], how="inner")
-    )
+def _check_total(name, total):
+    if total is None:
+        raise ValueError(f"{name} is empty, no daily totals to forecast from")
+    return total.rename(name)
+
+def daily_totals_streaming(chunksize=CHUNKSIZE):
+    """
+    Reduces each cleaned dataset to one total per day while streaming it chunk by chunk,
+    then outer-joins the three daily series. Memory ~ number of days, never the row-level merge,
+    and pincodes missing from one source still count towards the other two.
+    """
+    per_source = []
+    for name, candidates in SOURCE_TOTALS.items():
+        total = None
+        for chunk in iter_dataset(name, columns=['date'] + candidates, chunksize=chunksize):
+            col = _volume_column(name, chunk, candidates)
+            day_sum = chunk.groupby(pd.to_datetime(chunk['date']))[col].sum()
+            total = day_sum if total is None else total.add(day_sum, fill_value=0)
+        per_source.append(_check_total(name, total))
+
+    daily = pd.concat(per_source, axis=1).fillna(0)
+    daily.index.name = 'date'
+    daily = daily.reset_index().sort_values('date')
+    daily['raw_footfall'] = daily[list(SOURCE_TOTALS)].sum(axis=1)
+    daily['is_weekend'] = daily['date'].dt.dayofweek.isin([5, 6]).astype(int)
+    return daily[['date', 'raw_footfall', 'is_weekend']].reset_index(drop=True)
+
+def daily_totals_from_rows():
+    """Old path: row-level three-way join (drops pincodes missing from any source), then sum per day."""
+    # same three-way join Merge_datasets uses, served from the shared feature store
+    df = get_merged(['enrol', 'demo', 'bio'], columns=['date', 'is_weekend', 'total_enrolment', 'total_enro_updates',
+                                                       'total_demo_updates', 'total_bio_updates'])
     df["date"] = pd.to_datetime(df["date"])
 
     enrol_col = 'total_enrolment' if 'total_enrolment' in df.columns else 'total_enro_updates'
     df["raw_footfall"] = df[enrol_col] + df["total_bio_updates"] + df["total_demo_updates"]
-    #aggregate 
-    daily = df.groupby("date").agg(
+    #aggregate
+    return df.groupby("date").agg(
         raw_footfall=("raw_footfall", "sum"),
         is_weekend=("is_weekend", "max")
     ).reset_index().sort_values("date")
 
+def build_features(daily):
+    """Adds the target trend, lag/momentum/volatility and cyclical features to a daily series."""
+    daily = daily.sort_values("date").copy()
+    daily["date"] = pd.to_datetime(daily["date"])
+
     # 1. Target Trend
     daily["target_trend"] = daily["raw_footfall"].rolling(window=7, min_periods=1).mean()
 
@@ -59,20 +113,140 @@ def train_footfall_model():#training the model
     daily["lag_7"] = daily["target_trend"].shift(7)
     daily["momentum"] = daily["lag_1"] / (daily["lag_7"] + 1e-6)
     daily["volatility"] = daily["target_trend"].rolling(7).std().fillna(0)
-    
+
     # Cyclical Time(iska idea toh pura pura book se utha liya lolaa)
     daily['day_sin'] = np.sin(2 * np.pi * daily['date'].dt.dayofweek / 7)
     daily['day_cos'] = np.cos(2 * np.pi * daily['date'].dt.dayofweek / 7)
     daily['month_sin'] = np.sin(2 * np.pi * daily['date'].dt.month / 12)
     daily['month_cos'] = np.cos(2 * np.pi * daily['date'].dt.month / 12)
 
-    daily.dropna(inplace=True)
+    return daily.dropna().reset_index(drop=True)
+
+def geo_daily_totals_streaming(by=("state", "district"), chunksize=CHUNKSIZE):
+    """Same as daily_totals_streaming, but one daily series per geography in `by`."""
+    by = list(by)
+    keys = by + ['date']
+    per_source = []
+    for name, candidates in SOURCE_TOTALS.items():
+        total = None
+        for chunk in iter_dataset(name, columns=keys + candidates, chunksize=chunksize):
+            col = _volume_column(name, chunk, candidates)
+            chunk['date'] = pd.to_datetime(chunk['date'])
+            for g in by: chunk[g] = chunk[g].astype(str)
+            day_sum = chunk.groupby(keys)[col].sum()
+            total = day_sum if total is None else total.add(day_sum, fill_value=0)
+        per_source.append(_check_total(name, total))
+
+    daily = pd.concat(per_source, axis=1).fillna(0)
+    daily['raw_footfall'] = daily[list(SOURCE_TOTALS)].sum(axis=1)
+    return daily[['raw_footfall']].reset_index()
+
+def load_tuned_params(path=TUNING_PATH):
+    """Best config from the last tune_forecast.py run, falling back to DEFAULT_PARAMS."""
+    params = dict(DEFAULT_PARAMS)
+    if os.path.exists(path):
+        with open(path) as f:
+            best = json.load(f).get("best", {})
+        params.update({k: best[k] for k in DEFAULT_PARAMS if k in best})
+    return params
+
+def make_xgb(params, n_jobs=-1):
+    return XGBRegressor(
+        n_estimators=params["n_estimators"],
+        learning_rate=params["learning_rate"],
+        max_depth=params["max_depth"],
+        subsample=params["subsample"],
+        colsample_bytree=params["colsample_bytree"],
+        random_state=42,
+        n_jobs=n_jobs
+    )
+
+def make_rf(params, n_jobs=-1):
+    return RandomForestRegressor(n_estimators=params["rf_estimators"], random_state=42, n_jobs=n_jobs)
+
+def fit_ensemble(X_train, y_train, n_jobs=-1, params=None):
+    """XGBoost + RandomForest on the log1p target, wrapped in one artifact (see ensemble.py)."""
+    params = params or load_tuned_params()
+    y_train_log = np.log1p(y_train)
+    model_xgb = make_xgb(params, n_jobs).fit(X_train, y_train_log)
+    model_rf = make_rf(params, n_jobs).fit(X_train, y_train_log)
+    #Averaging the model outputs for optimized output heheh (weights live in the artifact)
+    return build_artifact(model_xgb, model_rf, FEATURES, transform="log1p", weights=params["weights"], params=params)
+
+def train_series(job):
+    """
+    Worker for the geography fan-out: one (geo key, daily frame) in,
+    validation-window forecast rows + MAPE out (None when the series is too short).
+    """
+    geo, series = job
+    # days with no rows in any source are zero footfall, not missing
+    series = series.set_index('date')['raw_footfall']
+    series = series.reindex(pd.date_range(series.index.min(), series.index.max(), freq='D'), fill_value=0)
+    daily = series.rename_axis('date').reset_index()
+    daily['is_weekend'] = daily['date'].dt.dayofweek.isin([5, 6]).astype(int)
+    daily = build_features(daily)
+    if len(daily) < MIN_SERIES_DAYS: return geo, None, None
+
+    split = int(len(daily) * 0.85)
+    train, val = daily.iloc[:split], daily.iloc[split:]
+    # one core per series, the process pool provides the parallelism
+    artifact = fit_ensemble(train[FEATURES], train[TARGET], n_jobs=1)
+    pred = predict(artifact, val[FEATURES])
+    out = val[['date', TARGET]].copy()
+    out['predicted_trend'] = pred
+    return geo, out, mean_absolute_percentage_error(val[TARGET], pred) * 100
+
+def train_geo_models(by=("state", "district"), workers=None, chunksize=CHUNKSIZE):
+    """
+    Trains the XGBoost + RF ensemble for every geography in `by` across a process pool and
+    saves the validation-window forecasts as the partitioned 'forecast_geo' dataset (one part per state).
+    """
+    by = list(by)
+    print(f"Streaming daily totals per {' / '.join(by)}...")
+    try:
+        geo_daily = geo_daily_totals_streaming(by, chunksize)
+    except FileNotFoundError:
+        print(" Error: Datasets not found.")
+        return
 
-    FEATURES = [#Finalizes features for training
-        "is_weekend", "lag_1", "lag_7", "momentum", "volatility",
-        "day_sin", "day_cos", "month_sin", "month_cos"
-    ]
-    TARGET = "target_trend"
+    jobs = [(geo if isinstance(geo, tuple) else (geo,), frame[['date', 'raw_footfall']])
+            for geo, frame in geo_daily.groupby(by, sort=True)]
+    print(f"Training {len(jobs)} series on {workers or os.cpu_count()} processes...")
+
+    outputs, mapes, skipped = [], [], 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for geo, out, mape in pool.map(train_series, jobs, chunksize=max(1, len(jobs) // (8 * (os.cpu_count() or 1)))):
+            if out is None:
+                skipped += 1
+                continue
+            for col, value in zip(by, geo): out[col] = value
+            outputs.append(out)
+            mapes.append(mape)
+
+    if not outputs:
+        print(" Error: No geography had enough history to train on.")
+        return
+    forecasts = pd.concat(outputs, ignore_index=True)[by + ['date', TARGET, 'predicted_trend']]
+    path = write_partitioned(forecasts, 'forecast_geo', by=by[0])
+    print(f"\n Trained {len(outputs)} series ({skipped} skipped, < {MIN_SERIES_DAYS} days)")
+    print(f" Median MAPE: {np.median(mapes):.2f}%")
+    print(f" Saved per-geography forecasts to {path}")
+
+def train_footfall_model(row_join=False, chunksize=CHUNKSIZE):#training the model
+    paths = get_paths()
+    print("Loading datasets...")
+    try:
+        if row_join:
+            daily = daily_totals_from_rows()
+        else:
+            print("Streaming daily totals per source...")
+            daily = daily_totals_streaming(chunksize)
+    except FileNotFoundError:
+        print(" Error: Datasets not found.")
+        return
+
+    print("Engineering Features...")
+    daily = build_features(daily)
 
     X = daily[FEATURES]
     y = daily[TARGET]
@@ -83,46 +257,39 @@ def train_footfall_model():#training the model
 
     print(f"Training Ensemble on {len(X_train)} days...")
 
-    # Log Transform(ye idea ke liye gemini ko thanks!)
-    y_train_log = np.log1p(y_train)
-
-    # XGBoost
-    model_xgb = XGBRegressor(
-        n_estimators=N_ESTIMATORS,
-        learning_rate=LEARNING_RATE,
-        max_depth=MAX_DEPTH,
-        subsample=SUBSAMPLE,
-        colsample_bytree=COLSAMPLE_BYTREE,
-        random_state=42,
-        n_jobs=-1
-    )
-    model_xgb.fit(X_train, y_train_log)
-    preds_log_xgb = model_xgb.predict(X_val)
-
-    # Random Forest(ye wale idea ke liye mujhe thankss hehe)
-    model_rf = RandomForestRegressor(n_estimators=200, random_state=42)
-    model_rf.fit(X_train, y_train_log)
-    preds_log_rf = model_rf.predict(X_val)
-
-    #Averaging the model outputs for optimized output heheh
-    pred_log_final = (0.6 * preds_log_xgb) + (0.4 * preds_log_rf)
-    
-    pred = np.expm1(pred_log_final) 
+    # Log Transform(ye idea ke liye gemini ko thanks!) + XGBoost + Random Forest(ye wale idea ke liye mujhe thankss hehe)
+    artifact = fit_ensemble(X_train, y_train)
+    pred = predict(artifact, X_val)
 
     mape = mean_absolute_percentage_error(y_val, pred) * 100
 
     print("\n MODEL PERFORMANCE (XGBoost + Random Forest)")
     print(f"MAPE : {mape:.2f}%")
-    #saving the xgboost model.
-    os.makedirs(os.path.dirname(paths['model_out']), exist_ok=True)
-    joblib.dump(model_xgb, paths['model_out'])
-    
+    #saving the whole ensemble (both models + weights + target transform) as one file
+    artifact['validation_mape'] = mape
+    # the flattened forests are checked against the models on (a sample of) the training days
+    save_artifact(artifact, paths['model_out'], X_check=X_train.tail(PARITY_ROWS))
+    register('forecast', artifact, kind='forecast', features=FEATURES, metrics={'validation_mape': mape})
+    # rolling window after the last day, so new days can be appended without retraining
+    save_state(state_from_daily(daily))
+
     daily['predicted_trend'] = np.nan
     daily.iloc[split:, daily.columns.get_loc('predicted_trend')] = pred
     #saving the forecast data for frontend
-    output_path = os.path.join(os.path.dirname(paths['model_out']), '../Datasets/forecast_data.csv')
-    daily.to_csv(output_path, index=False)
+    output_path = write_dataset(daily, 'forecast_data')
     print(f"Saved forecast data to {output_path}")
 
 if __name__ == "__main__":
-    train_footfall_model()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Train the footfall forecaster (Model 03)")
+    parser.add_argument("--row-join", action="store_true",
+                        help="build the daily table from the row-level three-way join instead of streaming daily totals")
+    parser.add_argument("--chunksize", type=int, default=CHUNKSIZE, help="rows per chunk when streaming daily totals")
+    parser.add_argument("--by", choices=["state", "district"], default=None,
+                        help="train one forecaster per state or per district instead of the national series")
+    parser.add_argument("--workers", type=int, default=None, help="processes for the per-geography fan-out")
+    args = parser.parse_args()
+    if args.by:
+        by = ("state",) if args.by == "state" else ("state", "district")
+        train_geo_models(by=by, workers=args.workers, chunksize=args.chunksize)
+    else:
+        train_footfall_model(row_join=args.row_join, chunksize=args.chunksize)
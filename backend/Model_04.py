@@ -1,26 +1,96 @@
+import argparse
+import copy
+import tempfile
+import time
 import pandas as pd
 import numpy as np
 from pathlib import Path
-from sklearn.ensemble import RandomForestClassifier
+from sklearn.ensemble import RandomForestClassifier, HistGradientBoostingClassifier
+from sklearn.inspection import permutation_importance
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import accuracy_score, classification_report, confusion_matrix
 import joblib
 import matplotlib.pyplot as plt
 import seaborn as sns
 import os
-
-def train_classifier_rf():
+from storage import DATA_DIR, MODEL_DIR, read_dataset, write_dataset
+from registry import register
+from ensemble import PARITY_ROWS
+
+N_ESTIMATORS = 500
+MAX_DEPTH = 25
+ACCURACY_TOLERANCE = 0.005          # compaction may give up at most 0.5 accuracy points
+COMPACT_TREES = [25, 50, 100, 200]  # tried smallest first
+COMPACT_DEPTHS = [8, 12, 16]
+IMPORTANCE_SAMPLE = 20000           # rows for permutation importance (engine without feature_importances_)
+
+def fit_classifier(engine, X_train, y_train, n_estimators=N_ESTIMATORS, max_depth=MAX_DEPTH, n_jobs=-1):
+    if engine == "hgb":
+        # histogram-binned boosting: features bucketed into 255 bins, trains in a fraction of the RF time
+        model = HistGradientBoostingClassifier(max_iter=200, learning_rate=0.1, max_leaf_nodes=31,
+                                               early_stopping=True, random_state=42)
+    else:
+        model = RandomForestClassifier(
+            n_estimators=n_estimators,
+            max_depth=max_depth,
+            min_samples_split=10,
+            max_features="sqrt",
+            random_state=42,
+            class_weight=None,
+            n_jobs=n_jobs
+        )
+    return model.fit(X_train, y_train)
+
+def benchmark(model, X_val, y_val):
+    """Accuracy plus what serving the model costs: pickle size, load time, predict throughput."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "model.pkl")
+        joblib.dump(model, path)
+        size_mb = os.path.getsize(path) / (1024 * 1024)
+        start = time.perf_counter()
+        joblib.load(path)
+        load_s = time.perf_counter() - start
+    start = time.perf_counter()
+    y_pred = model.predict(X_val)
+    predict_s = time.perf_counter() - start
+    return {"accuracy": accuracy_score(y_val, y_pred), "size_mb": size_mb, "load_s": load_s,
+            "rows_per_s": len(X_val) / max(predict_s, 1e-9)}
+
+def _first_trees(model, n):
+    small = copy.copy(model)
+    small.estimators_ = model.estimators_[:n]
+    small.n_estimators = n
+    return small
+
+def compact_forest(model, X_train, y_train, X_val, y_val, tolerance=ACCURACY_TOLERANCE):
+    """
+    Smallest forest (fewer trees and/or shallower) whose validation accuracy is within
+    `tolerance` of the full model. Each depth is fitted once; tree counts are prefixes of it.
+    """
+    target = accuracy_score(y_val, model.predict(X_val)) - tolerance
+    best, best_size = model, sum(e.tree_.node_count for e in model.estimators_)
+    for depth in COMPACT_DEPTHS + [model.max_depth]:
+        deep = model if depth == model.max_depth else fit_classifier(
+            "rf", X_train, y_train, n_estimators=max(COMPACT_TREES), max_depth=depth)
+        for n in COMPACT_TREES:
+            if n > len(deep.estimators_): break
+            candidate = _first_trees(deep, n)
+            size = sum(e.tree_.node_count for e in candidate.estimators_)
+            if size >= best_size: continue
+            acc = accuracy_score(y_val, candidate.predict(X_val))
+            print(f"   depth={depth} trees={n}: acc {acc*100:.2f}%, {size} nodes")
+            if acc >= target:
+                best, best_size = candidate, size
+    return best
+
+def train_classifier_rf(engine="rf", compact=False, tolerance=ACCURACY_TOLERANCE):
     # 1. Setup Paths
-    base = 'backend/' if os.path.exists('backend/Datasets') else ''
-    if not os.path.exists(os.path.join(base, 'Datasets')): base = '../backend/'
-    
-    DATA_FILE = os.path.join(base, "Datasets/master_data_model_04.csv")
-    MODEL_OUT = os.path.join(base, "Models/model_classifier_rf.pkl")
-    PLOT_OUT = os.path.join(base, "Datasets/classifier_matrix.png")
+    MODEL_OUT = os.path.join(MODEL_DIR, "model_classifier_rf.pkl")
+    PLOT_OUT = os.path.join(DATA_DIR, "classifier_matrix.png")
     
     print("Loading Master Dataset...")
     try:
-        df = pd.read_csv(DATA_FILE)
+        df = read_dataset('master_data_model_04')
     except FileNotFoundError:
         print(" Error: Master file missing.")
         return
@@ -86,18 +156,18 @@ def train_classifier_rf():
         X, y, test_size=0.2, random_state=42, stratify=y
     )
 
-    # 5. Training Random Forest
-    print("Training Random Forest...")
-    model = RandomForestClassifier(
-        n_estimators=500, 
-        max_depth=25, 
-        min_samples_split=10,
-        max_features="sqrt",
-        random_state=42,
-        class_weight=None
-    )
+    # 5. Training (all cores; --engine hgb for histogram boosting)
+    print("Training Random Forest..." if engine == "rf" else "Training HistGradientBoosting...")
+    start = time.perf_counter()
+    model = fit_classifier(engine, X_train, y_train)
+    print(f" Fit in {time.perf_counter() - start:.1f}s")
+    report = {"full": benchmark(model, X_val, y_val)}
 
-    model.fit(X_train, y_train)
+    if compact and engine == "rf":
+        print(f"Compacting (tolerance {tolerance*100:.2f} accuracy points)...")
+        model = compact_forest(model, X_train, y_train, X_val, y_val, tolerance)
+        print(f" Kept {len(model.estimators_)} trees, max_depth={model.max_depth}")
+        report["compacted"] = benchmark(model, X_val, y_val)
 
     # 6. Evaluation
     y_pred = model.predict(X_val)
@@ -105,13 +175,24 @@ def train_classifier_rf():
 
     print(f"\n--- MODEL PERFORMANCE ---")
     print(f"Achieved Accuracy: {accuracy*100:.2f}%")
+    print(f"{'model':<12}{'accuracy':>10}{'size MB':>10}{'load s':>9}{'rows/s':>12}")
+    for name, r in report.items():
+        print(f"{name:<12}{r['accuracy']*100:>9.2f}%{r['size_mb']:>10.1f}{r['load_s']:>9.3f}{r['rows_per_s']:>12.0f}")
     print("\nDetailed Report:")
     print(classification_report(y_val, y_pred))
 
     # Feature Importance (Insights for  frontend dashboard)
+    if hasattr(model, "feature_importances_"):
+        scores = model.feature_importances_
+    else:
+        # boosting has no impurity importances: use the accuracy drop when a feature is shuffled
+        sample = X_val.sample(min(IMPORTANCE_SAMPLE, len(X_val)), random_state=42)
+        scores = permutation_importance(model, sample, y_val.loc[sample.index], n_repeats=3,
+                                        random_state=42, n_jobs=-1).importances_mean.clip(min=0)
+        scores = scores / scores.sum() if scores.sum() > 0 else scores
     importances = pd.DataFrame({
         "Feature": final_features,
-        "Importance": model.feature_importances_
+        "Importance": scores
     }).sort_values(by="Importance", ascending=False)
 
     print("\nTop Performance Drivers:")
@@ -119,13 +200,14 @@ def train_classifier_rf():
     # 7. Saving (Crucial for Dashboard)
     os.makedirs(os.path.dirname(MODEL_OUT), exist_ok=True)
     joblib.dump(model, MODEL_OUT)
-    INSIGHTS_PATH = os.path.join(base, "Datasets/model_04_insights.csv")
-    importances.to_csv(INSIGHTS_PATH, index=False)
+    register('classifier', model, kind='classifier', features=final_features, sample=X_train.head(PARITY_ROWS),
+             metrics={'accuracy': accuracy, 'engine': engine, **{f"{k}_{name}": v for name, r in report.items() for k, v in r.items()}})
+    INSIGHTS_PATH = write_dataset(importances, 'model_04_insights')
     print(f" Insights Saved: {INSIGHTS_PATH}")
     # Save Matrix Plot
     plt.figure(figsize=(6, 5))
     sns.heatmap(confusion_matrix(y_val, y_pred), annot=True, fmt='d', cmap='Greens')
-    plt.title(f'RF Classification (Acc: {accuracy:.2f})')
+    plt.title(f'{"RF" if engine == "rf" else "HGB"} Classification (Acc: {accuracy:.2f})')
     plt.ylabel('Actual')
     plt.xlabel('Predicted')
     plt.tight_layout()
@@ -134,4 +216,12 @@ def train_classifier_rf():
     print(f"\n Model Saved: {MODEL_OUT}")
     print(f" Confusion Matrix Saved: {PLOT_OUT}")
 if __name__ == "__main__":
-    train_classifier_rf()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Train the performance classifier (Model 04)")
+    parser.add_argument("--engine", choices=["rf", "hgb"], default="rf",
+                        help="rf = RandomForest (default), hgb = HistGradientBoosting (binned, much faster to fit and load)")
+    parser.add_argument("--compact", action="store_true",
+                        help="drop trees / limit depth of the forest while staying within --tolerance of its accuracy")
+    parser.add_argument("--tolerance", type=float, default=ACCURACY_TOLERANCE,
+                        help="max accuracy (0-1) compaction may give up")
+    args = parser.parse_args()
+    train_classifier_rf(engine=args.engine, compact=args.compact, tolerance=args.tolerance)
\ No newline at end of file
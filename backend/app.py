@@ -1,15 +1,20 @@
 import os
-import json
-import joblib
 import pandas as pd
-import numpy as np
-import random
-import hashlib
 import time
-from flask import Flask, jsonify, request
+import tempfile
+import threading
+from flask import Flask, Response, jsonify, request, send_file, stream_with_context
 from flask_cors import CORS
 from dotenv import load_dotenv
 from report import generate_ai_report 
+from report_cache import get_report, request_report
+from storage import read_dataset, dataset_exists, find_dataset
+from model_loader import MODEL_LOADERS, load_model_group
+from geo import load_table as load_geo_table, map_points
+from simulation import CHUNK_ROWS, RunningStats, ndjson, normalize_columns, run_models, to_payload
+from response_cache import cached_get, dataset_version
+from hot_reload import start_watcher
+import jobs
 
 load_dotenv()
 app = Flask(__name__)
@@ -19,140 +24,217 @@ CORS(app, resources={r"/api/*": {"origins": "*"}})
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_DIR = os.path.join(BASE_DIR, "Datasets")
 MODEL_DIR = os.path.join(BASE_DIR, "Models")
+# load datasets + models on a background thread at startup (0 = load on the first /api/simulate, as before)
+EAGER_LOAD = os.getenv("AADHAAR_EAGER_LOAD", "1") != "0"
 
 #Cache
+# DATA / MODELS (+ their versions) are immutable snapshots: loads build new dicts and rebind the globals,
+# and each request reads the global once, so it finishes on the snapshot it started with.
 MODELS = {}
+MODEL_VERSIONS = {}
 DATA = {}
+DATA_VERSIONS = {}  # DATA key -> fingerprint of the file it was read from (ETags of the GET endpoints)
+# warm-up bookkeeping for /api/ready; model entries are only ever replaced, never added, after startup
+READINESS = {
+    "datasets": {"state": "pending"},
+    "models": {name: {"state": "pending"} for name in ("sentinel", "pulse", "forecast", "classifier")},
+}
+LOAD_LOCK = threading.Lock()
+MODELS_READY = threading.Event()
 REPORT_CACHE = {"timestamp": 0, "data": None}
 CACHE_DURATION = 3600
+# seconds between checks of Datasets/ and Models/ for retrained artifacts (0 = never reload)
+RELOAD_INTERVAL = float(os.getenv("AADHAAR_RELOAD_INTERVAL", "30"))
+# rows per chunk for streamed /api/simulate uploads (?stream=1 or Accept: application/x-ndjson)
+SIMULATE_CHUNK_ROWS = int(os.getenv("AADHAAR_SIMULATE_CHUNK_ROWS", CHUNK_ROWS))
+NDJSON = "application/x-ndjson"
 
-STATE_CENTERS = {
-    "Uttar Pradesh": {"lat": 26.8467, "lng": 80.9462},
-    "Maharashtra": {"lat": 19.7515, "lng": 75.7139},
-    "Karnataka": {"lat": 15.3173, "lng": 75.7139},
-    "Delhi": {"lat": 28.7041, "lng": 77.1025},
-    "Tamil Nadu": {"lat": 11.1271, "lng": 78.6569},
-    "Gujarat": {"lat": 22.2587, "lng": 71.1924},
-    "West Bengal": {"lat": 22.9868, "lng": 87.8550},
-    "Rajasthan": {"lat": 27.0238, "lng": 74.2179},
-    "Bihar": {"lat": 25.0961, "lng": 85.3131},
-    "Madhya Pradesh": {"lat": 22.9734, "lng": 78.6569},
-    "DEFAULT": {"lat": 20.5937, "lng": 78.9629}
+# only the columns each endpoint needs; works for CSV or Parquet artifacts
+DATASETS = {
+    "forecast": ("forecast_data", ["date", "target_trend", "predicted_trend"]),
+    "forecast_geo": ("forecast_geo", ["state", "district", "date", "target_trend", "predicted_trend"]),
+    "clusters": ("scored_pulse_data", ["state", "district", "cluster_name", "labor_intensity_score"]),
+    "insights": ("model_04_insights", None),
+    "anomalies": ("anomalies_data", ["state", "district", "risk_score", "anomaly_label"]),
 }
 
-def jitter(value): 
-    return value + random.uniform(-0.15, 0.15)
+def read_datasets(keys, data, versions):
+    """Reads DATASETS[keys] into the (new) data / versions dicts; missing datasets are dropped."""
+    for key in keys:
+        name, columns = DATASETS[key]
+        if dataset_exists(name, DATA_DIR):
+            versions[key] = dataset_version(name, DATA_DIR)
+            data[key] = read_dataset(name, columns=columns, data_dir=DATA_DIR)
+        else:
+            data.pop(key, None)
+            versions.pop(key, None)
+    # district -> coordinates table, built + saved on the first start (see geo.py)
+    load_geo_table([data[k] for k in ("clusters", "anomalies") if k in data], data_dir=DATA_DIR)
 
-def get_smart_coords(state, district):
-    """
-    Deterministically generates coordinates for a district near its state center 
-    using a hash of the district name, so the map pins stay consistent.
-    """
-    dist_str = str(district)
-    base = STATE_CENTERS.get(state, STATE_CENTERS["DEFAULT"])
-    h = int(hashlib.md5(dist_str.encode()).hexdigest(), 16)
-    return {
-        "lat": base["lat"] + ((h % 1000)/1000.0 * 3.0 - 1.5),
-        "lng": base["lng"] + (((h // 1000)%1000)/1000.0 * 3.0 - 1.5)
-    }
-def load_resources():
-    print("Loading Static Datasets...")
+def load_resources(keys=None):
+    global DATA, DATA_VERSIONS
+    print("Loading Static Datasets..." if keys is None else f"Reloading datasets: {', '.join(keys)}")
+    start = time.perf_counter()
+    data, versions = dict(DATA), dict(DATA_VERSIONS)
     try:
-        if os.path.exists(os.path.join(DATA_DIR, "forecast_data.csv")):
-            DATA["forecast"] = pd.read_csv(os.path.join(DATA_DIR, "forecast_data.csv"))
-        if os.path.exists(os.path.join(DATA_DIR, "scored_pulse_data.csv")):
-            DATA["clusters"] = pd.read_csv(os.path.join(DATA_DIR, "scored_pulse_data.csv"))
-        if os.path.exists(os.path.join(DATA_DIR, "model_04_insights.csv")):
-            DATA["insights"] = pd.read_csv(os.path.join(DATA_DIR, "model_04_insights.csv"))
-        if os.path.exists(os.path.join(DATA_DIR, "anomalies_data.csv")):
-            DATA["anomalies"] = pd.read_csv(os.path.join(DATA_DIR, "anomalies_data.csv"))
+        read_datasets(keys or list(DATASETS), data, versions)
+        DATA, DATA_VERSIONS = data, versions
         print(" Resources Loaded Successfully.")
+        READINESS["datasets"] = {"state": "ready", "load_seconds": round(time.perf_counter() - start, 3),
+                                 "rows": {key: len(df) for key, df in data.items()}}
     except Exception as e:
+        # a failed reload keeps serving the previous snapshot
         print(f" Error Loading Resources: {e}")
+        if keys is None: READINESS["datasets"] = {"state": "failed", "error": str(e)}
+
+def load_models(names=None):
+    """
+    Loads + warms the models (all of them the first time, once; concurrent callers wait for it)
+    into a new snapshot, then swaps it in. names= reloads just those on top of the current one.
+    """
+    global MODELS, MODEL_VERSIONS
+    if names is None and MODELS_READY.is_set(): return
+    with LOAD_LOCK:
+        if names is None and MODELS_READY.is_set(): return
+        print("Loading AI Models into Memory..." if names is None else f"Reloading models: {', '.join(names)}")
+        models, versions = dict(MODELS), dict(MODEL_VERSIONS)
+        for name in names or MODEL_LOADERS:
+            if names is None: READINESS["models"][name] = {"state": "loading"}
+            status = load_model_group(name, models, versions)
+            # a failed reload keeps serving the previous model, and says so
+            if status["state"] == "ready" or names is None:
+                READINESS["models"][name] = status
+            else:
+                READINESS["models"][name] = dict(READINESS["models"][name], reload_error=status["error"])
+        MODELS, MODEL_VERSIONS = models, versions
+        MODELS_READY.set()
+        failed = [n for n, r in READINESS["models"].items() if r["state"] == "failed"]
+        print("All Models Loaded Successfully." if not failed else f"Models loaded, failed: {', '.join(failed)}")
+
+def watched_artifacts():
+    """{group: [paths]} for the hot-reload watcher: one group per dataset and per model."""
+    groups = {}
+    for key, (name, _) in DATASETS.items():
+        path = find_dataset(name, DATA_DIR)
+        groups[f"data:{key}"] = [path] if path else []
+    for name, (_, _, files) in MODEL_LOADERS.items():
+        groups[f"model:{name}"] = files
+    return groups
+
+def reload_changed(groups):
+    datasets = [g.split(":", 1)[1] for g in groups if g.startswith("data:")]
+    models = [g.split(":", 1)[1] for g in groups if g.startswith("model:")]
+    if datasets: load_resources(datasets)
+    if models: load_models(models)
+    READINESS["last_reload"] = {"at": time.strftime("%Y-%m-%dT%H:%M:%S"), "changed": groups}
+
+def warm_up():
+    load_resources()
+    load_models()
+    if RELOAD_INTERVAL > 0:
+        start_watcher(watched_artifacts, reload_changed, RELOAD_INTERVAL)
 
-def load_models():
-    if not MODELS:
-        print("Loading AI Models into Memory...")
-        try:
-            MODELS['sentinel'] = joblib.load(os.path.join(MODEL_DIR, 'model_sentinel.pkl'))
-            MODELS['pulse'] = joblib.load(os.path.join(MODEL_DIR, 'model_pulse_kmeans.pkl'))
-            MODELS['scaler'] = joblib.load(os.path.join(MODEL_DIR, 'model_pulse_scaler.pkl'))
-            MODELS['forecast_xgb'] = joblib.load(os.path.join(MODEL_DIR, 'footfall_forecast_xgb.pkl'))
-            MODELS['forecast_rf'] = joblib.load(os.path.join(MODEL_DIR, 'footfall_forecast_rf.pkl'))
-            MODELS['classifier'] = joblib.load(os.path.join(MODEL_DIR, 'model_classifier_rf.pkl'))
-            
-            print("All Models Loaded Successfully.")
-        except Exception as e:
-            print(f"CRITICAL WARNING: Could not load some models. {e}")
-
-load_resources()
+if __name__ == "__mp_main__":
+    pass  # `python app.py` re-imported inside a job worker (spawn): it only needs jobs.py, not the server's data
+elif EAGER_LOAD:
+    threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
+else:
+    load_resources()
 
 # API ENDPOINTS
 
+def data_version(*keys):
+    return "|".join(f"{k}={DATA_VERSIONS.get(k)}" for k in keys)
+
 @app.route("/", methods=["GET"])
 def health(): 
-    return jsonify({"status": "online", "models_loaded": len(MODELS) > 0})
+    return jsonify({"status": "online", "models_loaded": len(MODELS) > 0, "model_versions": MODEL_VERSIONS})
+
+# Readiness for the load balancer: 503 until datasets + models are loaded and warmed, then 200
+# (a model that failed to load is reported, it doesn't hold the instance back forever).
+# With AADHAAR_EAGER_LOAD=0 the models only load on the first /api/simulate, so the datasets are enough.
+@app.route("/api/ready", methods=["GET"])
+def readiness():
+    ready = (MODELS_READY.is_set() or not EAGER_LOAD) and READINESS["datasets"]["state"] != "pending"
+    return jsonify({"ready": ready, "lazy_models": not EAGER_LOAD, "datasets": READINESS["datasets"],
+                    "models": READINESS["models"], "model_versions": MODEL_VERSIONS}), 200 if ready else 503
 
 # 1. Forecast data (Graph)
+# ?state=...&district=... switches to the per-geography forecasts (Model_03.py --by state|district)
 @app.route('/api/forecast', methods=['GET'])
+@cached_get(lambda: data_version("forecast", "forecast_geo"))
 def get_forecast():
-    if 'forecast' not in DATA: return jsonify([]), 404
-    df = DATA['forecast'].rename(columns={'target_trend':'Actual', 'predicted_trend':'Predicted'})
-    return jsonify(df[['date','Actual','Predicted']].dropna().tail(60).to_dict(orient='records'))
+    data = DATA  # one snapshot for the whole request
+    state = request.args.get('state')
+    district = request.args.get('district')
+    if state or district:
+        if 'forecast_geo' not in data: return jsonify([]), 404
+        df = data['forecast_geo']
+        if state: df = df[df['state'].astype(str) == state]
+        if district:
+            if 'district' not in df.columns: return jsonify([]), 404
+            df = df[df['district'].astype(str) == district]
+        elif 'district' in df.columns:
+            # whole state: add up its districts. Each district has its own validation split, so on a given
+            # date only some of them carry a prediction; sum both columns over those same districts
+            df = df.dropna(subset=['predicted_trend'])
+            df = df.groupby('date', as_index=False)[['target_trend', 'predicted_trend']].sum(min_count=1)
+        if df.empty: return jsonify([]), 404
+    else:
+        if 'forecast' not in data: return jsonify([]), 404
+        df = data['forecast']
+    df = df.rename(columns={'target_trend':'Actual', 'predicted_trend':'Predicted'})
+    df = df[['date','Actual','Predicted']].dropna().sort_values('date').tail(60)
+    df['date'] = pd.to_datetime(df['date']).dt.strftime('%Y-%m-%d')
+    return jsonify(df.to_dict(orient='records'))
     #last ke 60 days return kre hain for cleaner data
 
 # 2. Cluster map (Model 2)
 @app.route("/api/clusters", methods=["GET"])
+@cached_get(lambda: data_version("clusters"))
 def get_clusters():
-    if "clusters" not in DATA: return jsonify([])
+    data = DATA
+    if "clusters" not in data: return jsonify([])
     # Sample to avoid overloading the frontend map
-    df = DATA["clusters"].sample(min(len(DATA["clusters"]), 5000), random_state=42)
-    points = []
-    for _, row in df.iterrows():
-        c = get_smart_coords(str(row.get("state")), str(row.get("district")))
-        points.append({
-            "lat": jitter(c["lat"]), 
-            "lng": jitter(c["lng"]),
-            "cluster_name": row.get("cluster_name"),
-            "intensity": row.get("labor_intensity_score"),
-            "district": row.get("district")
-        })
-    return jsonify(points)
+    df = data["clusters"].sample(min(len(data["clusters"]), 5000), random_state=42)
+    return jsonify(map_points(df, {
+        "cluster_name": ("cluster_name", None, None),
+        "intensity": ("labor_intensity_score", 0, float),
+        "district": ("district", None, None),
+    }, seed=42))
 
 # 3. Insights (Model 4 Feature Importance)
 @app.route("/api/insights", methods=["GET"])
+@cached_get(lambda: data_version("insights"))
 def get_insights():
-    if "insights" not in DATA: return jsonify([])
-    return jsonify(DATA["insights"].rename(columns={"Feature":"feature", "Importance":"importance"}).to_dict(orient="records"))
+    data = DATA
+    if "insights" not in data: return jsonify([])
+    return jsonify(data["insights"].rename(columns={"Feature":"feature", "Importance":"importance"}).to_dict(orient="records"))
 
 # 4. Anomaly heatmap(Model 1)
 @app.route("/api/anomalies", methods=["GET"])
+@cached_get(lambda: data_version("anomalies"))
 def get_anomalies():
-    if "anomalies" not in DATA: return jsonify([])
-    df = DATA["anomalies"]
+    data = DATA
+    if "anomalies" not in data: return jsonify([])
+    df = data["anomalies"]
     anomalies = df[
         (df["anomaly_label"] == -1) & 
         (df["risk_score"] > 60.00)
-    ].sample(min(len(df), 500), random_state=42)
+    ]
+    anomalies = anomalies.sample(min(len(anomalies), 500), random_state=42)
     
-    alerts = []
-    for _, row in anomalies.iterrows():
-        state = str(row.get("state", "Uttar Pradesh"))
-        district = str(row.get("district", "Unknown"))
-        center = get_smart_coords(state, district)
-        alerts.append({
-            "lat": jitter(center["lat"]),
-            "lng": jitter(center["lng"]),
-            "score": float(row.get("risk_score", 0)),
-            "district": district,
-            "state": state
-        })
-    return jsonify(alerts)
+    return jsonify(map_points(anomalies, {
+        "score": ("risk_score", 0, float),
+        "district": ("district", "Unknown", str),
+        "state": ("state", "Uttar Pradesh", str),
+    }, state_default="Uttar Pradesh", seed=42))
 
 # 5. GENERATE REPORT (LLM abhi ke liye gemini hi h, Fine tuned LLM abhi configure nhi hua h pura
 @app.route("/api/generate_report", methods=["GET"])
 def generate_report_route():
     global REPORT_CACHE
+    data = DATA
     current_time = time.time()
     
     # Check Cache
@@ -160,12 +242,12 @@ def generate_report_route():
         print(f" Serving Report from Cache (Expires in {int(CACHE_DURATION - (current_time - REPORT_CACHE['timestamp']))}s)")
         return jsonify(REPORT_CACHE["data"])
     
-    if "clusters" not in DATA or "anomalies" not in DATA: 
+    if "clusters" not in data or "anomalies" not in data: 
         return jsonify({"error": "Data not available"}), 500
 
     try:
-        df_clusters = DATA["clusters"]
-        df_anomalies = DATA["anomalies"]
+        df_clusters = data["clusters"]
+        df_anomalies = data["anomalies"]
         
         avg_labor = df_clusters["labor_intensity_score"].mean()
         high_risk_count = len(df_anomalies[df_anomalies["anomaly_label"] == -1])
@@ -190,156 +272,92 @@ def generate_report_route():
         return jsonify({"error": str(e)}), 500
 
 # 6. LIVE SIMULATION
+def report_handle(stats_context):
+    """Report fields for a simulate response: the text on a cache hit, otherwise where to fetch it once written."""
+    handle = request_report(stats_context)
+    return {"report": handle.get("report"), "report_id": handle["id"], "report_status": handle["state"],
+            "report_url": f"/api/reports/{handle['id']}"}
+
+def chunk_rows_arg():
+    """?chunk_rows= as a whole number >= 1 (default SIMULATE_CHUNK_ROWS); ValueError otherwise."""
+    value = request.args.get("chunk_rows", SIMULATE_CHUNK_ROWS)
+    try:
+        chunk_rows = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"chunk_rows must be a whole number, got {value!r}")
+    if chunk_rows < 1:
+        raise ValueError(f"chunk_rows must be at least 1, got {chunk_rows}")
+    return chunk_rows
+
+def wants_stream():
+    # opt-in: ?stream=1 or Accept: application/x-ndjson; the dashboard still gets one JSON document
+    return request.args.get("stream") == "1" or request.accept_mimetypes.best == NDJSON
+
+def stream_simulation(file, models, chunk_rows):
+    """
+    NDJSON: one {"type": "chunk"} line per chunk_rows rows of the upload (predictions + map points),
+    then a {"type": "summary"} line with the row count and the report. Only one chunk is in memory at a time.
+    """
+    stats = RunningStats()
+    try:
+        for index, chunk in enumerate(pd.read_csv(file, chunksize=chunk_rows)):
+            results_df, timings = run_models(normalize_columns(chunk), models)
+            stats.update(results_df, timings)
+            yield ndjson({"type": "chunk", "index": index, "rows": len(results_df), "timings": timings,
+                          **to_payload(results_df)})
+        yield ndjson({"type": "summary", "rows": stats.rows, "high_risk": stats.high_risk, "timings": stats.timings,
+                      **report_handle(stats.context()), "status": "success"})
+        print(f"Success: Streamed {stats.rows} rows.")
+    except Exception as e:
+        import traceback
+        print(traceback.format_exc())
+        # headers are long gone, so the error travels as the last line
+        yield ndjson({"type": "error", "error": f"Simulation Failed: {str(e)}", "rows": stats.rows})
+    finally:
+        file.close()
+
 @app.route("/api/simulate", methods=["POST"])
 def simulate_performance():
     load_models() 
+    models = MODELS  # one snapshot for the whole request
     try:
         if 'file' not in request.files: 
             return jsonify({"error": "No file detected"}), 400
         file = request.files['file']
+
+        if wants_stream():
+            # checked before the 200 goes out, afterwards an error can only be the stream's last line
+            try:
+                chunk_rows = chunk_rows_arg()
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+            # flask closes request.files as soon as the view returns, before the body is streamed,
+            # so the rows are read from our own spooled copy (copied in blocks, not loaded whole)
+            upload = tempfile.TemporaryFile()
+            file.save(upload)
+            upload.seek(0)
+            return Response(stream_with_context(stream_simulation(upload, models, chunk_rows)), mimetype=NDJSON)
         
         # 2. Reading and cleaning
-        raw_df = pd.read_csv(file)
-        raw_df.columns = [c.strip().lower() for c in raw_df.columns]
-        results_df = raw_df.copy()
-        
-        # Helper function for 
-        def get_col(df, names, default=0):
-            for name in names:
-                if name in df.columns: return df[name].fillna(default)
-            return pd.Series([default]*len(df))
-
-        #Model 01
-        features_m1 = ['infiltration_index', 'birth_index', 'correction_index']
-        X_anom = pd.DataFrame({
-            'infiltration_index': get_col(raw_df, ['infiltration_index', 'infiltration']),
-            'Birth_index': get_col(raw_df, ['birth_index', 'births', 'birth']),
-            'correction_index': get_col(raw_df, ['correction_index', 'correction', 'updates'])
-        })
-        
-        if 'sentinel' in MODELS:
-            raw_scores = MODELS['sentinel'].decision_function(X_anom)
-            # Normalized scores
-            results_df['risk_score'] = np.round(100 * (raw_scores.max() - raw_scores) / (raw_scores.max() - raw_scores.min() + 1e-6), 2)
-            results_df['is_anomaly'] = MODELS['sentinel'].predict(X_anom)
-            results_df['anomaly_status'] = np.where(results_df['is_anomaly'] == -1, "High Risk", "Normal")
-
-        # Model02
-        X_clus = pd.DataFrame({
-            'labor_intensity_score': get_col(raw_df, ['labor_intensity_score', 'labor']),
-            'mobility_index': get_col(raw_df, ['mobility_index', 'mobility']),
-            'child_compliance_ratio': get_col(raw_df, ['child_compliance_ratio', 'child_compliance'])
-        })
-        
-        if 'pulse' in MODELS and 'scaler' in MODELS:
-            X_clus_scaled = MODELS['scaler'].transform(X_clus)
-            results_df['cluster_id'] = MODELS['pulse'].predict(X_clus_scaled)
-            
-            def get_cluster_name(row):
-                if row['mobility_index'] > row['labor_intensity_score']: return "Urban / Digital Hub"
-                elif row['labor_intensity_score'] > 0.6: return "Manual Labor Zone"
-                else: return "Evolving / Mixed"
-            
-            results_df['cluster_name'] = X_clus.apply(get_cluster_name, axis=1)
-
-        # --- model03 
-        if 'forecast_xgb' in MODELS and 'forecast_rf' in MODELS:
-            # Prepare Time Features
-            if 'date' in raw_df.columns:
-                dates = pd.to_datetime(raw_df['date'])
-                day_sin = np.sin(2 * np.pi * dates.dt.dayofweek / 7)
-                day_cos = np.cos(2 * np.pi * dates.dt.dayofweek / 7)
-                month_sin = np.sin(2 * np.pi * dates.dt.month / 12)
-                month_cos = np.cos(2 * np.pi * dates.dt.month / 12)
-            else:
-                day_sin, day_cos, month_sin, month_cos = 0, 0, 0, 0
-                
-            trend = get_col(raw_df, ['target_trend', 'total_enrolment'], 0)
-            X_fore = pd.DataFrame({
-                "is_weekend": get_col(raw_df, ['is_weekend'], 0),
-                "lag_1": trend, "lag_7": trend, 
-                "momentum": 1.0, "volatility": 0.0,
-                "day_sin": day_sin, "day_cos": day_cos,
-                "month_sin": month_sin, "month_cos": month_cos
-            })
-            
-            pred_log_xgb = MODELS['forecast_xgb'].predict(X_fore)
-            pred_log_rf = MODELS['forecast_rf'].predict(X_fore)
-            pred_log_final = (0.6 * pred_log_xgb) + (0.4 * pred_log_rf)
-            results_df['forecasted_footfall'] = np.round(np.expm1(pred_log_final), 2)
-
-        # model 04 
-        # --- MODEL 4: CLASSIFIER ---
-        if 'classifier' in MODELS:
-            labor = get_col(raw_df, ['labor_intensity_score', 'labor'])
-            mobility = get_col(raw_df, ['mobility_index', 'mobility'])
-            efficiency = labor * (mobility + 1)
-            
-            X_class = pd.DataFrame({
-                "labor": labor,                
-                "mobility": mobility,           
-                "infiltration": get_col(raw_df, ['infiltration_index', 'infiltration']), 
-                "weekend": get_col(raw_df, ['is_weekend'], 0),
-                "workload_efficiency": efficiency
-            })
-            X_class.fillna(0, inplace=True)
-            
-            probs = MODELS['classifier'].predict_proba(X_class)[:, 1]
-            results_df['success_probability'] = np.round(probs * 100, 2)
-            results_df['performance_label'] = np.where(probs > 0.65, "High Performer", "Needs Improvement")
-        
-        # 1. Map Data: Anomalies Only
-        anomalies_map = []
-        for _, row in results_df[results_df['anomaly_status'] == 'High Risk'].iterrows():
-            coords = get_smart_coords(str(row.get('state', 'DEFAULT')), str(row.get('district', 'Unknown')))
-            anomalies_map.append({
-                "lat": jitter(coords["lat"]),
-                "lng": jitter(coords["lng"]),
-                "district": row.get('district', 'Unknown'),
-                "risk_score": float(row.get('risk_score', 0)),
-                "state": row.get('state', 'Unknown')
-            })
-
-        # 2. Map Data: Clusters Only
-        clusters_map = []
-        for _, row in results_df.iterrows():
-            coords = get_smart_coords(str(row.get('state', 'DEFAULT')), str(row.get('district', 'Unknown')))
-            clusters_map.append({
-                "lat": jitter(coords["lat"]),
-                "lng": jitter(coords["lng"]),
-                "district": row.get('district', 'Unknown'),
-                "cluster_name": row.get('cluster_name', 'Unknown'),
-                "labor_intensity": float(row.get('labor_intensity_score', 0))
-            })
-
-        # 3. Generating Report
-        avg_success = results_df.get('success_probability', pd.Series([0])).mean()
-        high_risk_count = len(results_df[results_df['anomaly_status'] == 'High Risk'])
-        forecast_avg = results_df.get('forecasted_footfall', pd.Series([0])).mean()
-
-        #the context string for the LLM
-        stats_context = (
-            f"Simulated {len(results_df)} districts. "
-            f"Average Success Probability: {avg_success:.2f}%. "
-            f"High Risk Anomalies Detected: {high_risk_count}. "
-            f"Projected Footfall Avg: {forecast_avg:.0f}."
-        )
-        ai_report_string = generate_ai_report(stats_context)
+        raw_df = normalize_columns(pd.read_csv(file))
+        results_df, timings = run_models(raw_df, models)
+        payload = to_payload(results_df)
+
+        # 3. Report: written in the background (LLM call takes longer than the models), fetched from report_url
+        stats = RunningStats()
+        stats.update(results_df)
 
         # 4. Final response 
         response_payload = {
-            # Main data for tables/graphs (includes success_probability, forecasted_footfall)
-            "predictions": results_df.replace({np.nan: None}).to_dict(orient='records'),
-            # Map 1 Data
-            "anomalies_map": anomalies_map,
-            # Map 2 Data
-            "clusters_map": clusters_map,
-            # String for the Report Section
-            "report": ai_report_string,
+            **payload,
+            # String for the Report Section (None until ready, then GET report_url)
+            **report_handle(stats.context()),
+            # seconds per model stage (they run concurrently, so total ~ the slowest one)
+            "timings": timings,
             "status": "success"
         }
 
-        print(f"Success: Processed {len(results_df)} rows. Sending {len(anomalies_map)} anomalies and {len(clusters_map)} cluster points.")
+        print(f"Success: Processed {len(results_df)} rows. Sending {len(payload['anomalies_map'])} anomalies and {len(payload['clusters_map'])} cluster points.")
         return jsonify(response_payload)
 
     except Exception as e:
@@ -347,6 +365,45 @@ def simulate_performance():
         print(traceback.format_exc())
         return jsonify({"error": f"Simulation Failed: {str(e)}"}), 500
 
+# Simulation reports (see report_cache.py): 202 while being written, 200 with the text once done
+@app.route("/api/reports/<report_id>", methods=["GET"])
+def fetch_report(report_id):
+    entry = get_report(report_id)
+    if entry is None: return jsonify({"error": "Unknown or expired report"}), 404
+    if entry["state"] == "failed": return jsonify(entry), 500
+    return jsonify(entry), 200 if entry["state"] == "done" else 202
+
+# 7. Async simulation jobs: submit -> poll -> fetch, run on a local process pool (see jobs.py)
+@app.route("/api/jobs", methods=["POST"])
+def submit_job():
+    if 'file' not in request.files:
+        return jsonify({"error": "No file detected"}), 400
+    try:
+        chunk_rows = chunk_rows_arg()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        status = jobs.submit(request.files['file'], chunk_rows)
+    except jobs.QueueFull as e:
+        return jsonify({"error": str(e)}), 429
+    job_id = status["id"]
+    return jsonify({**status, "status_url": f"/api/jobs/{job_id}", "result_url": f"/api/jobs/{job_id}/result"}), 202
+
+@app.route("/api/jobs/<job_id>", methods=["GET"])
+def job_status(job_id):
+    status = jobs.read_status(job_id)
+    if status is None: return jsonify({"error": "Unknown job"}), 404
+    return jsonify(status)
+
+@app.route("/api/jobs/<job_id>/result", methods=["GET"])
+def job_result(job_id):
+    status = jobs.read_status(job_id)
+    if status is None: return jsonify({"error": "Unknown job"}), 404
+    if status["state"] == "failed": return jsonify(status), 500
+    if status["state"] != "done": return jsonify(status), 409
+    # same NDJSON lines as /api/simulate?stream=1, streamed from disk
+    return send_file(jobs.result_path(job_id), mimetype=NDJSON, conditional=True)
+
 if __name__ == "__main__":
     print("Starting Flask Server...")
     app.run(debug=True, port=5000)
\ No newline at end of file
@@ -0,0 +1,336 @@
+import os
+import json
+import time
+import pickle
+import joblib
+import numpy as np
+import pandas as pd
+
+ARTIFACT_VERSION = 1
+WEIGHTS = {"xgb": 0.6, "rf": 0.4}
+# inverse of the transform applied to the target before fitting
+INVERSE_TRANSFORMS = {"log1p": np.expm1, "identity": lambda v: v}
+BATCH_ROWS = 512   # rows per vectorized traversal (works on BATCH_ROWS x n_trees node ids at once)
+
+
+def build_artifact(model_xgb, model_rf, features, transform="log1p", weights=WEIGHTS, **meta):
+    """Everything needed to reproduce the forecast in one picklable dict."""
+    return {
+        "version": ARTIFACT_VERSION,
+        "features": list(features),
+        "weights": dict(weights),
+        "transform": transform,
+        "models": {"xgb": model_xgb, "rf": model_rf},
+        "trained_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        **meta,
+    }
+
+
+def save_artifact(artifact, path, X_check=None):
+    """
+    Writes the flattened forests next to the pickled model objects. The objects are kept as bytes,
+    so loading with engine="arrays" never has to import xgboost / sklearn.
+    X_check: rows the flattened forests must predict like the models (see check_parity); when they
+    don't, the artifact is saved with the model objects only (like registry.register), never lost.
+    """
+    try:
+        on_disk = compile_artifact(artifact, X_check)
+    except ValueError as e:
+        print(f" WARNING: {os.path.basename(path)}: not storing flattened trees, {e}")
+        on_disk = {k: v for k, v in artifact.items() if k != "models"}
+    on_disk["models"] = {name: pickle.dumps(m) for name, m in artifact["models"].items()}
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    joblib.dump(on_disk, tmp_path)
+    os.replace(tmp_path, path)
+    return path
+
+
+def load_artifact(path, engine="native"):
+    """
+    engine="native" predicts through the xgboost / sklearn objects,
+    engine="arrays" through the flattened NumPy node arrays (see predict_forest).
+    """
+    artifact = joblib.load(path)
+    if artifact.get("version") != ARTIFACT_VERSION:
+        raise ValueError(f"{path}: artifact version {artifact.get('version')}, expected {ARTIFACT_VERSION}")
+    if engine not in ("native", "arrays"):
+        raise ValueError(f"unknown forecast engine {engine!r} (native / arrays)")
+    if engine == "arrays" and "forests" not in artifact:
+        print(f" WARNING: {os.path.basename(path)} has no flattened trees, loading the native models")
+        engine = "native"
+    if engine == "arrays":
+        artifact.pop("models")
+    else:
+        artifact["models"] = {name: pickle.loads(blob) for name, blob in artifact.pop("models").items()}
+        artifact.pop("forests", None)
+    return artifact
+
+
+# --- flattening ---
+
+def _pack(trees):
+    """
+    Concatenates per-tree node arrays into one forest with global node ids.
+    children holds (left, right) pairs, so the next node is children[2 * node + went_right];
+    leaves are marked with feature == -1 and point at themselves, so a stray step never leaves the tree.
+    """
+    offsets = np.cumsum([0] + [len(t["left"]) for t in trees])
+    children, nan_right, feature, threshold, value = [], [], [], [], []
+    for off, t in zip(offsets[:-1], trees):
+        leaf = t["left"] == -1
+        ids = np.arange(len(leaf))
+        left, right = np.where(leaf, ids, t["left"]), np.where(leaf, ids, t["right"])
+        children.append(np.stack([left, right], axis=1).ravel() + off)
+        nan_right.append(~leaf & (t["missing"] == t["right"]))
+        feature.append(np.where(leaf, -1, t["feature"]))
+        threshold.append(t["threshold"])
+        value.append(t["value"])
+    return {
+        "children": np.concatenate(children).astype(np.int32),
+        "nan_right": np.concatenate(nan_right),
+        "feature": np.concatenate(feature).astype(np.int32),
+        "threshold": np.concatenate(threshold).astype(np.float64),
+        "value": np.concatenate(value).astype(np.float64),
+        "roots": offsets[:-1].astype(np.int32),
+    }
+
+
+def _sklearn_trees(estimators, leaf_value, estimator_features=None):
+    """Node arrays of fitted sklearn trees; leaf_value(tree) gives each node's output."""
+    trees = []
+    for i, est in enumerate(estimators):
+        tree = est.tree_
+        left = tree.children_left.astype(np.int64)
+        right = tree.children_right.astype(np.int64)
+        go_left = getattr(tree, "missing_go_to_left", np.zeros(len(left), dtype=np.uint8)).astype(bool)
+        feature = tree.feature
+        if estimator_features is not None:
+            # bagged trees (IsolationForest) see a shuffled column subset
+            feature = np.where(feature >= 0, np.asarray(estimator_features[i])[np.maximum(feature, 0)], feature)
+        trees.append({
+            "left": left, "right": right, "missing": np.where(go_left, left, right),
+            "feature": feature, "threshold": tree.threshold, "value": leaf_value(tree),
+        })
+    return trees
+
+
+def flatten_rf(model_rf, X_check=None):
+    """sklearn forest: x <= threshold goes left, prediction = mean of the trees' leaf values."""
+    forest = _pack(_sklearn_trees(model_rf.estimators_, lambda tree: tree.value[:, 0, 0]))
+    forest.update(compare="le", reduce="mean", base_score=0.0)
+    check_parity("rf", forest, model_rf, lambda X: predict_forest(forest, X), model_rf.predict, X_check)
+    return forest
+
+
+def flatten_rf_classifier(model_rf, X_check=None):
+    """Binary RandomForestClassifier: mean of the trees' class-1 leaf fractions == predict_proba[:, 1]."""
+    if len(model_rf.classes_) != 2:
+        raise ValueError(f"only binary classifiers can be flattened, got {len(model_rf.classes_)} classes")
+    def positive_share(tree):
+        counts = tree.value[:, 0, :]
+        return counts[:, 1] / np.maximum(counts.sum(axis=1), 1e-12)
+    forest = _pack(_sklearn_trees(model_rf.estimators_, positive_share))
+    forest.update(compare="le", reduce="mean", base_score=0.0)
+    check_parity("classifier", forest, model_rf, lambda X: predict_forest(forest, X),
+                 lambda X: model_rf.predict_proba(X)[:, 1], X_check)
+    return forest
+
+
+def _average_path_length(n):
+    # expected depth of an unsuccessful BST search among n points (c(n) in the isolation forest paper)
+    n = np.asarray(n, dtype=np.float64)
+    out = np.where(n <= 1, 0.0, np.where(n == 2, 1.0, 0.0))
+    big = n > 2
+    out[big] = 2 * (np.log(n[big] - 1) + np.euler_gamma) - 2 * (n[big] - 1) / n[big]
+    return out
+
+
+def flatten_isolation_forest(model_if, X_check=None):
+    """IsolationForest: each leaf holds depth + c(samples left in it); the forest output is the mean path length."""
+    def path_length(tree):
+        depth = np.zeros(tree.node_count)
+        for node in range(tree.node_count):  # sklearn numbers children after their parent
+            if tree.children_left[node] != -1:
+                depth[tree.children_left[node]] = depth[tree.children_right[node]] = depth[node] + 1
+        return depth + _average_path_length(tree.n_node_samples)
+    forest = _pack(_sklearn_trees(model_if.estimators_, path_length, model_if.estimators_features_))
+    forest.update(compare="le", reduce="mean", base_score=0.0,
+                  normalizer=float(_average_path_length([model_if.max_samples_])[0]), offset=float(model_if.offset_))
+    check_parity("isolation forest", forest, model_if, ArrayIsolationForest(forest).decision_function,
+                 model_if.decision_function, X_check)
+    return forest
+
+
+def _base_score(learner):
+    # '[2.6044655E0]' in xgboost >= 2, a plain number before that
+    raw = learner["learner_model_param"]["base_score"]
+    return float(str(raw).strip("[]").split(",")[0])
+
+
+def flatten_xgb(model_xgb, features, X_check=None):
+    """xgboost gbtree: x < split goes left (NaN follows default_left), prediction = base_score + sum of leaves."""
+    booster = model_xgb.get_booster()
+    learner = json.loads(booster.save_raw("json"))["learner"]
+    if learner["objective"]["name"] != "reg:squarederror":
+        raise ValueError(f"unsupported objective {learner['objective']['name']}")
+    # split_indices refer to the booster's feature order, which may differ from ours
+    order = booster.feature_names or list(features)
+    remap = np.array([list(features).index(f) for f in order])
+
+    trees = []
+    for t in learner["gradient_booster"]["model"]["trees"]:
+        left = np.array(t["left_children"], dtype=np.int64)
+        right = np.array(t["right_children"], dtype=np.int64)
+        cond = np.array(t["split_conditions"], dtype=np.float32)
+        leaf = left == -1
+        trees.append({
+            "left": left, "right": right,
+            "missing": np.where(np.array(t["default_left"], dtype=bool), left, right),
+            "feature": remap[np.array(t["split_indices"], dtype=np.int64)],
+            # leaves keep their weight in split_conditions
+            "threshold": np.where(leaf, np.inf, cond), "value": np.where(leaf, cond, 0.0),
+        })
+    forest = _pack(trees)
+    forest.update(compare="lt", reduce="sum", base_score=_base_score(learner))
+    check_parity("xgb", forest, model_xgb, lambda X: predict_forest(forest, X), model_xgb.predict, X_check,
+                 features=features)
+    return forest
+
+
+def compile_artifact(artifact, X_check=None):
+    """
+    Copy of the artifact with the model objects swapped for flat node arrays.
+    X_check (e.g. a sample of the training matrix) is predicted both ways first, see check_parity.
+    """
+    compiled = {k: v for k, v in artifact.items() if k != "models"}
+    if X_check is not None and isinstance(X_check, pd.DataFrame):
+        X_check = X_check[artifact["features"]]
+    compiled["forests"] = {
+        "xgb": flatten_xgb(artifact["models"]["xgb"], artifact["features"], X_check),
+        "rf": flatten_rf(artifact["models"]["rf"], X_check),
+    }
+    return compiled
+
+
+# --- parity ---
+
+PARITY_ROWS = 256
+PARITY_TOLERANCE = 1e-5
+
+
+def _probe_rows(forest, n_features, rows=PARITY_ROWS, seed=0):
+    """Rows on and around the forest's own split thresholds, so both sides of most splits get taken."""
+    rng = np.random.default_rng(seed)
+    X = np.zeros((rows, n_features), dtype=np.float32)
+    split = forest["feature"] >= 0
+    for f in range(n_features):
+        cuts = forest["threshold"][split & (forest["feature"] == f)]
+        cuts = cuts[np.isfinite(cuts)]
+        if len(cuts):
+            X[:, f] = rng.choice(cuts, rows) + rng.choice([-1e-3, 0.0, 1e-3], rows) * np.maximum(np.abs(cuts).max(), 1)
+    return X
+
+
+def check_parity(what, forest, model, flat_predict, native_predict, X_check=None, features=None):
+    """
+    Raises ValueError unless the flattened forest predicts like the native model on X_check
+    (default: probe rows built from the forest's thresholds). Runs on every flatten, so a
+    broken traversal can never be saved and served silently.
+    """
+    names = features if features is not None else getattr(model, "feature_names_in_", None)
+    if isinstance(X_check, pd.DataFrame) and names is not None:
+        X_check = X_check[list(names)]
+    X = _probe_rows(forest, model.n_features_in_) if X_check is None else np.asarray(X_check, dtype=np.float32)
+    # fitted on a DataFrame -> give the native model one too (no feature-name warnings, same column order)
+    X_native = pd.DataFrame(X, columns=list(names)) if names is not None else X
+    got, want = flat_predict(X), native_predict(X_native)
+    if not np.allclose(got, want, rtol=PARITY_TOLERANCE, atol=PARITY_TOLERANCE):
+        raise ValueError(f"{what}: flattened trees disagree with the native model "
+                         f"(max abs diff {np.max(np.abs(got - want)):.3g} on {len(X)} rows)")
+
+
+# --- inference ---
+
+def predict_forest(forest, X):
+    """
+    Vectorized traversal: every (row, tree) pair steps one level down per iteration,
+    and pairs that reached a leaf drop out, so deep trees don't hold up the finished ones.
+    """
+    X = np.ascontiguousarray(X, dtype=np.float32)
+    children, nan_right = forest["children"], forest["nan_right"]
+    feature, threshold, value = forest["feature"], forest["threshold"], forest["value"]
+    le = forest["compare"] == "le"
+    n_trees, n_features = len(forest["roots"]), X.shape[1]
+    out = np.empty(len(X), dtype=np.float64)
+    for start in range(0, len(X), BATCH_ROWS):
+        batch = X[start:start + BATCH_ROWS]
+        flat = batch.ravel()
+        has_nan = np.isnan(flat).any()
+        # one entry per (row, tree) pair, row-major
+        pair = np.arange(len(batch) * n_trees, dtype=np.int32)
+        row_offset = np.repeat(np.arange(len(batch), dtype=np.int32) * n_features, n_trees)
+        node = np.tile(forest["roots"], len(batch))
+        leaf_node = np.empty_like(node)
+        feat = feature[node]
+        while True:
+            # checked before stepping, so trees that are a single leaf (root == leaf) are settled too
+            done = feat < 0
+            if done.any():
+                leaf_node[pair[done]] = node[done]
+                keep = ~done
+                node, feat, pair, row_offset = node[keep], feat[keep], pair[keep], row_offset[keep]
+            if not len(node): break
+            x = flat[row_offset + feat]
+            went_right = x > threshold[node] if le else x >= threshold[node]
+            if has_nan:
+                # NaN compares False both ways, so it takes the node's default branch instead
+                nan = np.isnan(x)
+                went_right[nan] = nan_right[node[nan]]
+            node = children[2 * node + went_right]
+            feat = feature[node]
+        leaves = value[leaf_node].reshape(len(batch), n_trees)
+        out[start:start + len(batch)] = leaves.mean(axis=1) if forest["reduce"] == "mean" else leaves.sum(axis=1)
+    return out + forest["base_score"]
+
+
+class ArrayClassifier:
+    """predict_proba / predict of a flattened binary forest (see flatten_rf_classifier)."""
+
+    def __init__(self, forest, classes):
+        self.forest, self.classes_ = forest, np.asarray(classes)
+
+    def predict_proba(self, X):
+        p = predict_forest(self.forest, X)
+        return np.column_stack([1 - p, p])
+
+    def predict(self, X):
+        return self.classes_[(self.predict_proba(X)[:, 1] > 0.5).astype(int)]
+
+
+class ArrayIsolationForest:
+    """decision_function / predict of a flattened IsolationForest (see flatten_isolation_forest)."""
+
+    def __init__(self, forest):
+        self.forest = forest
+
+    def decision_function(self, X):
+        depth = predict_forest(self.forest, X)
+        normalizer = self.forest["normalizer"]
+        score = -2.0 ** (-depth / normalizer) if normalizer else np.full(len(depth), -1.0)
+        return score - self.forest["offset"]
+
+    def predict(self, X):
+        return np.where(self.decision_function(X) < 0, -1, 1)
+
+
+def predict(artifact, X):
+    """Weighted blend of both models in the transformed space, mapped back to footfall."""
+    if isinstance(X, pd.DataFrame):
+        X = X[artifact["features"]]
+    weights = artifact["weights"]
+    if "forests" in artifact:
+        blended = sum(w * predict_forest(artifact["forests"][name], X) for name, w in weights.items())
+    else:
+        blended = sum(w * artifact["models"][name].predict(X) for name, w in weights.items())
+    return INVERSE_TRANSFORMS[artifact["transform"]](blended)
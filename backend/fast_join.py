@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+
+# is_weekend / month_name are derived from date, so they never need to take part in a join
+JOIN_KEYS = ["date", "state", "district", "pincode"]
+DERIVED_KEYS = ["is_weekend", "month_name"]
+
+
+def _factorize(col):
+    if pd.api.types.is_numeric_dtype(col) and not pd.api.types.is_bool_dtype(col):
+        col = col.astype("float64")  # Int32 pincode on one side, float on the other still match
+    elif col.name == "date" and not pd.api.types.is_datetime64_any_dtype(col):
+        col = pd.to_datetime(col, errors="coerce")
+    return pd.factorize(col)
+
+
+def encode_keys(frames, keys=JOIN_KEYS):
+    """
+    Encodes the key columns of every frame into one int64 key per row, using a
+    shared dictionary per column so equal tuples get equal keys across frames.
+    NaN gets its own code, matching pandas' NaN == NaN behaviour in merges.
+    """
+    encoded = [np.zeros(len(f), dtype=np.int64) for f in frames]
+    radix = 1
+    for col in keys:
+        per_frame = [_factorize(f[col]) for f in frames]
+        uniques = pd.Index(pd.concat([pd.Series(u) for _, u in per_frame], ignore_index=True)).unique()
+        size = len(uniques) + 1  # last slot is NaN
+        if radix * size > 2**62:
+            # squeeze the combined key back into a dense range before it can overflow
+            codes, dense = pd.factorize(np.concatenate(encoded))
+            bounds = np.cumsum([0] + [len(e) for e in encoded])
+            encoded = [codes[a:b].astype(np.int64) for a, b in zip(bounds[:-1], bounds[1:])]
+            radix = len(dense)
+        for i, (codes, u) in enumerate(per_frame):
+            remap = np.append(uniques.get_indexer(u), len(uniques))
+            encoded[i] = encoded[i] * size + remap[codes]  # codes == -1 -> NaN slot
+        radix *= size
+    return encoded
+
+
+def _inner_pairs(left_key, right_key):
+    # hash join on a single int64 column; only row positions are materialized
+    left = pd.DataFrame({"k": left_key, "l": np.arange(len(left_key))})
+    right = pd.DataFrame({"k": right_key, "r": np.arange(len(right_key))})
+    pairs = left.merge(right, on="k", how="inner", sort=False)
+    return pairs["l"].to_numpy(), pairs["r"].to_numpy()
+
+
+def merge_on_keys(frames, keys=JOIN_KEYS, carry=DERIVED_KEYS):
+    """
+    Inner-joins any number of frames on `keys` through a compact integer key.
+
+    Equivalent to chaining pd.merge(..., on=keys + carry, how='inner'), but the
+    `carry` columns (derived from the keys) are taken from the first frame instead
+    of being compared, and each input is copied into the result exactly once.
+    """
+    codes = encode_keys(frames, keys)
+
+    # positions of every frame's row in the final result
+    positions = [np.arange(len(frames[0]))]
+    current_key = codes[0]
+    for right_key in codes[1:]:
+        l, r = _inner_pairs(current_key, right_key)
+        positions = [p[l] for p in positions] + [r]
+        current_key = current_key[l]
+
+    taken_cols = set()
+    parts = []
+    for i, (frame, pos) in enumerate(zip(frames, positions)):
+        if i > 0:
+            frame = frame.drop(columns=[c for c in keys + carry if c in frame.columns])
+            clash = [c for c in frame.columns if c in taken_cols]
+            if clash:
+                frame = frame.rename(columns={c: f"{c}_{i}" for c in clash})
+        taken_cols.update(frame.columns)
+        parts.append(frame.take(pos).reset_index(drop=True))
+    return pd.concat(parts, axis=1)
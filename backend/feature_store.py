@@ -0,0 +1,183 @@
+import os
+import json
+import shutil
+import hashlib
+import pandas as pd
+from storage import (DATA_DIR, EXTENSIONS, MANIFEST_NAME, concat_files, find_dataset, is_partitioned,
+                     iter_dataset, iter_frame, partition_files, read_dataset, read_frame, resolve_format, write_frame)
+from fast_join import JOIN_KEYS, DERIVED_KEYS, merge_on_keys
+
+STORE_DIR = os.path.join(DATA_DIR, "feature_store")
+# Oldest entries are evicted once the store grows past this size
+MAX_STORE_BYTES = int(os.getenv("AADHAAR_FEATURE_STORE_MB", "4096")) * 1024 * 1024
+# streamed builds (iter_merged) hash-split the inputs into buckets of about this many bytes on disk,
+# then join one bucket at a time, so peak memory follows this and not the dataset size
+BUCKET_BYTES = int(os.getenv("AADHAAR_FEATURE_STORE_BUCKET_MB", "256")) * 1024 * 1024
+
+SOURCES = {
+    "enrol": "cleaned_data_set_enrolment",
+    "demo": "cleaned_data_set_demographic",
+    "bio": "cleaned_data_set_biometric",
+}
+
+
+def _source_signature(name):
+    path = find_dataset(name)
+    if path is None:
+        raise FileNotFoundError(os.path.join(DATA_DIR, name))
+    if is_partitioned(path):
+        # the manifest already pins every shard's hash
+        manifest = os.path.join(path, MANIFEST_NAME)
+        with open(manifest, "rb") as f:
+            return {"path": os.path.basename(path), "manifest": hashlib.sha256(f.read()).hexdigest()}
+    stat = os.stat(path)
+    return {"path": os.path.basename(path), "size": stat.st_size, "mtime": stat.st_mtime_ns}
+
+
+def fingerprint(sources, keys=JOIN_KEYS):
+    """Hash of the input datasets (as they are on disk right now) and the merge keys."""
+    payload = {
+        "sources": [[s, _source_signature(SOURCES[s])] for s in sources],
+        "keys": list(keys),
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+
+def _entries():
+    if not os.path.isdir(STORE_DIR): return []
+    paths = [os.path.join(STORE_DIR, f) for f in os.listdir(STORE_DIR)]
+    return [p for p in paths if os.path.splitext(p)[1] in EXTENSIONS.values() and ".tmp" not in p]
+
+
+def evict(keep=None, max_bytes=MAX_STORE_BYTES):
+    """Drops least recently used entries until the store fits in max_bytes."""
+    entries = sorted(_entries(), key=os.path.getmtime)
+    total = sum(os.path.getsize(p) for p in entries)
+    for p in entries:
+        if total <= max_bytes: break
+        if p == keep: continue
+        total -= os.path.getsize(p)
+        os.remove(p)
+        print(f" Feature store: evicted {os.path.basename(p)}")
+
+
+def _lookup(sources, keys):
+    """(path of the stored entry or None, stem an entry for these inputs would use)."""
+    fp = fingerprint(sources, keys)
+    stem = os.path.join(STORE_DIR, f"{'_'.join(sources)}-{fp[:16]}")
+    for ext in EXTENSIONS.values():
+        if os.path.exists(stem + ext):
+            os.utime(stem + ext)  # mark as recently used
+            print(f" Feature store hit: {os.path.basename(stem + ext)}")
+            return stem + ext, stem
+    return None, stem
+
+
+def _materialize(sources, keys, stem):
+    print(f" Feature store miss: merging {' + '.join(sources)}...")
+    frames = [read_dataset(SOURCES[s]) for s in sources]
+    df = merge_on_keys(frames, keys=keys, carry=[c for c in DERIVED_KEYS if c not in keys])
+    del frames
+
+    os.makedirs(STORE_DIR, exist_ok=True)
+    path = stem + EXTENSIONS[resolve_format()]
+    tmp_path = f"{stem}.{os.getpid()}.tmp{EXTENSIONS[resolve_format()]}"
+    write_frame(df, tmp_path)
+    os.replace(tmp_path, path)
+    evict(keep=path)
+    return path, df
+
+
+def get_merged(sources, columns=None, keys=JOIN_KEYS):
+    """
+    Returns the inner join of the cleaned datasets named in `sources`
+    (any of 'enrol', 'demo', 'bio') on `keys`.
+
+    Each join combination is materialized once per version of its inputs;
+    later calls (from any training script) just read the stored entry,
+    optionally loading only `columns`.
+    """
+    sources = list(sources)
+    path, stem = _lookup(sources, keys)
+    if path is not None:
+        return read_frame(path, columns)
+
+    _, df = _materialize(sources, keys, stem)
+    if columns is not None:
+        df = df[[c for c in columns if c in df.columns]]
+    return df
+
+
+def _bucket_of(chunk, keys, n):
+    # same normalization as fast_join._factorize, so equal keys from different inputs land in the same bucket
+    normalized = pd.DataFrame(index=chunk.index)
+    for col in keys:
+        values = chunk[col]
+        if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+            values = values.astype("float64")
+        elif col == "date":
+            values = pd.to_datetime(values, errors="coerce")
+        else:
+            values = values.astype(str)
+        normalized[col] = values
+    return pd.util.hash_pandas_object(normalized, index=False).to_numpy() % n
+
+
+def _disk_size(name):
+    path = find_dataset(name)
+    if path is None:
+        raise FileNotFoundError(os.path.join(DATA_DIR, name))
+    return sum(os.path.getsize(p) for p in (partition_files(path) if is_partitioned(path) else [path]))
+
+
+def _materialize_chunked(sources, keys, stem, chunksize):
+    """
+    Builds the same entry as _materialize without holding the inputs in memory:
+    every input is streamed into per-bucket spill files by key hash, then each bucket
+    is joined on its own (equal keys always share a bucket) and the results stitched together.
+    """
+    n = max(1, -(-sum(_disk_size(SOURCES[s]) for s in sources) // BUCKET_BYTES))
+    print(f" Feature store miss: merging {' + '.join(sources)} in {n} bucket(s)...")
+    os.makedirs(STORE_DIR, exist_ok=True)
+    spill_dir = f"{stem}.{os.getpid()}.spill"
+    os.makedirs(spill_dir, exist_ok=True)
+    try:
+        spills = set()
+        for s in sources:
+            for chunk in iter_dataset(SOURCES[s], chunksize=chunksize):
+                for bucket, part in chunk.groupby(_bucket_of(chunk, keys, n)):
+                    path = os.path.join(spill_dir, f"{s}-{bucket:05d}.csv")
+                    write_frame(part, path, append=path in spills)
+                    spills.add(path)
+
+        ext = EXTENSIONS[resolve_format()]
+        part_paths = []
+        for bucket in range(n):
+            paths = [os.path.join(spill_dir, f"{s}-{bucket:05d}.csv") for s in sources]
+            if not all(p in spills for p in paths): continue  # an inner join with nothing on one side
+            df = merge_on_keys([read_frame(p) for p in paths], keys=keys,
+                               carry=[c for c in DERIVED_KEYS if c not in keys])
+            if df.empty: continue
+            part_paths.append(write_frame(df, os.path.join(spill_dir, f"out-{bucket:05d}{ext}")))
+            del df
+        path = stem + ext
+        if part_paths:
+            concat_files(part_paths, path)
+        else:
+            write_frame(pd.DataFrame(), path)
+    finally:
+        shutil.rmtree(spill_dir, ignore_errors=True)
+    evict(keep=path)
+    return path
+
+
+def iter_merged(sources, columns=None, chunksize=250_000, keys=JOIN_KEYS):
+    """
+    Same join as get_merged, streamed from the stored entry chunk by chunk.
+    A missing entry is built bucket by bucket (see _materialize_chunked), so memory stays bounded.
+    """
+    sources = list(sources)
+    path, stem = _lookup(sources, keys)
+    if path is None:
+        path = _materialize_chunked(sources, keys, stem, chunksize)
+    return iter_frame(path, columns, chunksize)
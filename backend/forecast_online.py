@@ -0,0 +1,160 @@
+import os
+import json
+import argparse
+import numpy as np
+import pandas as pd
+from storage import MODEL_DIR, read_dataset, write_dataset
+from ensemble import load_artifact, predict
+
+STATE_PATH = os.path.join(MODEL_DIR, 'forecast_state.json')
+WINDOW = 7   # rolling window of target_trend / volatility, and the lag_7 distance
+
+
+def state_from_daily(daily):
+    """
+    Rolling state after the last day of a training table (output of Model_03.build_features):
+    the last 7 raw totals feed target_trend, the last 8 trends feed lag_1 / lag_7 / volatility.
+    """
+    raws = [float(v) for v in daily['raw_footfall'].tail(WINDOW)]
+    trends = [float(v) for v in daily['target_trend'].tail(WINDOW + 1)]
+    return {
+        'last_date': pd.Timestamp(daily['date'].iloc[-1]).strftime('%Y-%m-%d'),
+        'raws': raws,
+        'raw_sum': sum(raws),
+        'trends': trends,
+        # running sums over the last WINDOW trends, for an O(1) rolling std
+        'trend_sum': sum(trends[-WINDOW:]),
+        'trend_sumsq': sum(t * t for t in trends[-WINDOW:]),
+    }
+
+
+def save_state(state, path=STATE_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def load_state(path=STATE_PATH):
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"{path} (run Model_03.py once to create it)")
+    with open(path) as f:
+        return json.load(f)
+
+
+def _std(total, total_sq, n):
+    # sample std (ddof=1), like pandas rolling().std()
+    if n < 2: return 0.0
+    var = (total_sq - total * total / n) / (n - 1)
+    return float(np.sqrt(max(var, 0.0)))
+
+
+def _calendar(date, is_weekend=None):
+    return {
+        'is_weekend': int(date.dayofweek >= 5) if is_weekend is None else is_weekend,
+        'day_sin': np.sin(2 * np.pi * date.dayofweek / 7),
+        'day_cos': np.cos(2 * np.pi * date.dayofweek / 7),
+        'month_sin': np.sin(2 * np.pi * date.month / 12),
+        'month_cos': np.cos(2 * np.pi * date.month / 12),
+    }
+
+
+def advance(state, date, raw_footfall):
+    """
+    Rolls the state forward by one observed day in O(1) and returns that day's feature row
+    (same columns as Model_03.build_features).
+    """
+    raws, trends = state['raws'], state['trends']
+    raws.append(float(raw_footfall))
+    state['raw_sum'] += float(raw_footfall)
+    if len(raws) > WINDOW: state['raw_sum'] -= raws.pop(0)
+    trend = state['raw_sum'] / len(raws)
+
+    trends.append(trend)
+    state['trend_sum'] += trend
+    state['trend_sumsq'] += trend * trend
+    if len(trends) > WINDOW:
+        # trends[-WINDOW - 1] just left the volatility window
+        leaving = trends[-WINDOW - 1]
+        state['trend_sum'] -= leaving
+        state['trend_sumsq'] -= leaving * leaving
+    if len(trends) > WINDOW + 1: trends.pop(0)
+    state['last_date'] = date.strftime('%Y-%m-%d')
+
+    lag_1, lag_7 = trends[-2], trends[0]
+    row = {
+        'date': date, 'raw_footfall': float(raw_footfall), 'target_trend': trend,
+        'lag_1': lag_1, 'lag_7': lag_7, 'momentum': lag_1 / (lag_7 + 1e-6),
+        'volatility': _std(state['trend_sum'], state['trend_sumsq'], min(len(trends), WINDOW)),
+    }
+    row.update(_calendar(date))
+    return row
+
+
+def next_day_features(state):
+    """Feature row for the day after state['last_date'] (its own trend isn't known yet)."""
+    trends = state['trends']
+    date = pd.Timestamp(state['last_date']) + pd.Timedelta(days=1)
+    lag_1, lag_7 = trends[-1], trends[-WINDOW]
+    row = {
+        'date': date, 'lag_1': lag_1, 'lag_7': lag_7, 'momentum': lag_1 / (lag_7 + 1e-6),
+        # latest known volatility stands in for the unknown next-day window
+        'volatility': _std(state['trend_sum'], state['trend_sumsq'], min(len(trends), WINDOW)),
+    }
+    row.update(_calendar(date))
+    return row
+
+
+def append_days(totals, artifact=None):
+    """
+    Appends observed daily totals ({date: raw_footfall}) to forecast_data without retraining:
+    each day's row gets its actual trend (keeping any earlier prediction for it),
+    then one next-day prediction row is added. Missing days in between count as zero.
+    """
+    artifact = artifact or load_artifact(os.path.join(MODEL_DIR, 'footfall_forecast.pkl'))
+    state = load_state()
+    forecast = read_dataset('forecast_data')
+    forecast['date'] = pd.to_datetime(forecast['date'])
+
+    totals = {pd.Timestamp(d): v for d, v in totals.items()}
+    last = pd.Timestamp(state['last_date'])
+    end = max(totals)
+    if end <= last:
+        print(f" Nothing to do: forecast state already covers {state['last_date']}.")
+        return forecast
+
+    rows = []
+    for date in pd.date_range(last + pd.Timedelta(days=1), end, freq='D'):
+        rows.append(advance(state, date, totals.get(date, 0.0)))
+    new_rows = pd.DataFrame(rows)
+
+    # keep predictions made earlier for these days (the previous next-day row)
+    earlier = forecast.set_index('date')['predicted_trend'] if 'predicted_trend' in forecast.columns else pd.Series(dtype=float)
+    new_rows['predicted_trend'] = new_rows['date'].map(earlier)
+
+    upcoming = pd.DataFrame([next_day_features(state)])
+    upcoming['predicted_trend'] = predict(artifact, upcoming)
+
+    forecast = forecast[forecast['date'] < new_rows['date'].min()]
+    forecast = pd.concat([forecast, new_rows, upcoming], ignore_index=True)
+    write_dataset(forecast, 'forecast_data')
+    save_state(state)
+    print(f" Appended {len(new_rows)} day(s); predicted trend for {upcoming['date'].iloc[0]:%Y-%m-%d}: "
+          f"{upcoming['predicted_trend'].iloc[0]:.0f}")
+    return forecast
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Roll the footfall forecast forward without retraining")
+    parser.add_argument("--date", help="day of the new total (YYYY-MM-DD)")
+    parser.add_argument("--footfall", type=float, help="total footfall (enrolment + demographic + biometric) for --date")
+    parser.add_argument("--csv", help="CSV with date,raw_footfall columns for one or more new days")
+    args = parser.parse_args()
+    if args.csv:
+        new = pd.read_csv(args.csv, parse_dates=['date'])
+        append_days(dict(zip(new['date'], new['raw_footfall'])))
+    elif args.date and args.footfall is not None:
+        append_days({args.date: args.footfall})
+    else:
+        parser.error("pass --date and --footfall, or --csv")
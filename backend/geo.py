@@ -0,0 +1,105 @@
+import hashlib
+import numpy as np
+import pandas as pd
+from storage import DATA_DIR, dataset_exists, read_dataset, write_dataset
+
+COORDS_DATASET = "district_coords"
+# datasets whose (state, district) pairs go into the persisted table
+SOURCES = ["scored_pulse_data", "anomalies_data"]
+JITTER = 0.15
+
+STATE_CENTERS = {
+    "Uttar Pradesh": {"lat": 26.8467, "lng": 80.9462},
+    "Maharashtra": {"lat": 19.7515, "lng": 75.7139},
+    "Karnataka": {"lat": 15.3173, "lng": 75.7139},
+    "Delhi": {"lat": 28.7041, "lng": 77.1025},
+    "Tamil Nadu": {"lat": 11.1271, "lng": 78.6569},
+    "Gujarat": {"lat": 22.2587, "lng": 71.1924},
+    "West Bengal": {"lat": 22.9868, "lng": 87.8550},
+    "Rajasthan": {"lat": 27.0238, "lng": 74.2179},
+    "Bihar": {"lat": 25.0961, "lng": 85.3131},
+    "Madhya Pradesh": {"lat": 22.9734, "lng": 78.6569},
+    "DEFAULT": {"lat": 20.5937, "lng": 78.9629}
+}
+
+# "state\x1fdistrict" -> (lat, lng), filled from the persisted table and on every miss
+_COORDS = {}
+
+
+def smart_coords(state, district):
+    """
+    Deterministically generates coordinates for a district near its state center
+    using a hash of the district name, so the map pins stay consistent.
+    """
+    base = STATE_CENTERS.get(state, STATE_CENTERS["DEFAULT"])
+    h = int(hashlib.md5(str(district).encode()).hexdigest(), 16)
+    return (base["lat"] + ((h % 1000) / 1000.0 * 3.0 - 1.5),
+            base["lng"] + (((h // 1000) % 1000) / 1000.0 * 3.0 - 1.5))
+
+
+def _keys(states, districts):
+    return pd.Series(states, dtype=str).str.cat(pd.Series(districts, dtype=str).to_numpy(), sep="\x1f")
+
+
+def lookup(states, districts):
+    """lat / lng arrays for parallel state / district sequences; each distinct pair is hashed at most once."""
+    codes, uniques = pd.factorize(_keys(states, districts))
+    for key in uniques:
+        if key not in _COORDS:
+            _COORDS[key] = smart_coords(*key.split("\x1f", 1))
+    table = np.array([_COORDS[key] for key in uniques], dtype=np.float64).reshape(-1, 2)
+    return table[codes, 0], table[codes, 1]
+
+
+def build_table(frames, data_dir=DATA_DIR):
+    """Coordinates of every (state, district) pair in `frames`, persisted as the district_coords dataset."""
+    pairs = pd.concat([f[["state", "district"]].astype(str) for f in frames if {"state", "district"} <= set(f.columns)],
+                      ignore_index=True).drop_duplicates()
+    lat, lng = lookup(pairs["state"], pairs["district"])
+    table = pairs.assign(lat=lat, lng=lng).sort_values(["state", "district"])
+    write_dataset(table, COORDS_DATASET, data_dir=data_dir)
+    return table
+
+
+def load_table(frames=(), data_dir=DATA_DIR):
+    """Fills the lookup from the persisted table, building it from `frames` the first time."""
+    if dataset_exists(COORDS_DATASET, data_dir):
+        table = read_dataset(COORDS_DATASET, data_dir=data_dir)
+        keys = _keys(table["state"], table["district"])
+        _COORDS.update(zip(keys, zip(table["lat"].to_numpy(float), table["lng"].to_numpy(float))))
+    elif frames:
+        table = build_table(frames, data_dir)
+    else:
+        return 0
+    return len(table)
+
+
+def _column(df, col, default):
+    return df[col] if col in df.columns else pd.Series(default, index=df.index)
+
+
+def map_points(df, fields, state_default="DEFAULT", district_default="Unknown", jitter=JITTER, seed=None):
+    """
+    Map pins for every row of df in one pass: lat / lng from the district table (+ uniform jitter,
+    reproducible when `seed` is set) and fields = {output key: (column, default if the column is missing, dtype or None)}.
+    """
+    lat, lng = lookup(_column(df, "state", state_default).astype(str).to_numpy(),
+                      _column(df, "district", district_default).astype(str).to_numpy())
+    if jitter:
+        rng = np.random.default_rng(seed)
+        lat = lat + rng.uniform(-jitter, jitter, len(lat))
+        lng = lng + rng.uniform(-jitter, jitter, len(lng))
+    out = pd.DataFrame({"lat": lat, "lng": lng}, index=df.index)
+    for key, (col, default, dtype) in fields.items():
+        values = _column(df, col, default)
+        out[key] = values.astype(dtype) if dtype else values.astype(object)
+    return out.to_dict(orient="records")
+
+
+if __name__ == "__main__":
+    frames = [read_dataset(name, columns=["state", "district"]) for name in SOURCES if dataset_exists(name)]
+    if not frames:
+        print(" Error: none of", ", ".join(SOURCES), "found; train Model_01 / Model_02 first.")
+    else:
+        table = build_table(frames)
+        print(f" Saved {len(table)} district coordinates to '{COORDS_DATASET}'")
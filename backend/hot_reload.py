@@ -0,0 +1,98 @@
+import os
+import time
+import hashlib
+import threading
+from storage import MANIFEST_NAME, is_partitioned
+
+HASH_CHUNK = 1 << 20
+
+
+def _content_file(path):
+    # a partitioned dataset gets a fresh manifest every time it's rewritten
+    return os.path.join(path, MANIFEST_NAME) if is_partitioned(path) else path
+
+
+def _stat(path):
+    try:
+        st = os.stat(_content_file(path))
+    except FileNotFoundError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def file_hash(path):
+    path = _content_file(path)
+    if not os.path.exists(path): return None
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_CHUNK), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class ArtifactWatcher:
+    """
+    Polls named groups of files ({group: [paths]}, re-resolved on every poll).
+    A group is reported once its mtime / size moved, has then stayed put for a whole poll
+    (so multi-file writers like a retrain have finished), and its content hash really differs
+    from what was loaded; a plain `touch` only refreshes the bookkeeping.
+    """
+
+    def __init__(self, groups):
+        self.groups = groups
+        self.loaded = {}    # group -> {path: (stat, hash)} as last loaded
+        self.moving = {}    # group -> {path: stat} seen on the previous poll
+
+    def baseline(self):
+        for group, paths in self.groups().items():
+            self.loaded[group] = {p: (_stat(p), file_hash(p)) for p in paths}
+
+    def poll(self):
+        """[(group, state)] of settled, really changed groups; call commit(group, state) once handled."""
+        changed = []
+        for group, paths in self.groups().items():
+            stats = {p: _stat(p) for p in paths}
+            known = self.loaded.get(group, {})
+            if stats == {p: s for p, (s, _) in known.items()}:
+                self.moving.pop(group, None)
+                continue
+            if self.moving.get(group) != stats:
+                self.moving[group] = stats  # still being written, look again next poll
+                continue
+            del self.moving[group]
+            state = {p: (stats[p], file_hash(p)) for p in paths}
+            if {p: h for p, (_, h) in state.items()} == {p: h for p, (_, h) in known.items()}:
+                self.loaded[group] = state
+                continue
+            changed.append((group, state))
+        return changed
+
+    def commit(self, group, state):
+        self.loaded[group] = state
+
+
+def start_watcher(groups, on_change, interval):
+    """
+    Background thread polling every `interval` seconds; on_change(groups) gets the list of
+    changed group names and runs on that thread, so reloads stay off the request path.
+    """
+    watcher = ArtifactWatcher(groups)
+
+    def loop():
+        watcher.baseline()
+        while True:
+            time.sleep(interval)
+            changed = []
+            try:
+                changed = watcher.poll()
+                if not changed: continue
+                on_change([group for group, _ in changed])
+            except Exception as e:
+                print(f" Hot reload failed: {e}")
+            # failed reloads are committed too, the next write to the files retries them
+            for group, state in changed:
+                watcher.commit(group, state)
+
+    thread = threading.Thread(target=loop, name="hot-reload", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,210 @@
+import os
+import glob
+import json
+import hashlib
+import argparse
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from name_normalizer import load_aliases, save_aliases
+from storage import (DATA_DIR, EXTENSIONS, MANIFEST_NAME, resolve_format,
+                     write_frame, concat_files)
+
+DEFAULT_CHUNKSIZE = 250_000
+
+# Only the columns the cleaners use, with explicit dtypes so pandas never infers object columns
+SHARD_SCHEMAS = {
+    "biometric": {
+        "date": "str", "state": "category", "district": "category", "pincode": "Int32",
+        "bio_age_5_17": "float32", "bio_age_17_": "float32",
+    },
+    "demographic": {
+        "date": "str", "state": "category", "district": "category", "pincode": "Int32",
+        "demo_age_5_17": "float32", "demo_age_17_": "float32",
+    },
+    "enrolment": {
+        "date": "str", "state": "category", "district": "category", "pincode": "Int32",
+        "age_0_5": "float32", "age_5_17": "float32", "age_18_greater": "float32",
+    },
+}
+
+
+def shard_files(kind):
+    pattern = os.path.join(DATA_DIR, f"api_data_aadhar_{kind}", f"api_data_aadhar_{kind}_*.csv")
+    return sorted(glob.glob(pattern))
+
+
+def read_shard(path, kind, chunksize=None):
+    """
+    Reads one raw shard with the explicit schema for `kind`.
+    Column names are matched after strip/lower, so ' State' in a header still maps to 'state'.
+    Returns a DataFrame, or an iterator of DataFrames when chunksize is given.
+    """
+    schema = SHARD_SCHEMAS[kind]
+    header = pd.read_csv(path, nrows=0).columns
+    raw_names = {c.strip().lower(): c for c in header}
+    usecols = [raw_names[c] for c in schema if c in raw_names]
+    dtype = {raw_names[c]: t for c, t in schema.items() if c in raw_names}
+
+    def _rename(df):
+        df.columns = df.columns.str.strip().str.lower()
+        return df
+
+    reader = pd.read_csv(path, usecols=usecols, dtype=dtype, chunksize=chunksize)
+    if chunksize is None:
+        return _rename(reader)
+    return (_rename(chunk) for chunk in reader)
+
+
+def iter_shard_chunks(kind, chunksize=DEFAULT_CHUNKSIZE, files=None):
+    """Streams every shard of `kind` as fixed-size chunks (single process)."""
+    for path in (files if files is not None else shard_files(kind)):
+        for chunk in read_shard(path, kind, chunksize=chunksize):
+            yield chunk
+
+
+def file_hash(path, block_size=1 << 20):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def aliases_fingerprint():
+    # hand-maintained renames change the cleaned output of every shard
+    table = load_aliases()
+    aliases = {k: v["aliases"] for k, v in table.items()}
+    return hashlib.sha256(json.dumps(aliases, sort_keys=True).encode()).hexdigest()
+
+
+def load_manifest(output_dir):
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    if not os.path.exists(path): return {"aliases": None, "shards": {}}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(output_dir, manifest):
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def _shard_key(path):
+    return os.path.relpath(path, DATA_DIR).replace(os.sep, "/")
+
+
+def _is_current(entry, path, partition_path):
+    """True when the shard is unchanged since its partition was written."""
+    if entry is None or not os.path.exists(partition_path): return False
+    if entry.get("partition") != os.path.basename(partition_path): return False
+    stat = os.stat(path)
+    if entry["size"] != stat.st_size: return False
+    if entry["mtime"] == stat.st_mtime: return True
+    # touched but maybe not modified: fall back to the content hash
+    return entry["sha256"] == file_hash(path)
+
+
+def _clean_shard(path, kind, transform, partition_path, chunksize):
+    # Runs inside a worker: stream the shard chunk by chunk, then stitch its partition
+    aliases = load_aliases()
+    ext = os.path.splitext(partition_path)[1]
+    chunks = read_shard(path, kind, chunksize=chunksize or DEFAULT_CHUNKSIZE)
+    rows = 0
+    part_paths = []
+    for i, chunk in enumerate(chunks):
+        cleaned = transform(chunk, aliases)
+        part_path = f"{partition_path}.{i:05d}.tmp{ext}"
+        write_frame(cleaned, part_path)
+        part_paths.append(part_path)
+        rows += len(cleaned)
+    concat_files(part_paths, partition_path)
+    stat = os.stat(path)
+    entry = {
+        "size": stat.st_size, "mtime": stat.st_mtime, "sha256": file_hash(path),
+        "partition": os.path.basename(partition_path), "rows": rows,
+    }
+    return entry, aliases
+
+
+def clean_shards(kind, transform, output_dir, workers=None, chunksize=None, files=None, full=False, fmt=None):
+    """
+    Incrementally cleans the raw shards of `kind` into a partitioned dataset:
+    output_dir holds one part-<shard> file per raw shard plus a _manifest.json
+    recording each shard's size, mtime and sha256.
+
+    Only new or changed shards are cleaned (`full=True` redoes all of them),
+    partitions of shards that disappeared are dropped. Shards are parsed on a
+    process pool (`workers`, default all cores; 1 runs inline), each worker
+    streams its shard in `chunksize` rows and calls transform(chunk, aliases)
+    per chunk, so peak memory is about workers x chunksize rows.
+    Returns (rows cleaned in this run, shards cleaned).
+    """
+    files = files if files is not None else shard_files(kind)
+    if not files:
+        print(f"WARNING: No {kind} shards found!")
+        return 0, 0
+
+    os.makedirs(output_dir, exist_ok=True)
+    ext = EXTENSIONS[resolve_format(fmt)]
+    manifest = load_manifest(output_dir)
+    fingerprint = aliases_fingerprint()
+    if manifest.get("aliases") != fingerprint:
+        full = True
+    old_shards = manifest.get("shards", {})
+
+    jobs = []
+    shards = {}
+    for f in files:
+        key = _shard_key(f)
+        stem = os.path.splitext(os.path.basename(f))[0]
+        partition_path = os.path.join(output_dir, f"part-{stem}{ext}")
+        entry = old_shards.get(key)
+        if not full and _is_current(entry, f, partition_path):
+            shards[key] = dict(entry, mtime=os.stat(f).st_mtime)
+        else:
+            jobs.append((key, (f, kind, transform, partition_path, chunksize)))
+
+    if workers == 1 or len(jobs) <= 1:
+        results = [_clean_shard(*job) for _, job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_clean_shard, *job) for _, job in jobs]
+            results = [f.result() for f in futures]
+
+    total_rows = 0
+    table = load_aliases()
+    for (key, _), (entry, aliases) in zip(jobs, results):
+        shards[key] = entry
+        total_rows += entry["rows"]
+        for k, e in aliases.items():
+            table.setdefault(k, {"aliases": {}, "variants": {}})["variants"].update(e["variants"])
+    save_aliases(table)
+
+    # drop partitions whose shard is gone (or was rewritten under another format)
+    keep = {e["partition"] for e in shards.values()}
+    removed = 0
+    for name in os.listdir(output_dir):
+        if name.startswith("part-") and name not in keep:
+            os.remove(os.path.join(output_dir, name))
+            removed += 1
+
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    unchanged = not jobs and not removed and set(shards) == set(old_shards) and os.path.exists(manifest_path)
+    old_mtime = os.path.getmtime(manifest_path) if unchanged else None
+    save_manifest(output_dir, {"aliases": fingerprint, "shards": shards})
+    if unchanged:
+        # only refreshed shard mtimes: keep the dataset's modified time so downstream stages stay up to date
+        os.utime(manifest_path, (old_mtime, old_mtime))
+    print(f"{kind}: cleaned {len(jobs)} of {len(files)} shards ({len(files) - len(jobs)} up to date)")
+    return total_rows, len(jobs)
+
+
+def parse_ingest_args(description=None):
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--workers", type=int, default=None, help="processes used to parse shards (default: all cores, 1 = inline)")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE, help="rows per chunk inside each shard")
+    parser.add_argument("--full", action="store_true", help="re-clean every shard, ignoring the manifest")
+    return parser.parse_args()
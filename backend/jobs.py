@@ -0,0 +1,252 @@
+import os
+import json
+import time
+import uuid
+import shutil
+import socket
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import pandas as pd
+from model_loader import MODEL_LOADERS, load_model_group
+from report import generate_ai_report
+from simulation import CHUNK_ROWS, RunningStats, ndjson, normalize_columns, run_models, to_payload
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+JOBS_DIR = os.getenv("AADHAAR_JOBS_DIR", os.path.join(BASE_DIR, "jobs"))
+# worker processes per server process (with N gunicorn workers up to N x this many simulations run at once);
+# the rest wait in the queue
+JOB_WORKERS = int(os.getenv("AADHAAR_JOB_WORKERS", "2"))
+# queued + running jobs, over all server processes (counted from the job directories), before submit answers 429
+MAX_PENDING = int(os.getenv("AADHAAR_JOB_MAX_PENDING", "20"))
+# finished / failed jobs (upload + result) are deleted this long after they end
+RETENTION_SECONDS = float(os.getenv("AADHAAR_JOB_RETENTION_HOURS", "24")) * 3600
+# a running job writes its status every chunk; this long without a write means its worker is gone
+STALE_SECONDS = float(os.getenv("AADHAAR_JOB_STALE_MINUTES", "10")) * 60
+HOST = socket.gethostname()
+
+UPLOAD = "upload.csv"
+STATUS = "status.json"
+RESULT = "result.ndjson"
+FINISHED = ("done", "failed")
+
+_POOL = None
+_LOCK = threading.Lock()
+
+
+class QueueFull(Exception):
+    pass
+
+
+# --- job directory: jobs/<id>/{upload.csv, status.json, result.ndjson} ---
+
+def job_dir(job_id):
+    return os.path.join(JOBS_DIR, job_id)
+
+
+def _write_status(job_id, **fields):
+    path = os.path.join(job_dir(job_id), STATUS)
+    status = read_status(job_id) or {}
+    status.update(fields, updated_at=time.time())
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(status, f)
+    os.replace(tmp_path, path)  # pollers in any server process see a whole file
+    return status
+
+
+def read_status(job_id):
+    """status.json of a job (None for unknown / malformed ids)."""
+    if not job_id.isalnum(): return None
+    path = os.path.join(job_dir(job_id), STATUS)
+    if not os.path.exists(path): return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def result_path(job_id):
+    return os.path.join(job_dir(job_id), RESULT)
+
+
+def pending_jobs():
+    """ids of queued / running jobs, read from disk so every server process counts the same queue."""
+    if not os.path.isdir(JOBS_DIR): return []
+    pending = []
+    for job_id in os.listdir(JOBS_DIR):
+        try:
+            status = read_status(job_id)
+        except (OSError, ValueError):
+            continue  # being written / removed right now
+        if status and status["state"] not in FINISHED:
+            pending.append(job_id)
+    return pending
+
+
+def _owner_gone(status):
+    # the server process that queued the job (and owns the pool running it) exited, e.g. a restart
+    owner = status.get("owner")
+    if not owner or owner["host"] != HOST: return False  # another machine's process, can't tell from here
+    try:
+        os.kill(owner["pid"], 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        pass
+    return False
+
+
+def _abandoned(status, now):
+    """Why a queued / running job will never finish, or None while it still may."""
+    last = time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(status.get("updated_at", now)))
+    if _owner_gone(status):
+        return f"Abandoned: the server process that queued it exited (last update {last})"
+    limit = STALE_SECONDS if status["state"] == "running" else RETENTION_SECONDS
+    if now - status.get("updated_at", now) > limit:
+        return f"Abandoned: no progress since {last}"
+    return None
+
+
+def prune(now=None):
+    """
+    Deletes finished jobs older than RETENTION_SECONDS, and fails queued / running jobs that can't finish:
+    their server process is gone (a restart), a running one went STALE_SECONDS without a status update,
+    or a queued one waited RETENTION_SECONDS. Their upload goes straight away, the failed status stays
+    readable for another retention window. Returns how many went.
+    """
+    if not os.path.isdir(JOBS_DIR): return 0
+    now = now or time.time()
+    removed = 0
+    for job_id in os.listdir(JOBS_DIR):
+        try:
+            status = read_status(job_id)
+        except (OSError, ValueError):
+            continue
+        if not status: continue
+        reason = _abandoned(status, now) if status["state"] not in FINISHED else None
+        if reason:
+            _write_status(job_id, state="failed", finished_at=now, error=reason)
+            for leftover in (UPLOAD, RESULT + ".tmp"):
+                path = os.path.join(job_dir(job_id), leftover)
+                if os.path.exists(path): os.remove(path)
+        elif status["state"] in FINISHED and now - status.get("finished_at", now) > RETENTION_SECONDS:
+            shutil.rmtree(job_dir(job_id), ignore_errors=True)
+            removed += 1
+    return removed
+
+
+# --- worker side ---
+
+_WORKER = {}
+
+def _model_files(name):
+    # (mtime, size) of the files whose change means a retrain / promote (same files the hot reload watches)
+    state = []
+    for path in MODEL_LOADERS[name][2]:
+        try:
+            st = os.stat(path)
+            state.append((st.st_mtime_ns, st.st_size))
+        except FileNotFoundError:
+            state.append(None)
+    return state
+
+
+def _load_models(names):
+    """(Re)loads model groups on top of the worker's current ones; a group that fails keeps its old model."""
+    models, versions = dict(_WORKER.get('models', {})), dict(_WORKER.get('versions', {}))
+    files = dict(_WORKER.get('files', {}))
+    for name in names:
+        state = _model_files(name)
+        if load_model_group(name, models, versions)["state"] == "ready":
+            files[name] = state  # a failed load isn't recorded, so the next job tries again
+    _WORKER.update(models=models, versions=versions, files=files)
+
+
+def _init_worker():
+    _load_models(list(MODEL_LOADERS))
+
+
+def _refresh_models():
+    # workers live longer than a model version: pick up retrains / promotes before each job
+    changed = [name for name in MODEL_LOADERS if _model_files(name) != _WORKER['files'].get(name)]
+    if changed:
+        print(f" Job worker {os.getpid()} reloading models: {', '.join(changed)}")
+        _load_models(changed)
+
+
+def _count_rows(path):
+    with open(path, "rb") as f:
+        lines = sum(block.count(b"\n") for block in iter(lambda: f.read(1 << 20), b""))
+    return max(lines - 1, 0)  # header; a missing trailing newline is off by one at worst
+
+
+def _run_job(job_id, chunk_rows):
+    """Simulates the upload chunk by chunk into result.ndjson (same lines as /api/simulate?stream=1)."""
+    start = time.time()
+    upload = os.path.join(job_dir(job_id), UPLOAD)
+    total = _count_rows(upload)
+    stats = RunningStats()
+    tmp_path = result_path(job_id) + ".tmp"
+    try:
+        _refresh_models()
+        _write_status(job_id, state="running", started_at=start, rows_total=total, model_versions=_WORKER['versions'])
+        with open(tmp_path, "w") as out:
+            for index, chunk in enumerate(pd.read_csv(upload, chunksize=chunk_rows)):
+                results_df, timings = run_models(normalize_columns(chunk), _WORKER['models'])
+                stats.update(results_df, timings)
+                out.write(ndjson({"type": "chunk", "index": index, "rows": len(results_df), "timings": timings,
+                                  **to_payload(results_df)}))
+                _write_status(job_id, rows_done=stats.rows, timings=stats.timings,
+                              progress=round(min(stats.rows / total, 1.0), 4) if total else None)
+            out.write(ndjson({"type": "summary", "rows": stats.rows, "high_risk": stats.high_risk,
+                              "timings": stats.timings, "report": generate_ai_report(stats.context()), "status": "success"}))
+        os.replace(tmp_path, result_path(job_id))
+        os.remove(upload)  # the result is all the client comes back for
+        _write_status(job_id, state="done", rows_done=stats.rows, progress=1.0, finished_at=time.time(),
+                      seconds=round(time.time() - start, 2))
+    except Exception as e:
+        if os.path.exists(tmp_path): os.remove(tmp_path)
+        _write_status(job_id, state="failed", error=f"Simulation Failed: {str(e)}", finished_at=time.time())
+
+
+# --- server side ---
+
+def _pool():
+    global _POOL
+    with _LOCK:
+        if _POOL is None:
+            # spawn, not fork: the Flask process has warm-up / reload threads that may hold locks
+            _POOL = ProcessPoolExecutor(max_workers=JOB_WORKERS, initializer=_init_worker,
+                                        mp_context=multiprocessing.get_context("spawn"))
+        return _POOL
+
+
+def _finished(job_id, future):
+    global _POOL
+    with _LOCK:
+        if isinstance(future.exception(), BrokenProcessPool):
+            _POOL = None  # a dead worker breaks the whole executor, the next submit starts a fresh one
+    if future.exception() is not None:  # the worker itself died (crash / OOM), _run_job never got to say so
+        _write_status(job_id, state="failed", error=f"Worker failed: {future.exception()}", finished_at=time.time())
+
+
+def submit(file, chunk_rows=CHUNK_ROWS):
+    """Saves the upload under jobs/<id>/ and queues it; returns the job status. Raises QueueFull past MAX_PENDING."""
+    prune()
+    job_id = uuid.uuid4().hex
+    os.makedirs(job_dir(job_id))
+    try:
+        # reserve first, then count: concurrent submits (from any process) may turn each other away,
+        # but never both get in past the cap
+        status = _write_status(job_id, id=job_id, state="queued", created_at=time.time(), rows_done=0,
+                               owner={"host": HOST, "pid": os.getpid()})
+        pending = len(pending_jobs())
+        if pending > MAX_PENDING:
+            raise QueueFull(f"{pending - 1} simulations already queued or running, try again later")
+        file.save(os.path.join(job_dir(job_id), UPLOAD))
+        future = _pool().submit(_run_job, job_id, chunk_rows)
+    except Exception:
+        shutil.rmtree(job_dir(job_id), ignore_errors=True)
+        raise
+    future.add_done_callback(lambda f: _finished(job_id, f))
+    return status
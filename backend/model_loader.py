@@ -0,0 +1,121 @@
+import os
+import time
+import joblib
+import numpy as np
+import pandas as pd
+from storage import MODEL_DIR
+from ensemble import build_artifact, compile_artifact, load_artifact, predict as predict_forecast
+from sentinel import FEATURES as SENTINEL_FEATURES, load_sentinel, score_frame
+from pulse import FEATURES as PULSE_FEATURES
+from registry import has_current, pointer_path, load as load_registered
+
+# "arrays" serves the forecaster from flattened NumPy trees instead of the xgboost/sklearn objects
+FORECAST_ENGINE = os.getenv("AADHAAR_FORECAST_ENGINE", "native")
+# 1 = serve registered forests from memory-mapped arrays, shared by every worker process but slower to
+# predict than the native objects; the default unpickles the native model in each process
+MODEL_MMAP = os.getenv("AADHAAR_MODEL_MMAP", "0") == "1"
+CLASSIFIER_FEATURES = ["labor", "mobility", "infiltration", "weekend", "workload_efficiency"]
+# same columns as Model_03.FEATURES (the legacy pickles below were trained on them)
+FORECAST_FEATURES = ["is_weekend", "lag_1", "lag_7", "momentum", "volatility",
+                     "day_sin", "day_cos", "month_sin", "month_cos"]
+FORECAST_PATH = os.path.join(MODEL_DIR, 'footfall_forecast.pkl')
+# the xgb / rf pair the app served before Model_03 wrote one artifact (still shipped in Models/)
+LEGACY_FORECAST_PATHS = [os.path.join(MODEL_DIR, 'footfall_forecast_xgb.pkl'),
+                         os.path.join(MODEL_DIR, 'footfall_forecast_rf.pkl')]
+
+# Model loading shared by the Flask app and the background job workers (jobs.py):
+# every loader fills plain dicts, the caller decides where the snapshot lives.
+
+
+def load_model(name, fallback, mmap, versions):
+    """CURRENT registry version of a model (see registry.py), or the plain file before anything was registered."""
+    if has_current(name):
+        model, meta = load_registered(name, mmap=mmap)
+        versions[name] = meta['version']
+        return model, meta
+    versions.pop(name, None)
+    return fallback(), None
+
+
+def _load_sentinel_model(models, versions):
+    if has_current('sentinel'):
+        models['sentinel'], meta = load_model('sentinel', None, MODEL_MMAP, versions)
+        models['sentinel_calibration'] = meta['calibration']
+    else:
+        versions.pop('sentinel', None)
+        models['sentinel'], models['sentinel_calibration'] = load_sentinel()
+
+
+def _load_pulse_models(models, versions):
+    models['pulse'], _ = load_model('pulse_kmeans', lambda: joblib.load(os.path.join(MODEL_DIR, 'model_pulse_kmeans.pkl')), True, versions)
+    models['scaler'], _ = load_model('pulse_scaler', lambda: joblib.load(os.path.join(MODEL_DIR, 'model_pulse_scaler.pkl')), True, versions)
+
+
+def _legacy_forecast():
+    # no footfall_forecast.pkl yet: the same 0.6 / 0.4 log1p blend, built from the two shipped pickles
+    xgb, rf = (joblib.load(p) for p in LEGACY_FORECAST_PATHS)
+    artifact = build_artifact(xgb, rf, getattr(xgb, "feature_names_in_", FORECAST_FEATURES))
+    if FORECAST_ENGINE == "arrays":
+        try:
+            return compile_artifact(artifact)
+        except ValueError as e:
+            print(f" WARNING: forecast: serving the native models, {e}")
+    return artifact
+
+
+def _load_forecast_file():
+    if os.path.exists(FORECAST_PATH) or not all(os.path.exists(p) for p in LEGACY_FORECAST_PATHS):
+        return load_artifact(FORECAST_PATH, engine=FORECAST_ENGINE)
+    return _legacy_forecast()
+
+
+def _load_forecast_model(models, versions):
+    models['forecast'], _ = load_model('forecast', _load_forecast_file, FORECAST_ENGINE == "arrays", versions)
+
+
+def _load_classifier_model(models, versions):
+    models['classifier'], _ = load_model(
+        'classifier', lambda: joblib.load(os.path.join(MODEL_DIR, 'model_classifier_rf.pkl')), MODEL_MMAP, versions)
+
+
+def _zeros(columns):
+    return pd.DataFrame(np.zeros((1, len(columns))), columns=list(columns))
+
+
+# name -> (loader, one-row prediction that pages in / initialises everything the first request would touch,
+#          files whose change means the model was retrained / promoted)
+MODEL_LOADERS = {
+    "sentinel": (_load_sentinel_model,
+                 lambda m: score_frame(m['sentinel'], m['sentinel_calibration'], _zeros(SENTINEL_FEATURES)),
+                 [pointer_path('sentinel'), os.path.join(MODEL_DIR, 'model_sentinel.pkl'),
+                  os.path.join(MODEL_DIR, 'model_sentinel_calibration.json')]),
+    "pulse": (_load_pulse_models,
+              lambda m: m['pulse'].predict(m['scaler'].transform(_zeros(PULSE_FEATURES))),
+              [pointer_path('pulse_kmeans'), pointer_path('pulse_scaler'),
+               os.path.join(MODEL_DIR, 'model_pulse_kmeans.pkl'), os.path.join(MODEL_DIR, 'model_pulse_scaler.pkl')]),
+    "forecast": (_load_forecast_model,
+                 lambda m: predict_forecast(m['forecast'], _zeros(m['forecast']['features'])),
+                 [pointer_path('forecast'), FORECAST_PATH, *LEGACY_FORECAST_PATHS]),
+    "classifier": (_load_classifier_model,
+                   lambda m: m['classifier'].predict_proba(_zeros(CLASSIFIER_FEATURES)),
+                   [pointer_path('classifier'), os.path.join(MODEL_DIR, 'model_classifier_rf.pkl')]),
+}
+
+
+def load_model_group(name, models, versions):
+    """Loads + warms one model into the given dicts; on failure they're left as they were."""
+    loader, warm_up, _ = MODEL_LOADERS[name]
+    fresh, fresh_versions = {}, dict(versions)
+    start = time.perf_counter()
+    try:
+        loader(fresh, fresh_versions)
+        loaded = time.perf_counter()
+        warm_up(fresh)
+    except Exception as e:
+        print(f"CRITICAL WARNING: Could not load model '{name}'. {e}")
+        return {"state": "failed", "error": str(e)}
+    models.update(fresh)
+    versions.clear()
+    versions.update(fresh_versions)
+    return {"state": "ready", "load_seconds": round(loaded - start, 3),
+            "warmup_seconds": round(time.perf_counter() - loaded, 3)}
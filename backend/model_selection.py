@@ -0,0 +1,224 @@
+import os
+import json
+import time
+import argparse
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from sklearn.cluster import KMeans
+from sklearn.ensemble import IsolationForest
+from sklearn.metrics import davies_bouldin_score, silhouette_score
+from storage import MODEL_DIR
+from feature_store import STORE_DIR, fingerprint, iter_merged
+from pulse import FEATURES as PULSE_FEATURES
+from sentinel import FEATURES as SENTINEL_FEATURES
+
+MATRIX_DIR = os.path.join(STORE_DIR, "matrices")
+SELECTION_PATH = os.path.join(MODEL_DIR, "model_selection.json")
+DEFAULTS = {"pulse_k": 3, "sentinel_contamination": 0.03}
+
+K_RANGE = list(range(2, 9))
+CONTAMINATIONS = [0.005, 0.01, 0.02, 0.03, 0.05, 0.08, 0.1]
+CONTRAST_GATE = 2.0      # same bar Model_01 uses before saving the sentinel
+FIT_SAMPLE = 200_000     # rows each candidate is fitted on; metrics always use every row
+EXACT_SAMPLE = 2000      # rows for the (quadratic) exact silhouette, kept only as a sanity check
+DISTANCE_CHUNK = 200_000
+
+
+# --- fast metrics ---
+
+def _center_distances(X, centers):
+    # n x k distances, computed in row chunks so memory stays ~DISTANCE_CHUNK x k
+    out = np.empty((len(X), len(centers)), dtype=np.float32)
+    for start in range(0, len(X), DISTANCE_CHUNK):
+        block = np.asarray(X[start:start + DISTANCE_CHUNK], dtype=np.float64)
+        out[start:start + len(block)] = np.sqrt(((block[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2))
+    return out
+
+
+def simplified_silhouette(X, labels, centers=None):
+    """
+    Silhouette with distances to cluster centres instead of to every other point,
+    so it's O(n * k) rather than O(n^2). Centres default to the cluster means.
+    """
+    uniques, dense = np.unique(labels, return_inverse=True)
+    if len(uniques) < 2: return float("nan")
+    if centers is None:
+        centers = np.array([np.asarray(X[dense == i], dtype=np.float64).mean(axis=0) for i in range(len(uniques))])
+    d = _center_distances(X, np.asarray(centers, dtype=np.float64))
+    rows = np.arange(len(d))
+    a = d[rows, dense].copy()
+    d[rows, dense] = np.inf
+    b = d.min(axis=1)
+    denom = np.maximum(a, b)
+    s = np.divide(b - a, denom, out=np.zeros_like(a), where=denom > 0)
+    return float(s.mean())
+
+
+def _sampled_silhouette(X, labels, rng):
+    if len(np.unique(labels)) < 2: return float("nan")
+    idx = np.sort(rng.choice(len(X), min(EXACT_SAMPLE, len(X)), replace=False))
+    if len(np.unique(labels[idx])) < 2: return float("nan")
+    return float(silhouette_score(np.asarray(X[idx]), labels[idx]))
+
+
+# --- cached feature matrices ---
+
+def feature_matrix(name, sources, features, scale=False, chunksize=250_000):
+    """
+    float32 matrix of `features` over the stored join of `sources`, saved as .npy
+    and keyed on the inputs' fingerprint, so every candidate (and every worker, via mmap) shares it.
+    """
+    tag = f"{name}-{fingerprint(sources)[:16]}"
+    path = os.path.join(MATRIX_DIR, tag + ".npy")
+    if os.path.exists(path):
+        print(f" Matrix cache hit: {os.path.basename(path)}")
+        return path
+
+    parts = [chunk[features].fillna(0).to_numpy(np.float32)
+             for chunk in iter_merged(sources, columns=features, chunksize=chunksize)]
+    X = np.concatenate(parts)
+    if scale:
+        # same transform as StandardScaler
+        std = X.std(axis=0)
+        X = (X - X.mean(axis=0)) / np.where(std == 0, 1, std)
+    os.makedirs(MATRIX_DIR, exist_ok=True)
+    for old in os.listdir(MATRIX_DIR):
+        # matrices built from older versions of the inputs
+        if old.startswith(name + "-") and old.endswith(".npy"):
+            os.remove(os.path.join(MATRIX_DIR, old))
+    tmp_path = os.path.join(MATRIX_DIR, f"{tag}.{os.getpid()}.tmp.npy")
+    np.save(tmp_path, X.astype(np.float32))
+    os.replace(tmp_path, path)
+    print(f" Matrix cached: {os.path.basename(path)} ({len(X)} rows)")
+    return path
+
+
+def _fit_rows(X, rng):
+    if len(X) <= FIT_SAMPLE: return np.asarray(X)
+    return np.asarray(X[np.sort(rng.choice(len(X), FIT_SAMPLE, replace=False))])
+
+
+# --- K sweep (Model_02), one candidate per worker ---
+
+_MATRIX = {}
+
+def _open_matrix(path):
+    _MATRIX["X"] = np.load(path, mmap_mode="r")
+
+
+def _eval_k(k):
+    X = _MATRIX["X"]
+    rng = np.random.default_rng(42)
+    start = time.perf_counter()
+    model = KMeans(n_clusters=k, random_state=42, n_init=10).fit(_fit_rows(X, rng))
+    labels = model.predict(np.asarray(X))
+    return {
+        "k": k,
+        "simplified_silhouette": simplified_silhouette(X, labels, model.cluster_centers_),
+        "davies_bouldin": float(davies_bouldin_score(X, labels)),
+        "sampled_silhouette": _sampled_silhouette(X, labels, rng),
+        "seconds": time.perf_counter() - start,
+    }
+
+
+# --- contamination sweep (Model_01) ---
+
+def sweep_contamination(X, contaminations=CONTAMINATIONS):
+    """
+    Contamination only moves IsolationForest's threshold (offset_ = that percentile of the
+    training scores), so one fit + one scoring pass covers every candidate.
+    """
+    rng = np.random.default_rng(42)
+    start = time.perf_counter()
+    model = IsolationForest(n_estimators=200, random_state=42, n_jobs=-1).fit(_fit_rows(X, rng))
+    scores = model.score_samples(np.asarray(X))
+    fit_seconds = time.perf_counter() - start
+
+    infiltration = np.asarray(X[:, SENTINEL_FEATURES.index("infiltration_index")])
+    results = []
+    for c in contaminations:
+        start = time.perf_counter()
+        labels = np.where(scores < np.percentile(scores, 100 * c), -1, 1)
+        flagged = labels == -1
+        contrast = infiltration[flagged].mean() / (infiltration[~flagged].mean() + 0.0001) if flagged.any() else 0.0
+        results.append({
+            "contamination": c,
+            "flagged": int(flagged.sum()),
+            "contrast": float(contrast),
+            "simplified_silhouette": simplified_silhouette(X, labels),
+            "davies_bouldin": float(davies_bouldin_score(X, labels)) if flagged.any() else float("nan"),
+            "seconds": time.perf_counter() - start,
+        })
+    return results, fit_seconds
+
+
+# --- selection ---
+
+def _best_k(results):
+    return max(results, key=lambda r: (np.nan_to_num(r["simplified_silhouette"], nan=-1), -r["davies_bouldin"]))["k"]
+
+
+def _best_contamination(results):
+    passing = [r for r in results if r["contrast"] > CONTRAST_GATE]
+    if passing:
+        return max(passing, key=lambda r: np.nan_to_num(r["simplified_silhouette"], nan=-1))["contamination"]
+    return max(results, key=lambda r: r["contrast"])["contamination"]
+
+
+def load_selection(path=SELECTION_PATH):
+    """Selected hyperparameters, falling back to the hand-picked defaults before the first sweep."""
+    selection = dict(DEFAULTS)
+    if os.path.exists(path):
+        with open(path) as f:
+            saved = json.load(f)
+        selection.update({k: saved[k] for k in DEFAULTS if k in saved})
+    return selection
+
+
+def run_selection(k_range=K_RANGE, contaminations=CONTAMINATIONS, workers=None):
+    start = time.perf_counter()
+    pulse_path = feature_matrix("pulse", ["bio", "demo"], PULSE_FEATURES, scale=True)
+    sentinel_path = feature_matrix("sentinel", ["enrol", "demo"], SENTINEL_FEATURES)
+
+    print(f"Sweeping K in {list(k_range)} on {workers or os.cpu_count()} processes...")
+    with ProcessPoolExecutor(max_workers=workers, initializer=_open_matrix, initargs=(pulse_path,)) as pool:
+        futures = [pool.submit(_eval_k, k) for k in k_range]
+        # the contamination sweep runs here while the pool works on K
+        print(f"Sweeping contamination in {list(contaminations)}...")
+        contamination_results, if_seconds = sweep_contamination(np.load(sentinel_path, mmap_mode="r"), contaminations)
+        k_results = [f.result() for f in futures]
+
+    print("\n--- PULSE (KMeans) ---")
+    print(f"{'k':>3}{'simp. sil':>11}{'DB':>8}{'sil@2k':>9}{'sec':>7}")
+    for r in k_results:
+        print(f"{r['k']:>3}{r['simplified_silhouette']:>11.4f}{r['davies_bouldin']:>8.3f}{r['sampled_silhouette']:>9.4f}{r['seconds']:>7.1f}")
+    print(f"\n--- SENTINEL (IsolationForest, one fit: {if_seconds:.1f}s) ---")
+    print(f"{'contam.':>8}{'flagged':>9}{'contrast':>10}{'simp. sil':>11}{'DB':>8}")
+    for r in contamination_results:
+        print(f"{r['contamination']:>8.3f}{r['flagged']:>9}{r['contrast']:>10.2f}{r['simplified_silhouette']:>11.4f}{r['davies_bouldin']:>8.3f}")
+
+    selection = {
+        "pulse_k": _best_k(k_results),
+        "sentinel_contamination": _best_contamination(contamination_results),
+        "selected_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "pulse_candidates": k_results,
+        "sentinel_candidates": contamination_results,
+    }
+    os.makedirs(MODEL_DIR, exist_ok=True)
+    tmp_path = SELECTION_PATH + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(selection, f, indent=2)
+    os.replace(tmp_path, SELECTION_PATH)
+    print(f"\n Selected K={selection['pulse_k']}, contamination={selection['sentinel_contamination']} "
+          f"in {time.perf_counter() - start:.1f}s -> {SELECTION_PATH}")
+    return selection
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pick K for Model_02 and the contamination rate for Model_01")
+    parser.add_argument("--k", type=int, nargs="+", default=K_RANGE, help="K values to try for the pulse clustering")
+    parser.add_argument("--contamination", type=float, nargs="+", default=CONTAMINATIONS,
+                        help="contamination rates to try for the sentinel")
+    parser.add_argument("--workers", type=int, default=None, help="processes for the K sweep (default: all cores)")
+    args = parser.parse_args()
+    run_selection(args.k, args.contamination, args.workers)
@@ -0,0 +1,105 @@
+import os
+import re
+import json
+import pandas as pd
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+ALIAS_PATH = os.path.join(BASE_DIR, "Datasets", "name_aliases.json")
+
+# Known renames / old spellings. Keys are already in standardized (Title Case) form.
+DEFAULT_ALIASES = {
+    "state": {
+        "Orissa": "Odisha",
+        "Pondicherry": "Puducherry",
+        "Uttaranchal": "Uttarakhand",
+    },
+    "district": {
+        "Gurgaon": "Gurugram",
+        "Allahabad": "Prayagraj",
+        "Faizabad": "Ayodhya",
+        "Bangalore": "Bengaluru",
+        "Bangalore Urban": "Bengaluru Urban",
+        "Bangalore Rural": "Bengaluru Rural",
+        "Mysore": "Mysuru",
+        "Hoshangabad": "Narmadapuram",
+    },
+}
+
+UNKNOWN = "Unknown"
+
+
+def standardize_text(text):
+    if pd.isna(text): return UNKNOWN
+    text = str(text).lower().strip()
+    text = text.replace('&', 'and')  # normalize and signs to and
+    text = re.sub(r"\s+", " ", text)  # collapse double spaces
+    return text.title()
+
+
+def load_aliases(path=ALIAS_PATH):
+    """
+    Loads the alias table. Each kind ('state' / 'district') has:
+      aliases  -> standardized name to canonical name (hand maintained)
+      variants -> raw spelling to standardized name (learned from previous runs)
+    """
+    table = {kind: {"aliases": dict(a), "variants": {}} for kind, a in DEFAULT_ALIASES.items()}
+    if os.path.exists(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                saved = json.load(f)
+            for kind, entry in saved.items():
+                t = table.setdefault(kind, {"aliases": {}, "variants": {}})
+                t["aliases"].update(entry.get("aliases", {}))
+                t["variants"].update(entry.get("variants", {}))
+        except (OSError, ValueError) as e:
+            print(f" Warning: could not read alias table ({e}), starting fresh.")
+    return table
+
+
+def save_aliases(table, path=ALIAS_PATH):
+    # Re-read before writing so parallel cleaners don't overwrite each other's variants
+    merged = load_aliases(path)
+    for kind, entry in table.items():
+        t = merged.setdefault(kind, {"aliases": {}, "variants": {}})
+        t["aliases"].update(entry.get("aliases", {}))
+        t["variants"].update(entry.get("variants", {}))
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(merged, f, indent=2, sort_keys=True, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def standardize_column(series, kind, table=None):
+    """
+    Normalizes a state/district column by working on its distinct values only.
+    The column is viewed as a categorical, every category is cleaned once
+    (variant cache -> standardize_text -> alias table) and the result is mapped
+    back to the rows through the category codes.
+    Returns a categorical Series aligned with the input.
+    """
+    if table is None: table = load_aliases()
+    entry = table.setdefault(kind, {"aliases": {}, "variants": {}})
+    aliases, variants = entry["aliases"], entry["variants"]
+
+    cat = series.astype("category")
+    cleaned = []
+    for raw in cat.cat.categories:
+        raw = str(raw)
+        std = variants.get(raw)
+        if std is None:
+            std = standardize_text(raw)
+            if std != raw: variants[raw] = std
+        cleaned.append(aliases.get(std, std))
+
+    # last slot catches NaN rows (code -1)
+    cleaned.append(UNKNOWN)
+    new_codes, new_categories = pd.factorize(np.array(cleaned, dtype=object))
+    codes = cat.cat.codes.to_numpy()
+    return pd.Series(
+        pd.Categorical.from_codes(new_codes[codes], categories=new_categories),
+        index=series.index,
+        name=series.name,
+    )
@@ -0,0 +1,201 @@
+import os
+import sys
+import glob
+import time
+import argparse
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from storage import BASE_DIR, DATA_DIR, MODEL_DIR, find_dataset, modified_time
+
+LOG_DIR = os.path.join(BASE_DIR, "logs", "pipeline")
+
+
+# Input / output declarations. Each resolves to a list of mtimes (None = missing).
+def raw(kind):
+    return ("glob", os.path.join(DATA_DIR, f"api_data_aadhar_{kind}", f"api_data_aadhar_{kind}_*.csv"))
+
+def dataset(name):
+    return ("dataset", name)
+
+def model(filename):
+    return ("file", os.path.join(MODEL_DIR, filename))
+
+
+def _mtimes(spec):
+    kind, target = spec
+    if kind == "glob":
+        files = glob.glob(target)
+        return [os.path.getmtime(f) for f in files] or [None]
+    if kind == "dataset":
+        path = find_dataset(target)
+        return [modified_time(path) if path else None]
+    return [os.path.getmtime(target) if os.path.exists(target) else None]
+
+
+STAGES = {
+    "clean_enrolment": {
+        "script": "Data_Cleaning_enrolment.py", "deps": [], "cleaner": True,
+        "inputs": [raw("enrolment")], "outputs": [dataset("cleaned_data_set_enrolment")],
+    },
+    "clean_demographic": {
+        "script": "Data_Cleaning_demographic.py", "deps": [], "cleaner": True,
+        "inputs": [raw("demographic")], "outputs": [dataset("cleaned_data_set_demographic")],
+    },
+    "clean_biometric": {
+        "script": "Data_Cleaning_biometric.py", "deps": [], "cleaner": True,
+        "inputs": [raw("biometric")], "outputs": [dataset("cleaned_data_set_biometric")],
+    },
+    "merge": {
+        "script": "Merge_datasets.py", "deps": ["clean_enrolment", "clean_demographic", "clean_biometric"],
+        "inputs": [dataset("cleaned_data_set_enrolment"), dataset("cleaned_data_set_demographic"),
+                   dataset("cleaned_data_set_biometric")],
+        "outputs": [dataset("master_data_model_04")],
+    },
+    "select_models": {
+        "script": "model_selection.py", "deps": ["clean_enrolment", "clean_demographic", "clean_biometric"],
+        "inputs": [dataset("cleaned_data_set_enrolment"), dataset("cleaned_data_set_demographic"),
+                   dataset("cleaned_data_set_biometric")],
+        "outputs": [model("model_selection.json")],
+    },
+    "model_01": {
+        "script": "Model_01.py", "deps": ["clean_enrolment", "clean_demographic", "select_models"],
+        "inputs": [dataset("cleaned_data_set_enrolment"), dataset("cleaned_data_set_demographic"),
+                   model("model_selection.json")],
+        # the run stamp, not the model: a low-contrast run keeps the served files but is still done
+        "outputs": [model("model_sentinel_run.json")],
+    },
+    "model_02": {
+        "script": "Model_02.py", "deps": ["clean_biometric", "clean_demographic", "select_models"],
+        "inputs": [dataset("cleaned_data_set_biometric"), dataset("cleaned_data_set_demographic"),
+                   model("model_selection.json")],
+        "outputs": [model("model_pulse_kmeans.pkl"), model("model_pulse_scaler.pkl"), dataset("scored_pulse_data")],
+    },
+    "geo_table": {
+        "script": "geo.py", "deps": ["model_01", "model_02"],
+        "inputs": [dataset("scored_pulse_data"), dataset("anomalies_data")],
+        "outputs": [dataset("district_coords")],
+    },
+    "model_03": {
+        "script": "Model_03.py", "deps": ["clean_enrolment", "clean_demographic", "clean_biometric"],
+        # forecast_tuning.json is optional (written by tune_forecast.py), a new one triggers a retrain
+        "inputs": [dataset("cleaned_data_set_enrolment"), dataset("cleaned_data_set_demographic"),
+                   dataset("cleaned_data_set_biometric"), model("forecast_tuning.json")],
+        "outputs": [model("footfall_forecast.pkl"), model("forecast_state.json"), dataset("forecast_data")],
+    },
+    "model_03_geo": {
+        "script": "Model_03.py", "args": ["--by", "district"],
+        "deps": ["clean_enrolment", "clean_demographic", "clean_biometric"],
+        "inputs": [dataset("cleaned_data_set_enrolment"), dataset("cleaned_data_set_demographic"),
+                   dataset("cleaned_data_set_biometric")],
+        "outputs": [dataset("forecast_geo")],
+    },
+    "model_04": {
+        "script": "Model_04.py", "deps": ["merge"],
+        "inputs": [dataset("master_data_model_04")],
+        "outputs": [model("model_classifier_rf.pkl"), dataset("model_04_insights")],
+    },
+}
+
+
+def is_up_to_date(stage):
+    """Every output exists and is newer than every input."""
+    outputs = [t for spec in stage["outputs"] for t in _mtimes(spec)]
+    inputs = [t for spec in stage["inputs"] for t in _mtimes(spec)]
+    if not outputs or None in outputs: return False
+    inputs = [t for t in inputs if t is not None]
+    return not inputs or min(outputs) >= max(inputs)
+
+
+def run_stage(name, stage, extra_args=()):
+    """
+    Runs one stage script in its own process (cwd = backend/) and returns
+    (exit code, wall seconds, peak RSS in MB or None where the OS can't tell us).
+    """
+    os.makedirs(LOG_DIR, exist_ok=True)
+    log_path = os.path.join(LOG_DIR, f"{name}.log")
+    cmd = [sys.executable, os.path.join(BASE_DIR, stage["script"]), *extra_args]
+    start = time.perf_counter()
+    with open(log_path, "w") as log:
+        proc = subprocess.Popen(cmd, cwd=BASE_DIR, stdout=log, stderr=subprocess.STDOUT)
+        if hasattr(os, "wait4"):
+            _, status, usage = os.wait4(proc.pid, 0)
+            proc.returncode = os.waitstatus_to_exitcode(status)
+            # ru_maxrss is KB on Linux, bytes on macOS
+            peak_mb = usage.ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+        else:
+            proc.wait()
+            peak_mb = None
+    return proc.returncode, time.perf_counter() - start, peak_mb
+
+
+def run_pipeline(targets=None, force=False, jobs=None):
+    """
+    Runs the stages needed for `targets` (default: all) as a DAG.
+    Stages whose deps are done run concurrently (up to `jobs` at once);
+    up-to-date stages are skipped unless `force`.
+    """
+    wanted = set()
+    def _collect(name):
+        if name in wanted: return
+        wanted.add(name)
+        for d in STAGES[name]["deps"]: _collect(d)
+    for name in (targets or STAGES):
+        _collect(name)
+
+    jobs = jobs or max(1, min(len(wanted), os.cpu_count() or 1))
+    # the three cleaners run side by side, so split the cores between their shard pools
+    cleaner_workers = str(max(1, (os.cpu_count() or 1) // 3))
+
+    results = {}
+    pending = {n for n in STAGES if n in wanted}
+    running = {}
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        while pending or running:
+            for name in sorted(pending):
+                stage = STAGES[name]
+                if any(d in pending or d in running.values() for d in stage["deps"]): continue
+                pending.discard(name)
+                if any(results[d]["status"] in ("failed", "blocked") for d in stage["deps"]):
+                    results[name] = {"status": "blocked", "wall": 0.0, "peak_mb": None}
+                    continue
+                if not force and is_up_to_date(stage):
+                    results[name] = {"status": "skipped", "wall": 0.0, "peak_mb": None}
+                    print(f"[{name}] up to date, skipping")
+                    continue
+                args = list(stage.get("args", []))
+                if stage.get("cleaner"): args += ["--workers", cleaner_workers]
+                print(f"[{name}] starting {stage['script']}")
+                running[pool.submit(run_stage, name, stage, args)] = name
+
+            if not running: continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                code, wall, peak_mb = future.result()
+                status = "ok" if code == 0 else "failed"
+                results[name] = {"status": status, "wall": wall, "peak_mb": peak_mb}
+                print(f"[{name}] {status} in {wall:.1f}s (log: {os.path.join(LOG_DIR, name + '.log')})")
+
+    total = time.perf_counter() - start
+    print("\n--- PIPELINE SUMMARY ---")
+    print(f"{'stage':<20}{'status':<10}{'wall (s)':>10}{'peak MB':>10}")
+    for name in STAGES:
+        if name not in results: continue
+        r = results[name]
+        peak = f"{r['peak_mb']:.0f}" if r["peak_mb"] is not None else "-"
+        print(f"{name:<20}{r['status']:<10}{r['wall']:>10.1f}{peak:>10}")
+    print(f"Total wall time: {total:.1f}s")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the cleaning -> merge -> training pipeline")
+    parser.add_argument("targets", nargs="*", help=f"stages to bring up to date (default: all of {', '.join(STAGES)})")
+    parser.add_argument("--force", action="store_true", help="rerun stages even when their outputs are newer than their inputs")
+    parser.add_argument("--jobs", type=int, default=None, help="max stages running at once")
+    args = parser.parse_args()
+    unknown = [t for t in args.targets if t not in STAGES]
+    if unknown: parser.error(f"unknown stage(s): {', '.join(unknown)}")
+    results = run_pipeline(args.targets or None, force=args.force, jobs=args.jobs)
+    sys.exit(1 if any(r["status"] in ("failed", "blocked") for r in results.values()) else 0)
@@ -0,0 +1,14 @@
+import numpy as np
+
+FEATURES = ['labor_intensity_score', 'mobility_index', 'child_compliance_ratio']
+URBAN, LABOR, MIXED = "Urban / Digital Hub", "Manual Labor Zone", "Evolving / Mixed"
+
+
+def name_clusters(labor, mobility):
+    """
+    Naming Logic, one array op for all rows (first matching rule wins):
+    mobility > labor -> Urban / Digital Hub, labor > 0.6 -> Manual Labor Zone, else Evolving / Mixed.
+    """
+    labor = np.asarray(labor, dtype=float)
+    mobility = np.asarray(mobility, dtype=float)
+    return np.select([mobility > labor, labor > 0.6], [URBAN, LABOR], default=MIXED)
@@ -0,0 +1,268 @@
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import argparse
+import joblib
+import numpy as np
+from storage import MODEL_DIR
+from ensemble import (ArrayClassifier, ArrayIsolationForest, compile_artifact, flatten_isolation_forest,
+                      flatten_rf_classifier)
+
+REGISTRY_DIR = os.path.join(MODEL_DIR, "registry")
+POINTER = "CURRENT"          # {"version": ..., "history": [older versions, newest last]}
+META = "meta.json"
+OBJECT = "object.pkl"        # the model as trained (joblib), always kept
+ARRAYS = "arrays"            # flattened trees, one .npy per array, loaded with mmap
+HASH_CHUNK = 1 << 20
+
+
+# --- compiling models to mmap-able arrays ---
+#
+# Unpickling a sklearn / xgboost forest copies every node into the process, so N server workers
+# hold N copies. The flat arrays are read with np.load(mmap_mode="r") instead: the OS page cache
+# keeps one physical copy no matter how many workers map it.
+
+def _compile(kind, obj, sample=None):
+    """
+    (forests, scalars) for the kinds we can serve from arrays, None for the rest.
+    Every flatten checks itself against the native model on `sample` (ValueError if they disagree).
+    """
+    if kind == "forecast":
+        compiled = compile_artifact(obj, sample)
+        forests = compiled.pop("forests")
+        return forests, compiled
+    if kind == "classifier" and hasattr(obj, "estimators_") and len(getattr(obj, "classes_", [])) == 2:
+        return {"rf": flatten_rf_classifier(obj, sample)}, {"classes": obj.classes_.tolist()}
+    if kind == "sentinel" and hasattr(obj, "estimators_features_"):
+        return {"if": flatten_isolation_forest(obj, sample)}, {}
+    return None
+
+
+def _from_arrays(kind, forests, scalars):
+    if kind == "forecast":
+        return {**scalars, "forests": forests}
+    if kind == "classifier":
+        return ArrayClassifier(forests["rf"], scalars["classes"])
+    return ArrayIsolationForest(forests["if"])
+
+
+def _jsonable(value):
+    # numpy scalars in metrics / artifact metadata
+    return value.item() if hasattr(value, "item") else str(value)
+
+
+# --- layout ---
+
+def _model_dir(name):
+    return os.path.join(REGISTRY_DIR, name)
+
+
+def versions(name):
+    """Registered versions of a model, oldest first."""
+    path = _model_dir(name)
+    if not os.path.isdir(path): return []
+    return sorted(v for v in os.listdir(path) if v.startswith("v") and v[1:].isdigit())
+
+
+def content_hash(version_dir):
+    """sha256 over every file of a version except meta.json, in path order."""
+    h = hashlib.sha256()
+    for root, dirs, files in os.walk(version_dir):
+        dirs.sort()
+        for f in sorted(files):
+            if root == version_dir and f == META: continue
+            path = os.path.join(root, f)
+            h.update(os.path.relpath(path, version_dir).encode())
+            with open(path, "rb") as fh:
+                for block in iter(lambda: fh.read(HASH_CHUNK), b""):
+                    h.update(block)
+    return h.hexdigest()
+
+
+def pointer_path(name):
+    return os.path.join(_model_dir(name), POINTER)
+
+
+def read_pointer(name):
+    path = pointer_path(name)
+    if not os.path.exists(path): return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def _write_pointer(name, pointer):
+    path = pointer_path(name)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(pointer, f, indent=2)
+    os.replace(tmp_path, path)  # readers see the old pointer or the new one, never half of one
+
+
+# --- writing ---
+
+def register(name, obj, kind=None, features=None, metrics=None, extra=None, promote=True, sample=None):
+    """
+    Stores a trained model as the next version of `name`: the joblib object, its flattened
+    trees (when `kind` is forecast / classifier / sentinel), and meta.json with the content
+    hash, feature schema, metrics and any `extra` the loader needs (e.g. a calibration).
+    Flattened trees that don't predict like the object on `sample` (training rows; default:
+    probe rows) are not stored, that version then always loads the object.
+    The version directory is built aside and renamed in, then promoted unless promote=False.
+    """
+    os.makedirs(_model_dir(name), exist_ok=True)
+    existing = versions(name)
+    version = f"v{int(existing[-1][1:]) + 1 if existing else 1:04d}"
+    final_dir = os.path.join(_model_dir(name), version)
+    tmp_dir = f"{final_dir}.tmp{os.getpid()}"
+    os.makedirs(tmp_dir)
+
+    joblib.dump(obj, os.path.join(tmp_dir, OBJECT))
+    try:
+        compiled = _compile(kind, obj, sample)
+    except ValueError as e:
+        print(f" WARNING: {name}: not storing flattened trees, {e}")
+        compiled = None
+    layout = None
+    if compiled is not None:
+        forests, scalars = compiled
+        os.makedirs(os.path.join(tmp_dir, ARRAYS))
+        layout = {"scalars": scalars, "forests": {}}
+        for forest_name, forest in forests.items():
+            layout["forests"][forest_name] = {}
+            for key, value in forest.items():
+                if isinstance(value, np.ndarray):
+                    np.save(os.path.join(tmp_dir, ARRAYS, f"{forest_name}.{key}.npy"), value)
+                else:
+                    layout["forests"][forest_name][key] = value
+
+    meta = {
+        "name": name,
+        "version": version,
+        "kind": kind,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "sha256": content_hash(tmp_dir),
+        "features": list(features) if features is not None else None,
+        "metrics": metrics or {},
+        "compiled": layout,
+        **(extra or {}),
+    }
+    with open(os.path.join(tmp_dir, META), "w") as f:
+        json.dump(meta, f, indent=2, default=_jsonable)
+    os.replace(tmp_dir, final_dir)
+    print(f" Registered {name} {version} (sha256 {meta['sha256'][:12]}{', mmap arrays' if layout else ''})")
+    if promote:
+        promote_version(name, version)
+    return version
+
+
+def promote_version(name, version):
+    if version not in versions(name):
+        raise ValueError(f"{name} has no version {version} (have: {', '.join(versions(name)) or 'none'})")
+    pointer = read_pointer(name) or {"version": None, "history": []}
+    if pointer["version"] == version: return pointer
+    history = pointer["history"] + ([pointer["version"]] if pointer["version"] else [])
+    pointer = {"version": version, "history": [v for v in history if v != version], "promoted_at": time.strftime("%Y-%m-%dT%H:%M:%S")}
+    _write_pointer(name, pointer)
+    print(f" {name}: CURRENT -> {version}")
+    return pointer
+
+
+def rollback(name):
+    """Points CURRENT back at the previously promoted version."""
+    pointer = read_pointer(name)
+    if not pointer or not pointer["history"]:
+        raise ValueError(f"{name} has no earlier version to roll back to")
+    previous = pointer["history"][-1]
+    pointer = {"version": previous, "history": pointer["history"][:-1], "promoted_at": time.strftime("%Y-%m-%dT%H:%M:%S")}
+    _write_pointer(name, pointer)
+    print(f" {name}: CURRENT -> {previous} (rolled back)")
+    return pointer
+
+
+def prune(name, keep=5):
+    """Deletes the oldest versions beyond `keep`, never the current one or its rollback target."""
+    pointer = read_pointer(name) or {"version": None, "history": []}
+    protected = {pointer["version"], *pointer["history"][-1:]}
+    for version in versions(name)[:-keep]:
+        if version in protected: continue
+        shutil.rmtree(os.path.join(_model_dir(name), version))
+        print(f" {name}: pruned {version}")
+
+
+# --- reading ---
+
+def has_current(name):
+    return read_pointer(name) is not None
+
+
+def load_meta(name, version=None):
+    version = version or read_pointer(name)["version"]
+    with open(os.path.join(_model_dir(name), version, META)) as f:
+        return json.load(f)
+
+
+def load(name, version=None, mmap=True, verify=False):
+    """
+    (model, meta) for a version (default: CURRENT). With mmap=True compiled models come back as
+    array-backed predictors over read-only memory maps; everything else is unpickled.
+    verify=True re-hashes the files first (reads them all, so it's off by default).
+    """
+    meta = load_meta(name, version)
+    version_dir = os.path.join(_model_dir(name), meta["version"])
+    if verify and content_hash(version_dir) != meta["sha256"]:
+        raise ValueError(f"{name} {meta['version']}: content hash mismatch, files changed since registration")
+    layout = meta.get("compiled")
+    if mmap and layout:
+        forests = {}
+        for forest_name, scalars in layout["forests"].items():
+            forest = dict(scalars)
+            prefix = forest_name + "."
+            for f in os.listdir(os.path.join(version_dir, ARRAYS)):
+                if f.startswith(prefix) and f.endswith(".npy"):
+                    forest[f[len(prefix):-4]] = np.load(os.path.join(version_dir, ARRAYS, f), mmap_mode="r")
+            forests[forest_name] = forest
+        return _from_arrays(meta["kind"], forests, layout["scalars"]), meta
+    return joblib.load(os.path.join(version_dir, OBJECT)), meta
+
+
+def _list(name):
+    pointer = read_pointer(name) or {"version": None}
+    for version in versions(name):
+        meta = load_meta(name, version)
+        marker = "*" if version == pointer["version"] else " "
+        metrics = ", ".join(f"{k}={v:.4g}" if isinstance(v, (int, float)) else f"{k}={v}" for k, v in meta["metrics"].items())
+        print(f" {marker} {version}  {meta['created_at']}  {meta['sha256'][:12]}  {metrics}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="List, promote, roll back or verify registered models")
+    parser.add_argument("command", choices=["list", "promote", "rollback", "verify", "prune"])
+    parser.add_argument("name", nargs="?", help="model name (default for list / verify: every model)")
+    parser.add_argument("version", nargs="?", help="version to promote (e.g. v0003)")
+    parser.add_argument("--keep", type=int, default=5, help="versions kept by prune")
+    args = parser.parse_args()
+    names = [args.name] if args.name else sorted(os.listdir(REGISTRY_DIR)) if os.path.isdir(REGISTRY_DIR) else []
+    if args.command in ("promote", "rollback", "prune") and not args.name:
+        parser.error(f"{args.command} needs a model name")
+    if args.command == "promote":
+        if not args.version: parser.error("promote needs a version")
+        promote_version(args.name, args.version)
+    elif args.command == "rollback":
+        rollback(args.name)
+    elif args.command == "prune":
+        prune(args.name, args.keep)
+    else:
+        failed = False
+        for name in names:
+            print(name)
+            if args.command == "list":
+                _list(name)
+            else:
+                for version in versions(name):
+                    ok = content_hash(os.path.join(_model_dir(name), version)) == load_meta(name, version)["sha256"]
+                    failed |= not ok
+                    print(f"   {version}: {'ok' if ok else 'HASH MISMATCH'}")
+        sys.exit(1 if failed else 0)
@@ -6,13 +6,33 @@ load_dotenv()
 
 #CONFIGURATION(.env bnakr usme GEMINI_API_KEY= krkr ek gemini api key paste krdena)
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+# "local" writes a canned summary from the stats instead of calling Gemini (offline dev / tests)
+REPORT_GENERATOR = os.getenv("AADHAAR_REPORT_GENERATOR", "gemini")
 
-def generate_ai_report(input_stats):
+def local_report(input_stats):
     """
-    Generates a text report using Google's Gemini API.
+    Offline stand-in for the Gemini report: same input, plain text, no network.
+    Deterministic, so identical stats give an identical report.
     """
+    return (
+        "Executive summary (generated locally, no LLM was called).\n"
+        f"Statistics: {input_stats}\n"
+        "Review the high risk districts on the anomaly map first, then compare the projected footfall "
+        "against current centre capacity before reallocating operators."
+    )
+
+def generate_ai_report(input_stats, raise_errors=False):
+    """
+    Generates a text report using Google's Gemini API (or local_report when AADHAAR_REPORT_GENERATOR=local).
+    Failures come back as a message for the UI, or are raised with raise_errors=True (so callers caching
+    reports don't keep the message).
+    """
+    if REPORT_GENERATOR == "local":
+        return local_report(input_stats)
+
     if not GEMINI_API_KEY:
         print(" Error: GEMINI_API_KEY is missing in .env file")
+        if raise_errors: raise RuntimeError("GEMINI_API_KEY is missing")
         return "Error: API Key missing. Please check backend configuration."
 
     try:
@@ -38,4 +58,5 @@ def generate_ai_report(input_stats):
 
     except Exception as e:
         print(f" Gemini API Error: {str(e)}")
+        if raise_errors: raise
         return "Report generation is temporarily unavailable."
\ No newline at end of file
@@ -0,0 +1,116 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import report
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# one <report id>.json per entry, shared by every server process (any of them can answer a poll)
+REPORTS_DIR = os.getenv("AADHAAR_REPORTS_DIR", os.path.join(BASE_DIR, "reports"))
+MAX_ENTRIES = int(os.getenv("AADHAAR_REPORT_CACHE_SIZE", "256"))   # reports kept, least recently used dropped first
+REPORT_WORKERS = int(os.getenv("AADHAAR_REPORT_WORKERS", "4"))     # LLM calls in flight at once (per process)
+# a report still pending after this long lost its writer (restart / crash) and is started again
+PENDING_TIMEOUT = float(os.getenv("AADHAAR_REPORT_TIMEOUT", "300"))
+
+# entry: {"id", "state": pending / done / failed, "report" or "error", "stats", "created_at", "seconds"}
+_LOCK = threading.Lock()
+_POOL = ThreadPoolExecutor(max_workers=REPORT_WORKERS, thread_name_prefix="report")
+
+
+def report_id(input_stats):
+    # the generator is part of the key, a local stand-in report must never be served as the real one
+    return hashlib.sha256(f"{report.REPORT_GENERATOR}\n{input_stats}".encode()).hexdigest()[:32]
+
+
+def _path(key):
+    return os.path.join(REPORTS_DIR, f"{key}.json")
+
+
+def _read(key):
+    if not key.isalnum(): return None
+    try:
+        with open(_path(key)) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _write(entry):
+    os.makedirs(REPORTS_DIR, exist_ok=True)
+    path = _path(entry["id"])
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(entry, f)
+    os.replace(tmp_path, path)  # readers in any process see the old entry or the new one
+
+
+def _evict():
+    # LRU over the files: a hit touches its file, so the oldest mtimes go first
+    files = []
+    for f in os.listdir(REPORTS_DIR):
+        if not f.endswith(".json"): continue
+        try:
+            files.append((os.path.getmtime(os.path.join(REPORTS_DIR, f)), f))
+        except FileNotFoundError:
+            continue
+    for _, f in sorted(files)[:max(len(files) - MAX_ENTRIES, 0)]:
+        try:
+            os.remove(os.path.join(REPORTS_DIR, f))
+        except FileNotFoundError:
+            pass
+
+
+def _stale(entry):
+    return entry["state"] == "pending" and time.time() - entry["created_at"] > PENDING_TIMEOUT
+
+
+def _generate(key, input_stats):
+    start = time.perf_counter()
+    try:
+        text = report.generate_ai_report(input_stats, raise_errors=True)
+        update = {"state": "done", "report": text}
+    except Exception as e:
+        update = {"state": "failed", "error": f"Report generation failed: {e}"}
+    update["seconds"] = round(time.perf_counter() - start, 3)
+    entry = _read(key) or {"id": key, "stats": input_stats, "created_at": time.time()}
+    entry.update(update)
+    _write(entry)
+
+
+def request_report(input_stats):
+    """
+    Handle (the entry) for the report on these stats. Identical stats share one entry,
+    a cache hit comes back already done, and only a miss (or an earlier failure) starts an LLM call.
+    """
+    key = report_id(input_stats)
+    with _LOCK:
+        entry = _read(key)
+        if entry is not None and entry["state"] != "failed" and not _stale(entry):
+            try:
+                os.utime(_path(key))  # most recently used
+            except FileNotFoundError:
+                pass
+            return entry
+        # two processes missing on the same stats at once both call the LLM; the last answer is kept
+        entry = {"id": key, "state": "pending", "stats": input_stats, "created_at": time.time()}
+        _write(entry)
+        _evict()
+    _POOL.submit(_generate, key, input_stats)
+    return entry
+
+
+def get_report(key):
+    """Entry for a report id, None when it's unknown or was evicted."""
+    entry = _read(key)
+    if entry is not None and _stale(entry):
+        return dict(entry, state="failed", error="Report generation was interrupted, simulate again to retry")
+    return entry
+
+
+def clear():
+    with _LOCK:
+        if not os.path.isdir(REPORTS_DIR): return
+        for f in os.listdir(REPORTS_DIR):
+            if f.endswith(".json"): os.remove(os.path.join(REPORTS_DIR, f))
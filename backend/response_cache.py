@@ -0,0 +1,104 @@
+import os
+import glob
+import gzip
+import hashlib
+import functools
+import threading
+from collections import OrderedDict
+import flask
+import pandas as pd
+from flask import Response, request
+from storage import DATA_DIR, find_dataset, is_partitioned, modified_time
+
+MAX_ENTRIES = 512       # (endpoint, query string) bodies kept, least recently used dropped first
+GZIP_LEVEL = 6
+MIN_GZIP_BYTES = 1024   # tiny bodies aren't worth a Content-Encoding
+GZIP_SUFFIX = "-gzip"
+
+_ENTRIES = OrderedDict()
+_LOCK = threading.Lock()
+
+
+def _code_version():
+    # views call into helper modules (geo, storage, ...) and pandas / flask, so the view's own bytecode
+    # isn't enough: any change to the backend sources or those versions makes every old tag stale
+    release = os.getenv("AADHAAR_RELEASE")
+    if release: return release
+    h = hashlib.sha256(f"pandas {pd.__version__} flask {flask.__version__}".encode())
+    for path in sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), "*.py"))):
+        with open(path, "rb") as f:
+            h.update(os.path.basename(path).encode() + b"\0" + f.read())
+    return h.hexdigest()[:16]
+
+
+CODE_VERSION = _code_version()
+
+
+def dataset_version(name, data_dir=DATA_DIR):
+    """Fingerprint of a dataset as it is on disk now: path + mtime + size (None when missing)."""
+    path = find_dataset(name, data_dir)
+    if path is None: return None
+    size = 0 if is_partitioned(path) else os.path.getsize(path)
+    return f"{os.path.basename(path)}:{modified_time(path):.6f}:{size}"
+
+
+def _etag(view, version):
+    # strong tag: same code + same query + same loaded data => byte-identical body, in every worker
+    payload = f"{CODE_VERSION}/{view.__module__}.{view.__name__}:{hashlib.sha256(view.__code__.co_code).hexdigest()}" \
+              f"?{request.query_string.decode()}@{version}"
+    return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+
+def _respond(entry):
+    gzip_ok = entry["gzip"] is not None and "gzip" in request.accept_encodings
+    resp = Response(entry["gzip"] if gzip_ok else entry["body"], status=200, mimetype="application/json")
+    if gzip_ok: resp.headers["Content-Encoding"] = "gzip"
+    # each encoding is its own representation, so it gets its own strong tag
+    resp.set_etag(entry["tag"] + GZIP_SUFFIX if gzip_ok else entry["tag"])
+    return resp
+
+
+def cached_get(version_of):
+    """
+    Serves a GET view from pre-serialized bytes. version_of() returns the fingerprint of the data
+    the view reads; the body is rebuilt only when it changes. If-None-Match hits answer 304
+    before the view (or pandas) runs; non-200 answers pass through uncached.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            version = version_of()
+            tag = _etag(view, version)
+            matched = next((t for t in (tag, tag + GZIP_SUFFIX) if request.if_none_match.contains(t)), None)
+            if matched:
+                resp = Response(status=304)
+                resp.set_etag(matched)
+            else:
+                key = (view.__name__, request.query_string)
+                with _LOCK:
+                    entry = _ENTRIES.get(key)
+                    if entry is not None: _ENTRIES.move_to_end(key)
+                if entry is None or entry["tag"] != tag:
+                    built = view(*args, **kwargs)
+                    resp = built[0] if isinstance(built, tuple) else built
+                    status = built[1] if isinstance(built, tuple) else resp.status_code
+                    if status != 200: return built
+                    body = resp.get_data()
+                    entry = {"tag": tag, "body": body,
+                             "gzip": gzip.compress(body, GZIP_LEVEL) if len(body) >= MIN_GZIP_BYTES else None}
+                    with _LOCK:
+                        _ENTRIES[key] = entry
+                        _ENTRIES.move_to_end(key)
+                        while len(_ENTRIES) > MAX_ENTRIES: _ENTRIES.popitem(last=False)
+                resp = _respond(entry)
+            resp.headers["Vary"] = "Accept-Encoding"
+            # always revalidate: a 304 costs one hash, and new data shows up straight away
+            resp.headers["Cache-Control"] = "no-cache"
+            return resp
+        return wrapper
+    return decorator
+
+
+def clear():
+    with _LOCK:
+        _ENTRIES.clear()
@@ -0,0 +1,156 @@
+import os
+import json
+import argparse
+import joblib
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from storage import MODEL_DIR, dataset_exists, iter_dataset, append_dataset, read_dataset
+from feature_store import get_merged
+
+FEATURES = ['infiltration_index', 'Birth_index', 'correction_index']
+MODEL_PATH = os.path.join(MODEL_DIR, 'model_sentinel.pkl')
+CALIBRATION_PATH = os.path.join(MODEL_DIR, 'model_sentinel_calibration.json')
+# written by every Model_01 run, accepted or not: the pipeline stage's output (see pipeline.py)
+RUN_PATH = os.path.join(MODEL_DIR, 'model_sentinel_run.json')
+QUANTILE_LEVELS = np.linspace(0, 1, 1001)
+CHUNK_ROWS = 100_000
+
+
+def fit_calibration(raw_scores):
+    """Reference quantiles of decision_function over the training rows."""
+    return {
+        'levels': QUANTILE_LEVELS.tolist(),
+        'quantiles': np.quantile(raw_scores, QUANTILE_LEVELS).tolist(),
+        'n_train': int(len(raw_scores)),
+    }
+
+
+def risk_from_raw(raw_scores, calibration):
+    """
+    0-100 risk = share of training rows that looked more normal than this one.
+    Depends only on the row itself, not on the rest of the batch.
+    Without a calibration (None) it falls back to the old min-max over the batch.
+    """
+    if calibration is None:
+        raw_scores = np.asarray(raw_scores, dtype=float)
+        if raw_scores.size == 0: return raw_scores
+        return np.round(100 * (raw_scores.max() - raw_scores) / (raw_scores.max() - raw_scores.min() + 1e-6), 2)
+    cdf = np.interp(raw_scores, calibration['quantiles'], calibration['levels'])
+    return np.round(100 * (1 - cdf), 2)
+
+
+def save_calibration(calibration, path=CALIBRATION_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(calibration, f)
+    os.replace(tmp_path, path)
+
+
+def save_run(run, path=RUN_PATH):
+    # same atomic write, the stamp is small enough to read at a glance
+    save_calibration(run, path)
+
+
+def calibration_from_dataset(name='anomalies_data'):
+    """Calibration rebuilt from the raw_anomaly_score column Model_01 saved with its rows (None if there's none)."""
+    if not dataset_exists(name): return None
+    raw = read_dataset(name, columns=['raw_anomaly_score'])
+    if 'raw_anomaly_score' not in raw.columns: return None
+    raw = raw['raw_anomaly_score'].dropna()
+    return fit_calibration(raw) if len(raw) else None
+
+
+def load_sentinel(model_path=MODEL_PATH, calibration_path=CALIBRATION_PATH):
+    """The model + its calibration; a missing calibration file degrades (see below) instead of failing."""
+    model = joblib.load(model_path)
+    if os.path.exists(calibration_path):
+        with open(calibration_path) as f:
+            return model, json.load(f)
+    # models trained before the calibration file existed (e.g. the shipped model_sentinel.pkl)
+    calibration = calibration_from_dataset()
+    if calibration is not None:
+        print(f" WARNING: {calibration_path} missing, calibrating risk from anomalies_data (retrain Model_01.py to fix)")
+    else:
+        print(f" WARNING: {calibration_path} missing, risk falls back to min-max per upload (retrain Model_01.py to fix)")
+    return model, calibration
+
+
+def score_frame(model, calibration, X):
+    """raw_anomaly_score / risk_score / anomaly_label for every row of X (one decision_function pass)."""
+    raw = model.decision_function(X[FEATURES] if isinstance(X, pd.DataFrame) else X)
+    return pd.DataFrame({
+        'raw_anomaly_score': raw,
+        'risk_score': risk_from_raw(raw, calibration),
+        # same rule as IsolationForest.predict, without scoring the rows twice
+        'anomaly_label': np.where(raw < 0, -1, 1),
+    }, index=X.index if isinstance(X, pd.DataFrame) else None)
+
+
+_WORKER = {}
+
+def _init_worker(model_path, calibration_path):
+    model, calibration = load_sentinel(model_path, calibration_path)
+    model.n_jobs = 1  # the pool already uses every core
+    _WORKER['model'], _WORKER['calibration'] = model, calibration
+
+
+def _score_chunk(X):
+    return score_frame(_WORKER['model'], _WORKER['calibration'], X)
+
+
+def score_parallel(X, workers=None, chunk_rows=CHUNK_ROWS, model_path=MODEL_PATH, calibration_path=CALIBRATION_PATH):
+    """
+    Scores X in chunks of chunk_rows on a process pool (`workers`, default all cores; 1 runs inline).
+    Since scores are calibrated per row, the chunks are independent.
+    """
+    if X.empty:
+        return pd.DataFrame(columns=['raw_anomaly_score', 'risk_score', 'anomaly_label'], index=X.index)
+    chunks = [X.iloc[i:i + chunk_rows] for i in range(0, len(X), chunk_rows)]
+    if workers == 1 or len(chunks) <= 1:
+        model, calibration = load_sentinel(model_path, calibration_path)
+        scored = [score_frame(model, calibration, c) for c in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(model_path, calibration_path)) as pool:
+            scored = list(pool.map(_score_chunk, chunks))
+    return pd.concat(scored)
+
+
+def latest_scored_date(name='anomalies_data'):
+    if not dataset_exists(name): return None
+    latest = None
+    for chunk in iter_dataset(name, columns=['date']):
+        day = pd.to_datetime(chunk['date']).max()
+        latest = day if latest is None or day > latest else latest
+    return latest
+
+
+def score_new_rows(workers=None, chunk_rows=CHUNK_ROWS):
+    """
+    Scores merged enrolment + demographic rows newer than anything in 'anomalies_data'
+    and appends them, leaving the rows already scored untouched.
+    """
+    since = latest_scored_date()
+    df = get_merged(['enrol', 'demo'])
+    df['date'] = pd.to_datetime(df['date'])
+    if since is not None:
+        df = df[df['date'] > since]
+    if df.empty:
+        print(" Nothing new to score.")
+        return 0
+    df = df.fillna(0)
+    scored = score_parallel(df[FEATURES], workers=workers, chunk_rows=chunk_rows)
+    df = df.join(scored)
+    path = append_dataset(df, 'anomalies_data')
+    print(f" Scored {len(df)} new rows ({(df['anomaly_label'] == -1).sum()} flagged), appended to {path}")
+    return len(df)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score new rows with the trained sentinel (Model 01) and append them to anomalies_data")
+    parser.add_argument("--workers", type=int, default=None, help="processes used for scoring (default: all cores, 1 = inline)")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS, help="rows per scoring chunk")
+    args = parser.parse_args()
+    score_new_rows(workers=args.workers, chunk_rows=args.chunk_rows)
@@ -0,0 +1,225 @@
+import os
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+from ensemble import predict as predict_forecast
+from sentinel import score_frame
+from pulse import name_clusters
+from geo import map_points
+
+# rows per chunk when an upload is streamed; each chunk is read, scored and sent before the next one is read
+CHUNK_ROWS = 10_000
+# threads shared by all requests for running the four model stages side by side (1 = one after another)
+STAGE_THREADS = int(os.getenv("AADHAAR_STAGE_THREADS", "8"))
+
+_POOL = None
+_POOL_LOCK = threading.Lock()
+
+
+def normalize_columns(df):
+    df.columns = [c.strip().lower() for c in df.columns]
+    return df
+
+
+def get_col(df, names, default=0):
+    for name in names:
+        if name in df.columns: return df[name].fillna(default)
+    # aligned with df, chunks of a streamed upload don't start at row 0
+    return pd.Series([default] * len(df), index=df.index)
+
+
+# Stages read disjoint feature frames built from the upload and only add columns, so they can run at once.
+# Each returns {column: values}, or None when its model isn't loaded.
+
+def _sentinel_stage(raw_df, models):
+    if 'sentinel' not in models: return None
+    #Model 01
+    X_anom = pd.DataFrame({
+        'infiltration_index': get_col(raw_df, ['infiltration_index', 'infiltration']),
+        'Birth_index': get_col(raw_df, ['birth_index', 'births', 'birth']),
+        'correction_index': get_col(raw_df, ['correction_index', 'correction', 'updates'])
+    })
+    # calibrated against the training distribution, so a row's risk doesn't depend on the rest of the upload
+    scored = score_frame(models['sentinel'], models['sentinel_calibration'], X_anom)
+    return {
+        'risk_score': scored['risk_score'],
+        'is_anomaly': scored['anomaly_label'],
+        'anomaly_status': np.where(scored['anomaly_label'] == -1, "High Risk", "Normal"),
+    }
+
+
+def _pulse_stage(raw_df, models):
+    if 'pulse' not in models or 'scaler' not in models: return None
+    # Model02
+    X_clus = pd.DataFrame({
+        'labor_intensity_score': get_col(raw_df, ['labor_intensity_score', 'labor']),
+        'mobility_index': get_col(raw_df, ['mobility_index', 'mobility']),
+        'child_compliance_ratio': get_col(raw_df, ['child_compliance_ratio', 'child_compliance'])
+    })
+    X_clus_scaled = models['scaler'].transform(X_clus)
+    return {
+        'cluster_id': models['pulse'].predict(X_clus_scaled),
+        # same naming rule as Model_02 (pulse.py)
+        'cluster_name': name_clusters(X_clus['labor_intensity_score'], X_clus['mobility_index']),
+    }
+
+
+def _forecast_stage(raw_df, models):
+    if 'forecast' not in models: return None
+    # --- model03
+    # Prepare Time Features
+    if 'date' in raw_df.columns:
+        dates = pd.to_datetime(raw_df['date'])
+        day_sin = np.sin(2 * np.pi * dates.dt.dayofweek / 7)
+        day_cos = np.cos(2 * np.pi * dates.dt.dayofweek / 7)
+        month_sin = np.sin(2 * np.pi * dates.dt.month / 12)
+        month_cos = np.cos(2 * np.pi * dates.dt.month / 12)
+    else:
+        day_sin, day_cos, month_sin, month_cos = 0, 0, 0, 0
+
+    trend = get_col(raw_df, ['target_trend', 'total_enrolment'], 0)
+    X_fore = pd.DataFrame({
+        "is_weekend": get_col(raw_df, ['is_weekend'], 0),
+        "lag_1": trend, "lag_7": trend,
+        "momentum": 1.0, "volatility": 0.0,
+        "day_sin": day_sin, "day_cos": day_cos,
+        "month_sin": month_sin, "month_cos": month_cos
+    })
+    # blend weights + expm1 come from the artifact
+    return {'forecasted_footfall': np.round(predict_forecast(models['forecast'], X_fore), 2)}
+
+
+def _classifier_stage(raw_df, models):
+    if 'classifier' not in models: return None
+    # --- MODEL 4: CLASSIFIER ---
+    labor = get_col(raw_df, ['labor_intensity_score', 'labor'])
+    mobility = get_col(raw_df, ['mobility_index', 'mobility'])
+    efficiency = labor * (mobility + 1)
+
+    X_class = pd.DataFrame({
+        "labor": labor,
+        "mobility": mobility,
+        "infiltration": get_col(raw_df, ['infiltration_index', 'infiltration']),
+        "weekend": get_col(raw_df, ['is_weekend'], 0),
+        "workload_efficiency": efficiency
+    })
+    X_class.fillna(0, inplace=True)
+
+    probs = models['classifier'].predict_proba(X_class)[:, 1]
+    return {
+        'success_probability': np.round(probs * 100, 2),
+        'performance_label': np.where(probs > 0.65, "High Performer", "Needs Improvement"),
+    }
+
+
+# merge order = column order of the result, same as when the stages ran one after another
+STAGES = {
+    "sentinel": _sentinel_stage,
+    "pulse": _pulse_stage,
+    "forecast": _forecast_stage,
+    "classifier": _classifier_stage,
+}
+
+
+def _pool():
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            _POOL = ThreadPoolExecutor(max_workers=STAGE_THREADS, thread_name_prefix="simulate-stage")
+        return _POOL
+
+
+def _timed(stage, raw_df, models):
+    start = time.perf_counter()
+    columns = stage(raw_df, models)
+    return columns, time.perf_counter() - start
+
+
+def run_models(raw_df, models):
+    """
+    Runs every loaded model (sentinel, pulse, forecast, classifier) over an upload / chunk.
+    The four stages run concurrently on a shared thread pool (sklearn / xgboost predict release the GIL),
+    so a request takes about as long as its slowest model. Returns (raw_df + predictions, {stage: seconds}).
+    """
+    start = time.perf_counter()
+    if STAGE_THREADS > 1:
+        futures = {name: _pool().submit(_timed, stage, raw_df, models) for name, stage in STAGES.items()}
+        outputs = {name: future.result() for name, future in futures.items()}
+    else:
+        outputs = {name: _timed(stage, raw_df, models) for name, stage in STAGES.items()}
+
+    results_df = raw_df.copy()
+    timings = {}
+    for name, (columns, seconds) in outputs.items():
+        if columns is None: continue
+        for col, values in columns.items():
+            results_df[col] = values
+        timings[name] = round(seconds, 4)
+    timings["total"] = round(time.perf_counter() - start, 4)
+    return results_df, timings
+
+
+def _high_risk(results_df):
+    if 'anomaly_status' not in results_df.columns: return results_df.iloc[:0]
+    return results_df[results_df['anomaly_status'] == 'High Risk']
+
+
+def to_payload(results_df):
+    """predictions + the two map layers for (a chunk of) simulated rows, as the frontend reads them."""
+    return {
+        # Main data for tables/graphs (includes success_probability, forecasted_footfall)
+        "predictions": results_df.replace({np.nan: None}).to_dict(orient='records'),
+        # Map 1 Data: Anomalies Only
+        "anomalies_map": map_points(_high_risk(results_df), {
+            "district": ("district", "Unknown", None),
+            "risk_score": ("risk_score", 0, float),
+            "state": ("state", "Unknown", None),
+        }),
+        # Map 2 Data: Clusters Only
+        "clusters_map": map_points(results_df, {
+            "district": ("district", "Unknown", None),
+            "cluster_name": ("cluster_name", "Unknown", None),
+            "labor_intensity": ("labor_intensity_score", 0, float),
+        }),
+    }
+
+
+class RunningStats:
+    """Report numbers summed chunk by chunk, so a streamed upload never needs all its rows at once."""
+
+    def __init__(self):
+        self.rows = 0
+        self.high_risk = 0
+        self.sums = {'success_probability': 0.0, 'forecasted_footfall': 0.0}
+        self.counts = {'success_probability': 0, 'forecasted_footfall': 0}
+        self.timings = {}  # stage -> seconds over all chunks
+
+    def update(self, results_df, timings=None):
+        self.rows += len(results_df)
+        for stage, seconds in (timings or {}).items():
+            self.timings[stage] = round(self.timings.get(stage, 0.0) + seconds, 4)
+        self.high_risk += len(_high_risk(results_df))
+        for col in self.sums:
+            if col in results_df.columns:
+                self.sums[col] += float(results_df[col].sum())
+                self.counts[col] += int(results_df[col].count())
+
+    def mean(self, col):
+        return self.sums[col] / self.counts[col] if self.counts[col] else 0.0
+
+    def context(self):
+        """the context string for the LLM"""
+        return (
+            f"Simulated {self.rows} districts. "
+            f"Average Success Probability: {self.mean('success_probability'):.2f}%. "
+            f"High Risk Anomalies Detected: {self.high_risk}. "
+            f"Projected Footfall Avg: {self.mean('forecasted_footfall'):.0f}."
+        )
+
+
+def ndjson(record):
+    """One NDJSON line (dates and other non-JSON scalars as strings)."""
+    return json.dumps(record, default=str) + "\n"
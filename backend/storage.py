@@ -0,0 +1,330 @@
+import os
+import json
+import time
+import shutil
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BASE_DIR, "Datasets")
+MODEL_DIR = os.path.join(BASE_DIR, "Models")
+
+# csv (default, readable anywhere) or parquet (needs pyarrow)
+STORAGE_FORMAT = os.getenv("AADHAAR_STORAGE_FORMAT", "csv").lower()
+
+EXTENSIONS = {"csv": ".csv", "parquet": ".parquet"}
+DATE_COLUMNS = ["date"]
+CATEGORY_COLUMNS = ["state", "district", "month_name", "cluster_name", "anomaly_status"]
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+
+def resolve_format(fmt=None):
+    fmt = (fmt or STORAGE_FORMAT).lower()
+    if fmt not in EXTENSIONS:
+        raise ValueError(f"Unknown storage format '{fmt}' (expected one of {list(EXTENSIONS)})")
+    if fmt == "parquet" and not HAS_PYARROW:
+        print(" Warning: pyarrow is not installed, falling back to CSV.")
+        return "csv"
+    return fmt
+
+
+def format_of(path):
+    return "parquet" if path.endswith(EXTENSIONS["parquet"]) else "csv"
+
+
+def dataset_path(name, fmt=None, data_dir=DATA_DIR):
+    return os.path.join(data_dir, name + EXTENSIONS[resolve_format(fmt)])
+
+
+MANIFEST_NAME = "_manifest.json"
+
+
+def is_partitioned(path):
+    return os.path.isdir(path)
+
+
+def partition_files(path):
+    """Data files of a partitioned dataset directory, in name order."""
+    manifest = os.path.join(path, MANIFEST_NAME)
+    if os.path.exists(manifest):
+        with open(manifest, "r", encoding="utf-8") as f:
+            partitions = json.load(f).get("partitions")
+        if partitions is not None:
+            # write_partitioned: the manifest points at the current version's files
+            return sorted(os.path.join(path, p) for p in partitions.values())
+    return sorted(
+        os.path.join(path, f) for f in os.listdir(path)
+        if f.startswith("part-") and os.path.splitext(f)[1] in EXTENSIONS.values()
+    )
+
+
+def modified_time(path):
+    # a partitioned dataset counts as modified when its manifest was last rewritten
+    if is_partitioned(path):
+        manifest = os.path.join(path, MANIFEST_NAME)
+        return os.path.getmtime(manifest if os.path.exists(manifest) else path)
+    return os.path.getmtime(path)
+
+
+def find_dataset(name, data_dir=DATA_DIR):
+    """
+    Returns the newest existing file (any format) or partition directory
+    for a dataset name, or None.
+    """
+    candidates = [os.path.join(data_dir, name + ext) for ext in EXTENSIONS.values()]
+    candidates.append(os.path.join(data_dir, name))
+    candidates = [p for p in candidates if os.path.exists(p)]
+    if not candidates: return None
+    return max(candidates, key=modified_time)
+
+
+def compact_frame(df):
+    """
+    Shrinks a frame for columnar storage: native datetimes, categorical
+    state/district/month_name, and numerics downcast to the smallest dtype.
+    """
+    out = {}
+    for col in df.columns:
+        s = df[col]
+        if col in DATE_COLUMNS:
+            s = pd.to_datetime(s, errors="coerce")
+        elif col in CATEGORY_COLUMNS:
+            # keeps fillna(0) on merged frames safe: categoricals never carry NaN
+            if s.isna().any(): s = s.astype(object).fillna("Unknown")
+            s = s.astype("category")
+        elif pd.api.types.is_bool_dtype(s):
+            pass
+        elif pd.api.types.is_float_dtype(s):
+            s = pd.to_numeric(s, downcast="float")
+        elif pd.api.types.is_integer_dtype(s):
+            s = pd.to_numeric(s, downcast="integer")
+        out[col] = s
+    return pd.DataFrame(out, index=df.index)
+
+
+def write_frame(df, path, append=False):
+    """Writes df to path in the format implied by its extension."""
+    if format_of(path) == "parquet":
+        if append:
+            raise ValueError("Parquet files can't be appended to; write parts and use concat_files")
+        compact_frame(df).to_parquet(path, index=False)
+    else:
+        df.to_csv(path, mode="a" if append else "w", header=not append, index=False)
+    return path
+
+
+def write_dataset(df, name, fmt=None, data_dir=DATA_DIR):
+    """Saves a named dataset (e.g. 'anomalies_data') and returns the written path."""
+    os.makedirs(data_dir, exist_ok=True)
+    path = dataset_path(name, fmt, data_dir)
+    tmp_path = path + ".tmp" + EXTENSIONS[format_of(path)]
+    write_frame(df, tmp_path)
+    os.replace(tmp_path, path)
+    return path
+
+
+def append_dataset(df, name, data_dir=DATA_DIR):
+    """
+    Adds rows to an existing dataset without touching the rows already stored.
+    CSV is appended in place (columns aligned to the file's header); Parquet
+    can't be appended to, so the file is rewritten with the new rows at the end.
+    """
+    path = find_dataset(name, data_dir)
+    if path is None:
+        return write_dataset(df, name, data_dir=data_dir)
+    if is_partitioned(path):
+        raise ValueError(f"{path} is partitioned; append by writing a new partition")
+    if format_of(path) == "csv":
+        header = pd.read_csv(path, nrows=0).columns
+        write_frame(df.reindex(columns=header), path, append=True)
+        return path
+    df = _concat_parts([read_frame(path), df])
+    tmp_path = path + ".tmp" + EXTENSIONS["parquet"]
+    write_frame(df, tmp_path)
+    os.replace(tmp_path, path)
+    return path
+
+
+def _slug(value):
+    return "".join(c if c.isalnum() else "_" for c in str(value)).strip("_") or "Unknown"
+
+
+def write_partitioned(df, name, by, fmt=None, data_dir=DATA_DIR):
+    """
+    Saves a dataset as a partition directory with one part-<value> file per
+    value of column `by`. Each write goes to a fresh v<...>/ folder inside it and
+    the manifest (which lists the files) is swapped in last with os.replace, so
+    readers see either the old version or the new one, never a half-written mix.
+    Raises ValueError when two values map to the same file name.
+    """
+    ext = EXTENSIONS[resolve_format(fmt)]
+    final_dir = os.path.join(data_dir, name)
+    version = f"v{time.time_ns()}-{os.getpid()}"
+    version_dir = os.path.join(final_dir, version)
+    os.makedirs(version_dir)
+    partitions, owners = {}, {}
+    try:
+        for value, part in df.groupby(by, observed=True, sort=True):
+            filename = f"part-{_slug(value)}{ext}"
+            if filename in owners:
+                raise ValueError(f"{by} values '{owners[filename]}' and '{value}' both map to {filename}")
+            owners[filename] = value
+            write_frame(part, os.path.join(version_dir, filename))
+            partitions[str(value)] = f"{version}/{filename}"
+        manifest = os.path.join(final_dir, MANIFEST_NAME)
+        tmp_path = f"{manifest}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"by": by, "version": version, "partitions": partitions}, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, manifest)
+    except BaseException:
+        shutil.rmtree(version_dir, ignore_errors=True)
+        raise
+
+    # keep the previous version for readers that opened the old manifest just before the swap
+    versions = sorted(e for e in os.listdir(final_dir) if e.startswith("v") and os.path.isdir(os.path.join(final_dir, e)))
+    for old in versions[:-2]:
+        if old != version: shutil.rmtree(os.path.join(final_dir, old), ignore_errors=True)
+    for old in os.listdir(final_dir):
+        # flat part files from before versioned writes
+        if old.startswith("part-"): os.remove(os.path.join(final_dir, old))
+    return final_dir
+
+
+def _csv_columns(path, columns):
+    header = pd.read_csv(path, nrows=0).columns
+    usecols = [c for c in columns if c in header] if columns is not None else None
+    dates = [c for c in DATE_COLUMNS if c in header and (usecols is None or c in usecols)]
+    return usecols, dates
+
+
+def _concat_parts(frames):
+    df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+    # parts carry their own categories, which concat turns back into strings
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns and any(isinstance(f[col].dtype, pd.CategoricalDtype) for f in frames):
+            df[col] = df[col].astype("category")
+    return df
+
+
+def read_frame(path, columns=None):
+    """
+    Reads one file or partition directory; `columns` limits the load to the
+    columns that exist in it.
+    """
+    if is_partitioned(path):
+        return _concat_parts([read_frame(p, columns) for p in partition_files(path)])
+    if format_of(path) == "parquet":
+        if columns is not None:
+            available = set(pq.read_schema(path).names)
+            columns = [c for c in columns if c in available]
+        return pd.read_parquet(path, columns=columns)
+    usecols, dates = _csv_columns(path, columns)
+    return pd.read_csv(path, usecols=usecols, parse_dates=dates)
+
+
+def read_dataset(name, columns=None, data_dir=DATA_DIR):
+    """
+    Loads a named dataset from whichever format is on disk.
+    Raises FileNotFoundError when it doesn't exist.
+    """
+    path = find_dataset(name, data_dir)
+    if path is None:
+        raise FileNotFoundError(os.path.join(data_dir, name))
+    return read_frame(path, columns)
+
+
+def iter_frame(path, columns=None, chunksize=250_000):
+    """Yields a file or partition directory as DataFrames of at most ~chunksize rows."""
+    if is_partitioned(path):
+        for p in partition_files(path):
+            yield from iter_frame(p, columns, chunksize)
+        return
+    if format_of(path) == "parquet":
+        pf = pq.ParquetFile(path)
+        if columns is not None:
+            columns = [c for c in columns if c in pf.schema_arrow.names]
+        for batch in pf.iter_batches(batch_size=chunksize, columns=columns):
+            yield batch.to_pandas()
+        return
+    usecols, dates = _csv_columns(path, columns)
+    yield from pd.read_csv(path, usecols=usecols, parse_dates=dates, chunksize=chunksize)
+
+
+def iter_dataset(name, columns=None, chunksize=250_000, data_dir=DATA_DIR):
+    """Streams a named dataset chunk by chunk (see iter_frame)."""
+    path = find_dataset(name, data_dir)
+    if path is None:
+        raise FileNotFoundError(os.path.join(data_dir, name))
+    return iter_frame(path, columns, chunksize)
+
+
+def peek(path, n=5):
+    """First n rows of a file, without reading the rest."""
+    if is_partitioned(path):
+        parts = partition_files(path)
+        return peek(parts[0], n) if parts else pd.DataFrame()
+    if format_of(path) == "parquet":
+        return next(pq.ParquetFile(path).iter_batches(batch_size=n)).to_pandas()
+    return pd.read_csv(path, nrows=n)
+
+
+def dataset_exists(name, data_dir=DATA_DIR):
+    return find_dataset(name, data_dir) is not None
+
+
+def _widest(types):
+    # parts downcast independently, so pick a type every part fits into
+    if all(pa.types.is_integer(t) for t in types):
+        return max(types, key=lambda t: t.bit_width)
+    if all(pa.types.is_floating(t) for t in types):
+        return max(types, key=lambda t: t.bit_width)
+    if all(pa.types.is_integer(t) or pa.types.is_floating(t) for t in types):
+        return pa.float64()
+    return types[0]
+
+
+def _unified_schema(schemas):
+    fields = []
+    for f in schemas[0]:
+        types = [s.field(f.name).type for s in schemas if f.name in s.names]
+        if pa.types.is_dictionary(f.type):
+            fields.append(f.with_type(pa.dictionary(pa.int32(), f.type.value_type)))
+        else:
+            fields.append(f.with_type(_widest(types)))
+    return pa.schema(fields, metadata=schemas[0].metadata)
+
+
+def concat_files(part_paths, output_path):
+    """
+    Stitches part files (same format as output_path) into one file without
+    loading them all at once, then deletes the parts.
+    """
+    tmp_path = output_path + ".tmp" + EXTENSIONS[format_of(output_path)]
+    if format_of(output_path) == "parquet":
+        parts = [p for p in part_paths if os.path.getsize(p) > 0]
+        if parts:
+            schema = _unified_schema([pq.read_schema(p) for p in parts])
+            with pq.ParquetWriter(tmp_path, schema) as writer:
+                for p in parts:
+                    for batch in pq.ParquetFile(p).iter_batches():
+                        writer.write_table(pa.Table.from_batches([batch]).cast(schema))
+        for p in part_paths: os.remove(p)
+    else:
+        header_written = False
+        with open(tmp_path, "wb") as out:
+            for p in part_paths:
+                with open(p, "rb") as part:
+                    header = part.readline()
+                    if header and not header_written:
+                        out.write(header)
+                        header_written = True
+                    shutil.copyfileobj(part, out)
+                os.remove(p)
+    if os.path.exists(tmp_path):
+        os.replace(tmp_path, output_path)
+    return output_path
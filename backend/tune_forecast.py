@@ -0,0 +1,164 @@
+import os
+import json
+import time
+import argparse
+import itertools
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from sklearn.metrics import mean_absolute_percentage_error
+from feature_store import fingerprint
+from model_selection import MATRIX_DIR
+from Model_03 import (DEFAULT_PARAMS, FEATURES, TARGET, TUNING_PATH, build_features, daily_totals_streaming,
+                      make_rf, make_xgb, train_footfall_model)
+
+# candidates are the cross product of each grid
+XGB_GRID = {
+    "n_estimators": [300, 600, 1000],
+    "learning_rate": [0.005, 0.01, 0.03],
+    "max_depth": [3, 5, 7],
+    "subsample": [0.8],
+    "colsample_bytree": [0.8],
+}
+RF_GRID = {"rf_estimators": [100, 200, 400]}
+# blend weights don't need a refit: they're scored on the fold predictions of both models
+XGB_WEIGHTS = [round(w, 1) for w in np.linspace(0, 1, 11)]
+
+FOLDS = 5
+HORIZON = 30          # days per validation window
+MIN_TRAIN_DAYS = 60   # first fold still needs enough history to learn anything
+
+
+def rolling_origin_folds(n_days, folds=FOLDS, horizon=HORIZON, min_train=MIN_TRAIN_DAYS):
+    """
+    Expanding-window splits ending at the last day: fold i trains on [0, origin) and
+    validates on [origin, origin + horizon). Returns [(origin, end), ...], oldest first.
+    """
+    splits = [(n_days - (folds - i) * horizon, n_days - (folds - i - 1) * horizon) for i in range(folds)]
+    splits = [(origin, end) for origin, end in splits if origin >= min_train]
+    if not splits:
+        raise ValueError(f"{n_days} days is too short for a {horizon}-day fold after {min_train} training days")
+    return splits
+
+
+def forecast_matrix(chunksize=250_000):
+    """
+    FEATURES + TARGET of the national daily series as one float64 .npy (target last),
+    keyed on the inputs' fingerprint so every candidate and fold (and every worker, via mmap) shares it.
+    """
+    sources = ["enrol", "demo", "bio"]
+    tag = f"forecast-{fingerprint(sources)[:16]}"
+    path = os.path.join(MATRIX_DIR, tag + ".npy")
+    if os.path.exists(path):
+        print(f" Matrix cache hit: {os.path.basename(path)}")
+        return path
+
+    daily = build_features(daily_totals_streaming(chunksize))
+    M = daily[FEATURES + [TARGET]].to_numpy(np.float64)
+    os.makedirs(MATRIX_DIR, exist_ok=True)
+    for old in os.listdir(MATRIX_DIR):
+        if old.startswith("forecast-") and old.endswith(".npy"):
+            os.remove(os.path.join(MATRIX_DIR, old))
+    tmp_path = os.path.join(MATRIX_DIR, f"{tag}.{os.getpid()}.tmp.npy")
+    np.save(tmp_path, M)
+    os.replace(tmp_path, path)
+    print(f" Matrix cached: {os.path.basename(path)} ({len(M)} days)")
+    return path
+
+
+# --- one candidate per worker ---
+
+_MATRIX = {}
+
+def _open_matrix(path):
+    _MATRIX["M"] = np.load(path, mmap_mode="r")
+
+
+def _eval_candidate(job):
+    """Fits one model config on every fold; returns its log-space fold predictions and fit time."""
+    kind, params, folds = job
+    M = _MATRIX["M"]
+    params = {**DEFAULT_PARAMS, **params}
+    start = time.perf_counter()
+    preds = []
+    for origin, end in folds:
+        # one core per candidate, the process pool provides the parallelism
+        model = make_xgb(params, n_jobs=1) if kind == "xgb" else make_rf(params, n_jobs=1)
+        model.fit(M[:origin, :-1], np.log1p(M[:origin, -1]))
+        preds.append(model.predict(M[origin:end, :-1]))
+    return kind, params, preds, time.perf_counter() - start
+
+
+def _grid(grid):
+    return [dict(zip(grid, values)) for values in itertools.product(*grid.values())]
+
+
+def run_search(xgb_grid=XGB_GRID, rf_grid=RF_GRID, folds=FOLDS, horizon=HORIZON, workers=None):
+    start = time.perf_counter()
+    path = forecast_matrix()
+    M = np.load(path, mmap_mode="r")
+    splits = rolling_origin_folds(len(M), folds, horizon)
+    actual = [np.asarray(M[origin:end, -1]) for origin, end in splits]
+    print(f"{len(splits)} rolling-origin folds of {horizon} days (first origin: day {splits[0][0]} of {len(M)})")
+
+    jobs = [("xgb", p, splits) for p in _grid(xgb_grid)] + [("rf", p, splits) for p in _grid(rf_grid)]
+    print(f"Fitting {len(jobs)} candidates x {len(splits)} folds on {workers or os.cpu_count()} processes...")
+    if workers == 1:
+        _open_matrix(path)
+        fitted = [_eval_candidate(j) for j in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_open_matrix, initargs=(path,)) as pool:
+            fitted = list(pool.map(_eval_candidate, jobs))
+
+    xgbs = [f for f in fitted if f[0] == "xgb"]
+    rfs = [f for f in fitted if f[0] == "rf"]
+    results = []
+    for (_, xp, x_preds, x_sec), (_, rp, r_preds, r_sec) in itertools.product(xgbs, rfs):
+        for w in XGB_WEIGHTS:
+            # same blend as ensemble.predict: weighted in log space, then expm1
+            mapes = [mean_absolute_percentage_error(a, np.expm1(w * x + (1 - w) * r)) * 100
+                     for a, x, r in zip(actual, x_preds, r_preds)]
+            results.append({
+                **{k: xp[k] for k in XGB_GRID}, "rf_estimators": rp["rf_estimators"],
+                "weights": {"xgb": w, "rf": round(1 - w, 1)},
+                "cv_mape": float(np.mean(mapes)),
+                "fold_mapes": [float(m) for m in mapes],
+                "fit_seconds": x_sec + r_sec,
+            })
+    results.sort(key=lambda r: (r["cv_mape"], r["fit_seconds"]))
+
+    default = next((r for r in results if all(r[k] == DEFAULT_PARAMS[k] for k in DEFAULT_PARAMS)), None)
+    print("\n--- TOP CONFIGS (rolling-origin MAPE) ---")
+    print(f"{'trees':>6}{'lr':>7}{'depth':>6}{'rf':>5}{'w_xgb':>7}{'MAPE %':>9}{'fit s':>8}")
+    for r in results[:10] + ([default] if default and default not in results[:10] else []):
+        tag = "  <- current defaults" if r is default else ""
+        print(f"{r['n_estimators']:>6}{r['learning_rate']:>7}{r['max_depth']:>6}{r['rf_estimators']:>5}"
+              f"{r['weights']['xgb']:>7}{r['cv_mape']:>9.2f}{r['fit_seconds']:>8.1f}{tag}")
+
+    tuning = {
+        "best": results[0],
+        "folds": [list(s) for s in splits],
+        "horizon": horizon,
+        "tuned_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "candidates": results,
+    }
+    os.makedirs(os.path.dirname(TUNING_PATH), exist_ok=True)
+    tmp_path = TUNING_PATH + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(tuning, f, indent=2)
+    os.replace(tmp_path, TUNING_PATH)
+    print(f"\n Best CV MAPE {results[0]['cv_mape']:.2f}% from {len(results)} configs "
+          f"in {time.perf_counter() - start:.1f}s -> {TUNING_PATH}")
+    return tuning
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rolling-origin hyperparameter search for the Model_03 ensemble")
+    parser.add_argument("--folds", type=int, default=FOLDS, help="rolling-origin folds")
+    parser.add_argument("--horizon", type=int, default=HORIZON, help="days per validation window")
+    parser.add_argument("--workers", type=int, default=None, help="processes fitting candidates (default: all cores)")
+    parser.add_argument("--retrain", action="store_true",
+                        help="retrain Model_03 with the winning config afterwards (it lands in footfall_forecast.pkl)")
+    args = parser.parse_args()
+    run_search(folds=args.folds, horizon=args.horizon, workers=args.workers)
+    if args.retrain:
+        train_footfall_model()
@@ -1,4 +1,4 @@
-import React, { useState, useMemo } from "react";
+import React, { useState, useMemo, useRef } from "react";
 import axios from "axios";
 import { 
   Upload, Play, AlertCircle, Loader2, FileCheck, 
@@ -23,6 +23,8 @@ export default function ResourceSimulator() {
   const [error, setError] = useState("");
   const [activeOption, setActiveOption] = useState("table");
   const [searchTerm, setSearchTerm] = useState("");
+  // report id of the latest simulation, an older poll stops as soon as this moves on
+  const activeReport = useRef(null);
 
   const sanitizeData = (data) => {
     const stringified = JSON.stringify(data, (key, value) => {
@@ -39,6 +41,28 @@ export default function ResourceSimulator() {
     setFile(selectedFile);
     setError("");
     setSimResult(null);
+    activeReport.current = null;
+  };
+
+  // the report is written in the background, poll its url until it's there
+  const pollReport = async (id, url) => {
+    const setReport = (report, report_status) =>
+      setSimResult(prev => prev && prev.report_id === id ? { ...prev, report, report_status } : prev);
+    for (let attempt = 0; attempt < 90; attempt++) {
+      if (activeReport.current !== id) return;
+      try {
+        const res = await axios.get(`http://localhost:5000${url}`);
+        if (res.status === 200) {
+          setReport(res.data.report, "done");
+          return;
+        }
+      } catch (err) {
+        setReport(err.response?.data?.error || "Report generation failed.", "failed");
+        return;
+      }
+      await new Promise(resolve => setTimeout(resolve, 2000));
+    }
+    setReport("Report is taking too long, run the simulation again to retry.", "failed");
   };
 
   const handleSubmit = async () => {
@@ -55,6 +79,8 @@ export default function ResourceSimulator() {
       const cleanData = sanitizeData(res.data);
       setSimResult(cleanData);
       setActiveOption("table");
+      activeReport.current = cleanData.report_id;
+      if (!cleanData.report && cleanData.report_url) pollReport(cleanData.report_id, cleanData.report_url);
     } catch (err) {
       setError(err.response?.data?.error || "Server connection failed.");
     } finally {
@@ -208,7 +234,7 @@ export default function ResourceSimulator() {
                     </div>
                   ) : (
                     <div className="p-10 text-center text-gray-400">
-                      <p>No report found in simulation results.</p>
+                      <p>{simResult.report_status === "pending" ? "Generating report..." : "No report found in simulation results."}</p>
                       <p className="text-xs">Keys received: {Object.keys(simResult).join(', ')}</p>
                     </div>
                   )}